@@ -24,12 +24,18 @@ from app.schemas.admin import (
     PasswordResetByAdmin, SessionTransfer, SessionTransferResponse,
     OrphanedS3Summary, OrphanedS3File, S3DeleteRequest, S3DeleteResponse,
     AuditLogEntry, AuditLogResponse, AuditLogCleanupResponse,
-    SystemHealth, ServiceStatus,
+    SystemHealth, ServiceStatus, AIUsageResponse, ClassifierTrainingResult,
     AdminCheckResponse
 )
 from app.services.admin_service import admin_service
 from app.services.s3_service import s3_service
+from app.services.provider_files import provider_file_service
 from app.services.email_service import email_service
+from app.core.llm_scheduler import llm_scheduler
+from app.services.llm_cache import llm_response_cache
+from app.services.llm_telemetry import llm_telemetry
+from app.services.synthesis_prefilter import synthesis_prefilter_stats
+from app.services.local_classifier import local_classifier
 
 logger = logging.getLogger(__name__)
 
@@ -229,6 +235,16 @@ async def admin_delete_user(
             except Exception as e:
                 logger.error(f"Failed to delete S3 file {doc.s3_key}: {e}")
 
+            # Delete the downscaled model image if one was made
+            if doc.model_image_s3_key:
+                try:
+                    await s3_service.delete_file(doc.model_image_s3_key)
+                except Exception as e:
+                    logger.error(f"Failed to delete S3 model image {doc.model_image_s3_key}: {e}")
+
+            # Delete the provider-side copy if one was uploaded
+            await provider_file_service.delete(doc.provider_file_id)
+
             if doc.thumbnail_s3_key:
                 try:
                     await s3_service.delete_file(doc.thumbnail_s3_key)
@@ -357,6 +373,16 @@ async def admin_delete_session(
         except Exception as e:
             logger.error(f"Failed to delete S3 file {doc.s3_key}: {e}")
 
+        # Delete the downscaled model image if one was made
+        if doc.model_image_s3_key:
+            try:
+                await s3_service.delete_file(doc.model_image_s3_key)
+            except Exception as e:
+                logger.error(f"Failed to delete S3 model image {doc.model_image_s3_key}: {e}")
+
+        # Delete the provider-side copy if one was uploaded
+        await provider_file_service.delete(doc.provider_file_id)
+
         if doc.thumbnail_s3_key:
             try:
                 await s3_service.delete_file(doc.thumbnail_s3_key)
@@ -533,3 +559,36 @@ async def get_system_health(
         services=[ServiceStatus(**s) for s in health["services"]],
         checked_at=health["checked_at"]
     )
+
+
+@router.get("/ai-usage", response_model=AIUsageResponse)
+async def get_ai_usage(
+    admin_user: User = Depends(get_admin_user)
+):
+    """Token usage, cache hits, latency, request queue state and skipped journal synthesis calls since startup."""
+    return {
+        **llm_telemetry.snapshot(),
+        "cache": llm_response_cache.stats(),
+        "scheduler": llm_scheduler.stats(),
+        "journal_prefilter": synthesis_prefilter_stats.snapshot()
+    }
+
+
+@router.post("/classifiers/train", response_model=dict[str, ClassifierTrainingResult])
+def train_classifiers(
+    admin_user: User = Depends(get_admin_user),
+    db: DBSession = Depends(get_db)
+):
+    """Retrain the local document/audio category classifiers from categorized rows."""
+    results = local_classifier.train_from_database(db)
+
+    admin_service.log_action(
+        db=db,
+        admin_user=admin_user,
+        action="classifier_train",
+        target_type="classifier",
+        target_id=None,
+        details=results
+    )
+
+    return results
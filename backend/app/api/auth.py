@@ -20,6 +20,7 @@ from app.schemas.auth import (
 )
 from app.services.email_service import email_service
 from app.services.s3_service import s3_service
+from app.services.provider_files import provider_file_service
 
 logger = logging.getLogger(__name__)
 
@@ -284,6 +285,16 @@ async def delete_account(
                 logger.error(f"Failed to delete S3 file {doc.s3_key} during account deletion: {str(e)}")
                 # Continue deleting other files even if one fails
 
+            # Delete the downscaled model image if one was made
+            if doc.model_image_s3_key:
+                try:
+                    await s3_service.delete_file(doc.model_image_s3_key)
+                except Exception as e:
+                    logger.error(f"Failed to delete S3 model image {doc.model_image_s3_key}: {e}")
+
+            # Delete the provider-side copy if one was uploaded
+            await provider_file_service.delete(doc.provider_file_id)
+
             # Delete thumbnail file if it exists
             if doc.thumbnail_s3_key:
                 try:
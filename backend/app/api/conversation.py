@@ -1,17 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.circuit_breaker import openai_circuit
+from app.core.request_deadline import ClientDisconnected, DeadlineExceeded, deadline_scope, run_request
 from app.models import User, Session as SessionModel, Conversation, Document, AudioRecording
-from app.models.conversation import MessageRole, MessageType
+from app.models.conversation import MessageRole, MessageType, SynthesisStatus
 from app.schemas.conversation import MessageRequest, MessageResponse, ConversationHistory
 from app.services.openai_service import openai_service
 from app.services.journal_service import JournalService
 from app.services.s3_service import s3_service
+from app.services.prompt_budget import budget_document
+from app.services.document_chunks import document_chunk_service
+from app.services.provider_files import provider_file_service
+from app.services.synthesis_jobs import run_journal_synthesis, synthesis_batcher
+from app.services.synthesis_prefilter import is_trivial_message
+from app.services.conversation_summary import run_conversation_summary, summary_update_due
+from app.services.journal_rollups import rollups_due, run_journal_rollups
+from app.services.local_classifier import CATEGORY_SOURCE_FALLBACK
 from app.api.auth import get_current_user
 from app.api.permissions import check_session_access
+from app.config import ai_config
 from typing import Optional
+from contextlib import aclosing
 from datetime import datetime, date as date_type
+import asyncio
 import uuid
+import json
 import logging
 import io
 import tempfile
@@ -23,10 +38,279 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/conversation", tags=["conversation"])
 
 
+def _parse_entry_date(entry_date: Optional[str]) -> Optional[date_type]:
+    """Parse user's local date if provided, otherwise fall back to server date"""
+    if entry_date:
+        try:
+            return date_type.fromisoformat(entry_date)
+        except ValueError:
+            logger.warning(f"Invalid entry_date format: {entry_date}, using server date")
+    return None
+
+
+def _get_conversation_chain(session: SessionModel, user_message: Conversation, db: Session) -> dict:
+    """Find the stored response chain this turn can continue, if still valid"""
+    journal_edited_at = session.journal_edited_at.isoformat() if session.journal_edited_at else None
+    chain = {"previous_response_id": None, "chain_length": 0, "journal_edited_at": journal_edited_at}
+
+    if not ai_config.USE_SERVER_CONVERSATION_STATE:
+        return chain
+
+    previous = db.query(Conversation).filter(
+        Conversation.session_id == session.id,
+        Conversation.id != user_message.id
+    ).order_by(Conversation.created_at.desc()).first()
+
+    # Only continue if the latest message is an assistant reply from a stored response
+    # (messages from other endpoints or collaborators are not part of the chain)
+    if not previous or previous.role != MessageRole.ASSISTANT:
+        return chain
+    metadata = previous.message_metadata or {}
+    if not metadata.get("response_id"):
+        return chain
+
+    # Replay in full after a user journal edit so the model sees the current journal
+    if metadata.get("journal_edited_at") != journal_edited_at:
+        return chain
+    if metadata.get("chain_length", 0) >= ai_config.MAX_CHAINED_TURNS:
+        return chain
+
+    chain["previous_response_id"] = metadata["response_id"]
+    chain["chain_length"] = metadata.get("chain_length", 0)
+    return chain
+
+
+async def _prepare_turn(
+    content: str,
+    session: SessionModel,
+    message_type: str,
+    document_id: Optional[int],
+    media_url: Optional[str],
+    db: Session
+) -> dict:
+    """Save the user message and gather everything the model needs for a reply"""
+    session_id = session.id
+
+    # Get extracted text and media URL if document/image message
+    extracted_text = None
+    generated_media_url = None
+    model_media_url = None
+    doc = None
+
+    if document_id:
+        doc = db.query(Document).filter(Document.id == document_id).first()
+        if doc:
+            extracted_text = doc.extracted_text
+            # Generate presigned URL for documents and images (for native GPT-5.1 file support)
+            generated_media_url = s3_service.generate_presigned_url(doc.s3_key, expiration=86400)  # 24 hours
+            # Vision calls use the downscaled copy of large images
+            if doc.model_image_s3_key:
+                model_media_url = s3_service.generate_presigned_url(doc.model_image_s3_key, expiration=86400)
+
+    # Create user message
+    user_message = Conversation(
+        session_id=session_id,
+        role=MessageRole.USER,
+        content=content,
+        message_type=MessageType(message_type),
+        document_id=document_id,
+        media_url=generated_media_url or media_url,
+        extracted_text=extracted_text
+    )
+    db.add(user_message)
+    db.commit()
+    db.refresh(user_message)
+
+    # Get every message not yet covered by the rolling summary, so nothing falls
+    # between the summary and the history (the prompt budgeter trims it to whole
+    # messages that fit). The limit only applies while a long session that
+    # predates the summary catches up.
+    history_query = db.query(Conversation).filter(
+        Conversation.session_id == session_id,
+        Conversation.id != user_message.id
+    )
+    if session.summary_through_message_id:
+        history_query = history_query.filter(Conversation.id > session.summary_through_message_id)
+    history_limit = (
+        ai_config.MAX_CONVERSATION_CONTEXT
+        + ai_config.CONVERSATION_SUMMARY_THRESHOLD
+        + ai_config.CONVERSATION_SUMMARY_MAX_BATCH
+    )
+    history = history_query.order_by(Conversation.created_at.desc()).limit(history_limit).all()
+
+    history_messages = [
+        {"role": msg.role.value, "content": msg.content}
+        for msg in reversed(history)
+    ]
+
+    # Get journal context
+    journal_context = await JournalService(db).format_journal_context(session_id, query=content)
+
+    # Relevant document chunks: an attached PDF/text file is sent as its chunks
+    # instead of the whole file; otherwise search all of the session's documents
+    # unless the message is only a greeting or acknowledgement.
+    # Images keep native file input since the model needs to see them.
+    document_context = None
+    if ai_config.DOCUMENT_RETRIEVAL_ENABLED:
+        if document_id and doc and not doc.content_type.startswith("image/"):
+            chunks = document_chunk_service.select_for_document(db, doc, content)
+        elif not document_id and not is_trivial_message(content):
+            chunks = document_chunk_service.select_for_session(db, session_id, content)
+        else:
+            chunks = []
+        if chunks:
+            document_context = document_chunk_service.format_chunks(chunks)
+    send_file = bool(document_id) and document_context is None
+
+    # Reference the provider's stored copy of the file when enabled
+    document_file_id = None
+    if send_file and doc:
+        document_file_id = await provider_file_service.ensure(db, doc)
+
+    # Build complete message with extracted text for journal synthesis
+    complete_message = content
+    if document_id and document_context:
+        complete_message = f"{content}\n\n[Document content]:\n{document_context}"
+    elif extracted_text:
+        complete_message = f"{content}\n\n[Document content]:\n{budget_document(extracted_text)}"
+
+    return {
+        "user_message": user_message,
+        "complete_message": complete_message,
+        "chain": _get_conversation_chain(session, user_message, db),
+        "chat_kwargs": {
+            "message": content,  # Don't include extracted text - sent as chunks or native file
+            "conversation_history": history_messages,
+            "journal_context": journal_context,
+            "conversation_summary": session.conversation_summary,
+            "document_context": document_context,
+            "document_url": (model_media_url or generated_media_url) if send_file else None,
+            "document_file_id": document_file_id,
+            "document_type": message_type if send_file else None
+        }
+    }
+
+
+async def _finish_turn(
+    turn: dict,
+    ai_response_text: str,
+    session_id: str,
+    entry_date: Optional[str],
+    background_tasks: BackgroundTasks,
+    db: Session,
+    synthesis_json: Optional[dict] = None,
+    response_id: Optional[str] = None,
+    chained: bool = False
+) -> dict:
+    """Save the assistant reply, queue journal synthesis and build the response payload"""
+    user_message = turn["user_message"]
+
+    # Remember the stored response so the next turn can continue the chain
+    message_metadata = None
+    if response_id and ai_config.USE_SERVER_CONVERSATION_STATE:
+        message_metadata = {
+            "response_id": response_id,
+            "journal_edited_at": turn["chain"]["journal_edited_at"],
+            "chain_length": turn["chain"]["chain_length"] + 1 if chained else 1
+        }
+
+    # Create assistant message
+    assistant_message = Conversation(
+        session_id=session_id,
+        role=MessageRole.ASSISTANT,
+        content=ai_response_text,
+        message_type=MessageType.TEXT,
+        message_metadata=message_metadata
+    )
+    db.add(assistant_message)
+
+    # Journal synthesis is optional: skip it while the OpenAI circuit is open,
+    # unless single-call mode already produced the entries. Batched synthesis
+    # waits for the circuit to close on its own.
+    batched = synthesis_json is None and ai_config.JOURNAL_SYNTHESIS_MODE == "batched"
+    run_synthesis = synthesis_json is not None or batched or not openai_circuit.is_degraded
+    parsed_entry_date = _parse_entry_date(entry_date)
+    if run_synthesis:
+        user_message.synthesis_status = SynthesisStatus.PENDING
+    if batched and parsed_entry_date:
+        user_message.message_metadata = {
+            **(user_message.message_metadata or {}),
+            "entry_date": parsed_entry_date.isoformat()
+        }
+    db.commit()
+    db.refresh(assistant_message)
+
+    if batched:
+        # One synthesis call per idle period or batch of messages
+        pending_count = db.query(Conversation).filter(
+            Conversation.session_id == session_id,
+            Conversation.role == MessageRole.USER,
+            Conversation.synthesis_status == SynthesisStatus.PENDING
+        ).count()
+        synthesis_batcher.schedule(session_id, pending_count)
+    elif run_synthesis:
+        # Assess for journal synthesis (include document content) after the response is sent
+        background_tasks.add_task(
+            run_journal_synthesis,
+            conversation_id=user_message.id,
+            assistant_message_id=assistant_message.id,
+            user_message=turn["complete_message"],
+            ai_response=ai_response_text,
+            session_id=session_id,
+            entry_date=parsed_entry_date,
+            synthesis_json=synthesis_json
+        )
+
+    # Fold older turns into the rolling summary once enough have accumulated
+    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+    if session and not openai_circuit.is_degraded and summary_update_due(session, db):
+        background_tasks.add_task(run_conversation_summary, session_id)
+
+    # Summarize older journal months at most once a day
+    if not openai_circuit.is_degraded and rollups_due(session_id):
+        background_tasks.add_task(run_journal_rollups, session_id)
+
+    return {
+        "message": {
+            "id": assistant_message.id,
+            "role": assistant_message.role.value,
+            "content": assistant_message.content,
+            "created_at": assistant_message.created_at.isoformat()
+        },
+        # Synthesis runs in the background; fetch the suggestion via
+        # GET /conversation/message/{conversation_id}/journal-suggestion
+        "journal_suggestion": None,
+        "synthesis": {
+            "conversation_id": user_message.id,
+            "status": SynthesisStatus.PENDING.value
+        } if run_synthesis else None
+    }
+
+
+def _discard_unanswered(turn: Optional[dict], db: Session) -> None:
+    """Delete a user message whose reply was abandoned, so no reply or synthesis is owed"""
+    if not turn:
+        return
+    try:
+        db.rollback()
+        db.query(Conversation).filter(Conversation.id == turn["user_message"].id).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to discard unanswered message: {e}")
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format a server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @router.post("/message", response_model=dict)
 async def send_message(
+    request: Request,
     content: str,
     session_id: str,
+    background_tasks: BackgroundTasks,
     message_type: str = "text",
     document_id: Optional[int] = None,
     media_url: Optional[str] = None,
@@ -34,127 +318,171 @@ async def send_message(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Send a message in the conversation (with optional rich media)"""
+    """Send a message in the conversation (with optional rich media).
+
+    The turn runs under the chat request deadline and is cancelled if the
+    client disconnects; an abandoned turn leaves no messages or journal work.
+    """
     # Verify user has access to session (owner or collaborator)
     session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     check_session_access(session, current_user.id, db)
 
-    try:
-        # Get extracted text and media URL if document/image message
-        extracted_text = None
-        generated_media_url = None
-
-        if document_id:
-            doc = db.query(Document).filter(Document.id == document_id).first()
-            if doc:
-                extracted_text = doc.extracted_text
-                # Generate presigned URL for documents and images (for native GPT-5.1 file support)
-                generated_media_url = s3_service.generate_presigned_url(doc.s3_key, expiration=86400)  # 24 hours
-
-        # Create user message
-        user_message = Conversation(
-            session_id=session_id,
-            role=MessageRole.USER,
-            content=content,
-            message_type=MessageType(message_type),
-            document_id=document_id,
-            media_url=generated_media_url or media_url,
-            extracted_text=extracted_text
-        )
-        db.add(user_message)
-        db.commit()
-        db.refresh(user_message)
-
-        # Get conversation history for context
-        history = db.query(Conversation).filter(
-            Conversation.session_id == session_id
-        ).order_by(Conversation.created_at).limit(20).all()
-
-        history_messages = [
-            {"role": msg.role.value, "content": msg.content}
-            for msg in history[:-1]  # Exclude the message we just added
-        ]
+    state = {}
 
-        # Get journal context
-        journal_service = JournalService(db)
-        journal_context = await journal_service.format_journal_context(session_id)
+    async def run_turn() -> dict:
+        turn = state["turn"] = await _prepare_turn(content, session, message_type, document_id, media_url, db)
 
-        # Build complete message with extracted text for journal synthesis
-        complete_message = content
-        if extracted_text:
-            complete_message = f"{content}\n\n[Document content]:\n{extracted_text}"
+        # Single-call mode: reply and journal entries from one structured-output call
+        if ai_config.CHAT_JOURNAL_MODE == "single_call":
+            combined = await openai_service.chat_with_journal_synthesis(**turn["chat_kwargs"])
+            if combined:
+                synthesis_json = {key: value for key, value in combined.items() if key != "reply"}
+                return await _finish_turn(
+                    turn, combined["reply"], session_id, entry_date, background_tasks, db,
+                    synthesis_json=synthesis_json
+                )
+            logger.warning("Single-call chat synthesis failed, falling back to two-call path")
 
         # Get AI response with journal context and native file/image support
-        ai_response_text = await openai_service.chat_with_journal(
-            message=content,  # Don't include extracted text - use native file support
-            conversation_history=history_messages,
-            journal_context=journal_context,
-            document_url=generated_media_url if document_id else None,
-            document_type=message_type if document_id else None
+        ai_turn = await openai_service.chat_with_journal_turn(
+            **turn["chat_kwargs"],
+            previous_response_id=turn["chain"]["previous_response_id"]
         )
 
-        # Create assistant message
-        assistant_message = Conversation(
-            session_id=session_id,
-            role=MessageRole.ASSISTANT,
-            content=ai_response_text,
-            message_type=MessageType.TEXT
+        return await _finish_turn(
+            turn, ai_turn["content"], session_id, entry_date, background_tasks, db,
+            response_id=ai_turn["response_id"], chained=ai_turn["chained"]
         )
-        db.add(assistant_message)
-        db.commit()
-        db.refresh(assistant_message)
-
-        # Parse user's local date if provided, otherwise use server date
-        user_date = None
-        if entry_date:
-            try:
-                user_date = date_type.fromisoformat(entry_date)
-            except ValueError:
-                logger.warning(f"Invalid entry_date format: {entry_date}, using server date")
 
-        # Assess for journal synthesis (include document content)
-        synthesis_result = await journal_service.assess_and_synthesize(
-            user_message=complete_message,
-            ai_response=ai_response_text,
-            session_id=session_id,
-            conversation_id=user_message.id,
-            entry_date=user_date
-        )
+    try:
+        return await run_request(request, run_turn, ai_config.REQUEST_DEADLINE_SECONDS["chat"])
+    except ClientDisconnected:
+        _discard_unanswered(state.get("turn"), db)
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except DeadlineExceeded:
+        _discard_unanswered(state.get("turn"), db)
+        raise HTTPException(status_code=504, detail="The reply took too long. Please try again.")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
 
-        # Mark messages as synthesized if entries were created
-        if synthesis_result.should_create and len(synthesis_result.suggested_entries) > 0:
-            user_message.synthesized_to_journal = True
-            assistant_message.synthesized_to_journal = True
-            db.commit()
 
-        return {
-            "message": {
-                "id": assistant_message.id,
-                "role": assistant_message.role.value,
-                "content": assistant_message.content,
-                "created_at": assistant_message.created_at.isoformat()
-            },
-            "journal_suggestion": {
-                "should_create": synthesis_result.should_create,
-                "reasoning": synthesis_result.reasoning,
-                "entries": [
-                    {
-                        "title": entry.title,
-                        "content": entry.content,
-                        "entry_type": entry.entry_type.value,
-                        "confidence": entry.confidence
-                    }
-                    for entry in synthesis_result.suggested_entries
-                ]
-            } if synthesis_result.should_create else None
-        }
+@router.post("/message/stream")
+async def send_message_stream(
+    content: str,
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    message_type: str = "text",
+    document_id: Optional[int] = None,
+    media_url: Optional[str] = None,
+    entry_date: Optional[str] = None,  # User's local date (YYYY-MM-DD)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Send a message and stream the assistant reply as server-sent events.
+
+    Emits `delta` events with text chunks as they arrive, then a single `done`
+    event carrying the same payload as POST /message once the reply is saved.
+    If the client disconnects, the model stream is cancelled and the
+    unanswered message is discarded. If the stream fails after text was sent
+    or the reply exceeds the chat request deadline, an `error` event follows
+    and the message is discarded as well.
+    """
+    # Verify user has access to session (owner or collaborator)
+    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    check_session_access(session, current_user.id, db)
 
+    try:
+        turn = await _prepare_turn(content, session, message_type, document_id, media_url, db)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
 
+    async def event_stream():
+        chunks = []
+        turn_state = {}
+        finished = False
+        try:
+            # Single-call mode streams the reply out of the structured response
+            if ai_config.CHAT_JOURNAL_MODE == "single_call":
+                stream_reply = openai_service.stream_chat_with_journal_synthesis
+            else:
+                stream_reply = openai_service.stream_chat_with_journal
+            with deadline_scope(ai_config.REQUEST_DEADLINE_SECONDS["chat"]):
+                # Closed explicitly so the model stream is released on every exit path
+                async with aclosing(stream_reply(
+                    **turn["chat_kwargs"],
+                    previous_response_id=turn["chain"]["previous_response_id"],
+                    turn_state=turn_state
+                )) as deltas:
+                    async for delta in deltas:
+                        chunks.append(delta)
+                        yield _sse_event("delta", {"text": delta})
+
+            # Assistant row is written once, after the stream completes
+            payload = await _finish_turn(
+                turn, "".join(chunks), session_id, entry_date, background_tasks, db,
+                synthesis_json=turn_state.get("synthesis"),
+                response_id=turn_state.get("response_id"), chained=turn_state.get("chained", False)
+            )
+            finished = True
+            yield _sse_event("done", payload)
+        except DeadlineExceeded:
+            _discard_unanswered(turn, db)
+            yield _sse_event("error", {"detail": "The reply took too long. Please try again."})
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client disconnected mid-stream, which cancels the model stream
+            if not finished:
+                _discard_unanswered(turn, db)
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming message: {e}")
+            # The partial reply is not saved, so drop the message it answered
+            if finished:
+                db.rollback()
+            else:
+                _discard_unanswered(turn, db)
+            yield _sse_event("error", {"detail": f"Error processing message: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable proxy buffering (nginx/Render)
+        }
+    )
+
+
+@router.get("/message/{conversation_id}/journal-suggestion")
+async def get_journal_suggestion(
+    conversation_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the background journal synthesis status and suggestion for a user message"""
+    message = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+
+    # Verify user has access to session (owner or collaborator)
+    session = db.query(SessionModel).filter(SessionModel.id == message.session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    check_session_access(session, current_user.id, db)
+
+    return {
+        "conversation_id": message.id,
+        "status": message.synthesis_status.value if message.synthesis_status else None,
+        "journal_suggestion": (message.message_metadata or {}).get("journal_suggestion"),
+        # Batched synthesis stores the suggestion on the batch's latest message
+        "batched_into": (message.message_metadata or {}).get("batched_into")
+    }
+
 
 @router.get("/{session_id}/history", response_model=ConversationHistory)
 async def get_conversation_history(
@@ -308,6 +636,7 @@ async def transcribe_audio(
         # Wrapped in try/except for backward compatibility - if AI fails, recording still saves
         recording_category = None
         ai_summary = None
+        category_source = None
         try:
             categorization = await openai_service.categorize_audio_recording(
                 transcribed_text or "",
@@ -317,8 +646,10 @@ async def transcribe_audio(
             try:
                 from app.models import AudioRecordingCategory
                 recording_category = AudioRecordingCategory(categorization["category"])
+                category_source = categorization.get("source")
             except (ValueError, KeyError):
                 recording_category = AudioRecordingCategory.OTHER
+                category_source = CATEGORY_SOURCE_FALLBACK
             ai_summary = categorization.get("summary", "")
         except Exception as e:
             logger.warning(f"AI categorization failed for audio recording: {e}. Recording will save without category.")
@@ -332,7 +663,8 @@ async def transcribe_audio(
             duration=duration_seconds,
             transcribed_text=transcribed_text,
             category=recording_category,
-            ai_summary=ai_summary
+            ai_summary=ai_summary,
+            category_source=category_source
         )
         db.add(audio_recording)
         db.commit()
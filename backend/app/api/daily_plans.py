@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime, date, timedelta
 
+from ..config import ai_config
 from ..core.database import get_db
+from ..core.request_deadline import ClientDisconnected, DeadlineExceeded, run_request
 from ..api.auth import get_current_user
 from ..api.permissions import check_session_access
 from ..models.user import User
@@ -107,6 +109,7 @@ async def check_daily_plan_status(
 
 @router.post("/{session_id}/generate", response_model=DailyPlanResponse)
 async def generate_daily_plan(
+    request: Request,
     session_id: str,
     user_date: str = None,
     db: Session = Depends(get_db),
@@ -114,6 +117,9 @@ async def generate_daily_plan(
 ):
     """Generate a new daily plan for today
 
+    Generation runs under the daily plan request deadline and is cancelled
+    (nothing is saved) if the client disconnects.
+
     Args:
         user_date: Optional date in YYYY-MM-DD format from user's timezone
     """
@@ -127,7 +133,18 @@ async def generate_daily_plan(
     check_session_access(session, current_user.id, db)
 
     # Generate the plan (HTTPException will pass through to FastAPI)
-    plan = await DailyPlanService.generate_daily_plan(db, session_id, user_date)
+    try:
+        plan = await run_request(
+            request,
+            lambda: DailyPlanService.generate_daily_plan(db, session_id, user_date),
+            ai_config.REQUEST_DEADLINE_SECONDS["daily_plan"]
+        )
+    except ClientDisconnected:
+        db.rollback()
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except DeadlineExceeded:
+        db.rollback()
+        raise HTTPException(status_code=504, detail="Daily plan generation took too long. Please try again.")
     return plan
 
 
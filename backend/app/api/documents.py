@@ -5,6 +5,10 @@ from app.models import Document as DocumentModel, DocumentCategory, Session as S
 from app.schemas import DocumentUploadResponse, DocumentResponse, DocumentUpdate
 from app.services import s3_service, document_processor
 from app.services.openai_service import openai_service
+from app.services.document_chunks import document_chunk_service
+from app.services.provider_files import provider_file_service
+from app.services.local_classifier import CATEGORY_SOURCE_FALLBACK
+from app.config import ai_config
 from app.api.auth import get_current_user
 from app.api.permissions import check_session_access
 from typing import List, Optional
@@ -81,8 +85,9 @@ async def upload_document(
     if not upload_success:
         raise HTTPException(status_code=500, detail="Failed to upload file to storage")
 
-    # Extract text from document
-    extracted_text = document_processor.extract_text(file_content, file.content_type)
+    # Extract text from document, keeping page boundaries for chunking
+    pages = document_processor.extract_pages(file_content, file.content_type)
+    extracted_text = "\n\n".join(page for page in pages if page) or None
 
     # Generate and upload thumbnail for PDFs
     thumbnail_s3_key = None
@@ -99,15 +104,28 @@ async def upload_document(
                 logger.warning(f"Failed to upload thumbnail for {file.filename}")
                 thumbnail_s3_key = None
 
+    # Downscaled copy of large images for vision calls; the original stays in S3
+    model_image_bytes = None
+    model_image_s3_key = None
+    if file.content_type.startswith("image/"):
+        model_image_bytes = document_processor.generate_model_image(file_content)
+        if model_image_bytes:
+            model_image_s3_key = s3_service.get_prefixed_key(f"thumbnails/{session_id}/{uuid.uuid4()}-model.jpg")
+            if not await s3_service.upload_file(model_image_bytes, model_image_s3_key, "image/jpeg"):
+                logger.warning(f"Failed to upload model image for {file.filename}")
+                model_image_bytes = None
+                model_image_s3_key = None
+
     # Use AI to categorize document and generate description
     # Wrapped in try/except for backward compatibility - if AI fails, document still uploads
     doc_category = None
     ai_description = None
+    category_source = None
     try:
         # For images, generate presigned URL to use GPT vision for better categorization
         image_url = None
         if file.content_type.startswith("image/"):
-            image_url = s3_service.generate_presigned_url(s3_key)
+            image_url = s3_service.generate_presigned_url(model_image_s3_key or s3_key)
 
         categorization = await openai_service.categorize_document(
             extracted_text or "",
@@ -117,8 +135,10 @@ async def upload_document(
         # Convert category string to enum (with fallback to OTHER)
         try:
             doc_category = DocumentCategory(categorization["category"])
+            category_source = categorization.get("source")
         except (ValueError, KeyError):
             doc_category = DocumentCategory.OTHER
+            category_source = CATEGORY_SOURCE_FALLBACK
         ai_description = categorization.get("description", "")
     except Exception as e:
         logger.warning(f"AI categorization failed for {file.filename}: {e}. Document will upload without category.")
@@ -130,16 +150,34 @@ async def upload_document(
         filename=file.filename,
         s3_key=s3_key,
         thumbnail_s3_key=thumbnail_s3_key,
+        model_image_s3_key=model_image_s3_key,
         content_type=file.content_type,
         extracted_text=extracted_text,
         category=doc_category,
-        ai_description=ai_description
+        ai_description=ai_description,
+        category_source=category_source
     )
 
     db.add(document)
     db.commit()
     db.refresh(document)
 
+    # Store text chunks for retrieval in chat and daily plans
+    if extracted_text:
+        try:
+            document_chunk_service.store_chunks(db, document, pages)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to chunk {file.filename}: {e}. Prompts will use the full document.")
+
+    # Store a provider-side copy of files that chat sends as files rather than
+    # text chunks, so follow-up turns reference it by id
+    sent_as_file = file.content_type.startswith("image/") or not (
+        extracted_text and ai_config.DOCUMENT_RETRIEVAL_ENABLED
+    )
+    if sent_as_file:
+        await provider_file_service.ensure(db, document, model_image_bytes or file_content)
+
     return document
 
 
@@ -255,6 +293,13 @@ async def delete_document(
     # Delete from S3
     await s3_service.delete_file(document.s3_key)
 
+    # Delete the downscaled model image if one was made
+    if document.model_image_s3_key:
+        await s3_service.delete_file(document.model_image_s3_key)
+
+    # Delete the provider-side copy if one was uploaded
+    await provider_file_service.delete(document.provider_file_id)
+
     # Delete thumbnail if exists
     if document.thumbnail_s3_key:
         await s3_service.delete_file(document.thumbnail_s3_key)
@@ -15,6 +15,7 @@ from app.schemas import (
 )
 from app.api.permissions import check_session_access
 from app.services import openai_service
+from app.services.glossary_service import glossary_service
 from app.api.auth import get_current_user
 from typing import List
 import logging
@@ -88,6 +89,12 @@ async def translate_medical_jargon(
 ):
     """Translate medical jargon into plain language"""
 
+    # Common terms without extra context are answered from the glossary
+    if not request.context.strip():
+        translation = glossary_service.translate(request.medical_term)
+        if translation:
+            return JargonTranslationResponse(**translation)
+
     translation = await openai_service.translate_jargon(
         request.medical_term,
         request.context
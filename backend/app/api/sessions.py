@@ -12,6 +12,7 @@ from app.core.config import settings
 from app.api.auth import get_current_user
 from app.api.permissions import check_session_access
 from app.services.s3_service import s3_service
+from app.services.provider_files import provider_file_service
 import logging
 import uuid
 
@@ -415,6 +416,16 @@ async def delete_session(
             logger.error(f"Failed to delete S3 file {doc.s3_key}: {str(e)}")
             # Continue deleting other files even if one fails
 
+        # Delete the downscaled model image if one was made
+        if doc.model_image_s3_key:
+            try:
+                await s3_service.delete_file(doc.model_image_s3_key)
+            except Exception as e:
+                logger.error(f"Failed to delete S3 model image {doc.model_image_s3_key}: {e}")
+
+        # Delete the provider-side copy if one was uploaded
+        await provider_file_service.delete(doc.provider_file_id)
+
         # Delete thumbnail file if it exists
         if doc.thumbnail_s3_key:
             try:
@@ -11,6 +11,7 @@ from app.schemas.conversation import (
     ConversationCoachResponse
 )
 from app.services.openai_service import openai_service
+from app.services.glossary_service import glossary_service
 from app.services.journal_service import JournalService
 from app.api.auth import get_current_user
 from typing import Optional
@@ -60,9 +61,17 @@ async def translate_medical_jargon(
                 SessionCollaborator.session_id == session.id,
                 SessionCollaborator.user_id == current_user.id
             ).first() is not None
-            if is_owner or is_collaborator:
+            if (is_owner or is_collaborator) and session.journal_entry_count:
                 journal_service = JournalService(db)
-                journal_context = await journal_service.format_journal_context(session_id)
+                journal_context = await journal_service.format_journal_context(
+                    session_id, query=f"{medical_term} {context}"
+                )
+
+    # Common terms with no extra or journal context are answered from the glossary
+    if not context.strip() and not journal_context:
+        translation = glossary_service.translate(medical_term)
+        if translation:
+            return JargonTranslationResponse(**translation)
 
     translation = await openai_service.translate_jargon(
         medical_term,
@@ -96,7 +105,7 @@ async def get_conversation_coaching(
             ).first() is not None
             if is_owner or is_collaborator:
                 journal_service = JournalService(db)
-                journal_context = await journal_service.format_journal_context(session_id)
+                journal_context = await journal_service.format_journal_context(session_id, query=situation)
 
     # Generate coaching with journal context
     coaching_data = await openai_service.generate_conversation_coaching(
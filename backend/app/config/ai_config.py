@@ -12,9 +12,44 @@ Modify this file to change AI behavior, models, or prompt wording.
 # Main conversational AI model
 CHAT_MODEL = "gpt-5.1"
 
+# Fast, low-cost model for classification and extraction tasks
+FAST_MODEL = "gpt-5-mini"
+
 # Audio transcription model
 TRANSCRIPTION_MODEL = "gpt-4o-transcribe"
 
+# Model settings per task:
+# - model: Model used for the task
+# - reasoning_effort: "minimal"/"low"/"medium"/"high", or None for the model default
+# - max_output_tokens: Output cap (includes reasoning tokens), or None for no cap
+# - timeout: Deadline in seconds for one call attempt (for streaming chat, until the stream opens)
+# - stream_timeout: Streaming tasks only; deadline in seconds for the whole stream
+# Chat tasks must keep the same model, since chained turns reuse stored responses.
+MODEL_PROFILES = {
+    "chat": {"model": CHAT_MODEL, "reasoning_effort": None, "max_output_tokens": None, "timeout": 60},
+    "chat_stream": {"model": CHAT_MODEL, "reasoning_effort": None, "max_output_tokens": None, "timeout": 30, "stream_timeout": 120},
+    "chat_with_synthesis": {"model": CHAT_MODEL, "reasoning_effort": None, "max_output_tokens": None, "timeout": 90, "stream_timeout": 120},
+    "medical_summary": {"model": CHAT_MODEL, "reasoning_effort": None, "max_output_tokens": 4000, "timeout": 60},
+    "jargon_translation": {"model": CHAT_MODEL, "reasoning_effort": "low", "max_output_tokens": 2000, "timeout": 30},
+    "glossary_warm": {"model": CHAT_MODEL, "reasoning_effort": "low", "max_output_tokens": 2000, "timeout": 60},
+    "conversation_coaching": {"model": CHAT_MODEL, "reasoning_effort": None, "max_output_tokens": 3000, "timeout": 45},
+    "document_categorization": {"model": FAST_MODEL, "reasoning_effort": "low", "max_output_tokens": 1000, "timeout": 20},
+    "audio_categorization": {"model": FAST_MODEL, "reasoning_effort": "low", "max_output_tokens": 1000, "timeout": 20},
+    "journal_synthesis": {"model": FAST_MODEL, "reasoning_effort": "low", "max_output_tokens": 4000, "timeout": 60},
+    "conversation_summary": {"model": FAST_MODEL, "reasoning_effort": "low", "max_output_tokens": 1500, "timeout": 60},
+    "journal_rollup": {"model": FAST_MODEL, "reasoning_effort": "low", "max_output_tokens": 1500, "timeout": 60},
+    "daily_plan": {"model": CHAT_MODEL, "reasoning_effort": None, "max_output_tokens": 4000, "timeout": 90},
+    "transcription": {"model": TRANSCRIPTION_MODEL, "reasoning_effort": None, "max_output_tokens": None, "timeout": 120},
+}
+
+# Profile for tasks not listed above
+DEFAULT_MODEL_PROFILE = {"model": CHAT_MODEL, "reasoning_effort": None, "max_output_tokens": None, "timeout": 60}
+
+
+def get_model_profile(task: str) -> dict:
+    """Return the model profile for a task"""
+    return MODEL_PROFILES.get(task, DEFAULT_MODEL_PROFILE)
+
 
 # ============================================================================
 # CORE SYSTEM PROMPT
@@ -94,13 +129,14 @@ When responding to conversational messages:
 # ============================================================================
 # TASK-SPECIFIC PROMPTS
 # ============================================================================
+# Every request starts with SYSTEM_PROMPT followed by the task's fixed
+# instructions (the *_INSTRUCTIONS constants below). Only after that stable,
+# byte-identical prefix come volatile parts: journal, history, and the
+# get_*_prompt() user message. Keep dates, names and user text out of the
+# instruction constants so provider-side prompt caching can reuse the prefix.
 
-def get_medical_summary_prompt(medical_text: str) -> str:
-    """Generate prompt for medical text summarization"""
-    return f"""Please analyze the following medical information and provide a structured summary.
-
-Medical Information:
-{medical_text}
+MEDICAL_SUMMARY_INSTRUCTIONS = """
+When asked to summarize medical information, analyze it and provide a structured summary.
 
 Remember to:
 - Only summarize what is explicitly stated
@@ -111,12 +147,17 @@ Remember to:
 """
 
 
-def get_jargon_translation_prompt(medical_term: str, context: str = "") -> str:
-    """Generate prompt for medical jargon translation"""
-    return f"""Please explain the following medical term in simple, clear language:
+def get_medical_summary_prompt(medical_text: str) -> str:
+    """Generate prompt for medical text summarization"""
+    return f"""Please analyze the following medical information and provide a structured summary.
+
+Medical Information:
+{medical_text}
+"""
 
-**Term:** {medical_term}
-{f"**Additional Context:** {context}" if context else ""}
+
+JARGON_TRANSLATION_INSTRUCTIONS = """
+When asked to explain a medical term, explain it in simple, clear language.
 
 Provide a well-formatted markdown explanation with:
 
@@ -139,13 +180,16 @@ A brief note encouraging the family to confirm the specific meaning with their h
 Keep the tone calm, professional, and reassuring."""
 
 
-def get_conversation_coaching_prompt(situation: str) -> str:
-    """Generate prompt for conversation coaching"""
-    return f"""A family member is preparing for the following healthcare interaction:
+def get_jargon_translation_prompt(medical_term: str, context: str = "") -> str:
+    """Generate prompt for medical jargon translation"""
+    return f"""Please explain the following medical term in simple, clear language:
+
+**Term:** {medical_term}
+{f"**Additional Context:** {context}" if context else ""}"""
 
-{situation}
 
-Please provide conversation coaching in well-formatted markdown with the following structure:
+CONVERSATION_COACHING_INSTRUCTIONS = """
+When a family member is preparing for a healthcare interaction, provide conversation coaching in well-formatted markdown with the following structure:
 
 ## Questions to Ask
 
@@ -169,6 +213,13 @@ Focus on:
 - Referencing specific journal history to make guidance more relevant and personalized"""
 
 
+def get_conversation_coaching_prompt(situation: str) -> str:
+    """Generate prompt for conversation coaching"""
+    return f"""A family member is preparing for the following healthcare interaction:
+
+{situation}"""
+
+
 # ============================================================================
 # DOCUMENT CATEGORIZATION
 # ============================================================================
@@ -188,17 +239,12 @@ DOCUMENT_CATEGORIES = {
     "other": "Documents that don't fit the above categories"
 }
 
+_document_categories_text = "\n".join([f"- {key}: {desc}" for key, desc in DOCUMENT_CATEGORIES.items()])
 
-def get_document_categorization_prompt(filename: str, text_sample: str) -> str:
-    """Generate prompt for document categorization"""
-    categories_text = "\n".join([f"- {key}: {desc}" for key, desc in DOCUMENT_CATEGORIES.items()])
-
-    return f"""Analyze this medical document and provide categorization.
-
-Document Filename: {filename}
+DOCUMENT_CATEGORIZATION_INSTRUCTIONS = f"""
+You are a medical document classifier. Always respond with valid JSON only.
 
-Document Content Sample:
-{text_sample if text_sample else "[No text could be extracted from this document]"}
+Analyze the medical document you are given and provide categorization.
 
 Please provide your response in this EXACT JSON format (no additional text):
 {{
@@ -207,7 +253,7 @@ Please provide your response in this EXACT JSON format (no additional text):
 }}
 
 Available categories (use the exact value shown):
-{categories_text}
+{_document_categories_text}
 
 For the description:
 - Write 2-3 sentences (max 200 characters)
@@ -216,6 +262,30 @@ For the description:
 - If no text extracted, describe based on filename"""
 
 
+def get_document_categorization_prompt(filename: str, text_sample: str) -> str:
+    """Generate prompt for document categorization"""
+    return f"""Analyze this medical document and provide categorization.
+
+Document Filename: {filename}
+
+Document Content Sample:
+{text_sample if text_sample else "[No text could be extracted from this document]"}"""
+
+
+# Local classifier: documents and recordings are categorized without a model
+# call when the local classifier's confidence is at least this threshold.
+# Train it from model-categorized rows with POST /api/admin/classifiers/train;
+# until a trained classifier passes its held-out check, the model is used.
+LOCAL_CLASSIFIER_ENABLED = True
+LOCAL_CLASSIFIER_CONFIDENCE_THRESHOLD = 0.85
+LOCAL_CLASSIFIER_MIN_DOCUMENT_CHARS = 200  # Shorter text (e.g. photos) always uses the model
+LOCAL_CLASSIFIER_MIN_AUDIO_CHARS = 80
+LOCAL_CLASSIFIER_MIN_TRAINING_SAMPLES = 50
+# Share of samples held out when training; a classifier is only used once its
+# accuracy on them reaches LOCAL_CLASSIFIER_MIN_VALIDATION_ACCURACY
+LOCAL_CLASSIFIER_VALIDATION_FRACTION = 0.2
+LOCAL_CLASSIFIER_MIN_VALIDATION_ACCURACY = 0.9
+
 # ============================================================================
 # AUDIO RECORDING CATEGORIZATION
 # ============================================================================
@@ -235,18 +305,12 @@ AUDIO_CATEGORIES = {
     "other": "Anything that doesn't fit the above categories"
 }
 
+_audio_categories_text = "\n".join([f"- {key}: {desc}" for key, desc in AUDIO_CATEGORIES.items()])
 
-def get_audio_categorization_prompt(text_sample: str, duration: float = None) -> str:
-    """Generate prompt for audio recording categorization"""
-    categories_text = "\n".join([f"- {key}: {desc}" for key, desc in AUDIO_CATEGORIES.items()])
-    duration_info = f"Duration: {int(duration)} seconds" if duration else "Duration: Unknown"
-
-    return f"""Analyze this transcribed audio recording and provide categorization.
-
-{duration_info}
+AUDIO_CATEGORIZATION_INSTRUCTIONS = f"""
+You are a medical audio recording classifier. Always respond with valid JSON only.
 
-Transcription:
-{text_sample if text_sample else "[No transcription available]"}
+Analyze the transcribed audio recording you are given and provide categorization.
 
 Please provide your response in this EXACT JSON format (no additional text):
 {{
@@ -255,7 +319,7 @@ Please provide your response in this EXACT JSON format (no additional text):
 }}
 
 Available categories (use the exact value shown):
-{categories_text}
+{_audio_categories_text}
 
 For the summary:
 - Write 1-2 sentences (max 150 characters)
@@ -267,13 +331,17 @@ For the summary:
 """
 
 
-# ============================================================================
-# CLASSIFIER SYSTEM PROMPTS
-# ============================================================================
+def get_audio_categorization_prompt(text_sample: str, duration: float = None) -> str:
+    """Generate prompt for audio recording categorization"""
+    duration_info = f"Duration: {int(duration)} seconds" if duration else "Duration: Unknown"
 
-DOCUMENT_CLASSIFIER_PROMPT = "You are a medical document classifier. Always respond with valid JSON only."
+    return f"""Analyze this transcribed audio recording and provide categorization.
 
-AUDIO_CLASSIFIER_PROMPT = "You are a medical audio recording classifier. Always respond with valid JSON only."
+{duration_info}
+
+Transcription:
+{text_sample if text_sample else "[No transcription available]"}
+"""
 
 
 # ============================================================================
@@ -314,6 +382,133 @@ CONTENT DETAIL GUIDELINES:
 
 IMPORTANT: Create entries for all substantive conversations. Only skip entries for pure greetings like "hi" or "thanks"."""
 
+JOURNAL_SYNTHESIS_INSTRUCTIONS = """
+You will be given the recent journal (last 7 days) and a conversation.
+
+Create a journal entry for this conversation. Set should_create to true unless this is just a greeting with no substance (like just "hi" or "thanks").
+
+Choose the appropriate entry type (MEDICAL_UPDATE, TREATMENT_CHANGE, APPOINTMENT, QUESTION, INSIGHT, or MILESTONE).
+
+Adjust detail level based on importance:
+- Important topics (test results, new diagnoses, treatment changes) = detailed entry with context
+- Routine topics (general questions, simple updates) = brief entry (1-2 sentences)
+- Significant moments (milestones, major decisions) = thoughtful entry
+
+IMPORTANT: Respond with ONLY a valid JSON object in this exact format, with no additional text before or after:
+{
+  "should_create": true or false,
+  "reasoning": "brief explanation",
+  "suggested_entries": [
+    {
+      "title": "entry title (max 100 chars)",
+      "content": "entry content",
+      "entry_type": "MEDICAL_UPDATE or TREATMENT_CHANGE or APPOINTMENT or QUESTION or INSIGHT or MILESTONE"
+    }
+  ]
+}"""
+
+
+# How each chat message produces journal entries:
+# - "two_call": chat reply first, then a separate synthesis call (assess_and_synthesize)
+# - "single_call": one structured-output call returns the reply and the journal entries
+CHAT_JOURNAL_MODE = "two_call"
+
+# When "two_call" synthesis runs:
+# - "per_message": one synthesis call after every chat message
+# - "batched": one call over all unsynthesized messages once the session has been
+#   idle for JOURNAL_SYNTHESIS_IDLE_SECONDS or JOURNAL_SYNTHESIS_BATCH_MESSAGES
+#   messages are waiting, whichever comes first
+JOURNAL_SYNTHESIS_MODE = "per_message"
+JOURNAL_SYNTHESIS_IDLE_SECONDS = 300
+JOURNAL_SYNTHESIS_BATCH_MESSAGES = 10
+
+# Skip the synthesis call for exchanges that are only a greeting or
+# acknowledgement ("thanks", "ok got it") with a short reply
+# (see services/synthesis_prefilter.py)
+JOURNAL_PREFILTER_ENABLED = True
+JOURNAL_PREFILTER_MAX_WORDS = 8
+JOURNAL_PREFILTER_MAX_CHARS = 60
+JOURNAL_PREFILTER_MAX_REPLY_TOKENS = 80
+
+CHAT_WITH_JOURNAL_SYNTHESIS_INSTRUCTIONS = f"""
+Respond with a JSON object containing your reply and journal entries for this exchange.
+
+- "reply": Your response to the caregiver's latest message, following all conversation instructions above (markdown allowed).
+- "should_create", "reasoning", "suggested_entries": Journal entries capturing the caregiver's latest message and your reply.
+
+Journal entry rules:
+{JOURNAL_SYNTHESIS_PROMPT}
+
+Titles must be at most 100 characters. Do not duplicate facts already recorded in the care journal above."""
+
+
+# ============================================================================
+# CONVERSATION SUMMARY
+# ============================================================================
+# Long sessions keep a rolling summary of older turns on the session row.
+# Chat prompts include that summary ahead of the recent messages that are not
+# yet summarized, so prompt size stays bounded however long the session grows.
+
+CONVERSATION_SUMMARY_INSTRUCTIONS = """
+You maintain a running summary of a caregiver's conversation with AretaCare.
+
+You will be given the current summary (possibly empty) and the next messages of the conversation. Return an updated summary that:
+- Keeps facts the caregiver shared: symptoms, test results, medications, appointments, care team members, decisions
+- Keeps open questions and anything AretaCare offered to follow up on
+- Drops greetings, small talk and details superseded by later messages
+- Is written as concise bullet points grouped by topic, at most 400 words
+
+Respond with only the updated summary."""
+
+
+def get_conversation_summary_prompt(current_summary: str, transcript: str) -> str:
+    """Generate prompt for folding new messages into the conversation summary"""
+    return f"""Current summary:
+{current_summary or "(none yet)"}
+
+New messages:
+{transcript}"""
+
+
+# Update the summary once this many messages older than the recent window
+# (MAX_CONVERSATION_CONTEXT) are not yet summarized
+CONVERSATION_SUMMARY_THRESHOLD = 10
+
+# Maximum messages folded into the summary per update; long existing sessions
+# catch up over several turns
+CONVERSATION_SUMMARY_MAX_BATCH = 50
+
+
+# ============================================================================
+# JOURNAL MONTHLY ROLLUPS
+# ============================================================================
+# Each month that ended more than JOURNAL_ROLLUP_AGE_DAYS ago is summarized
+# once into `journal_monthly_rollups`. Journal context and daily plans read
+# those rows for older history instead of every entry.
+
+JOURNAL_ROLLUPS_ENABLED = True
+JOURNAL_ROLLUP_AGE_DAYS = 30
+
+JOURNAL_ROLLUP_INSTRUCTIONS = """
+You summarize one month of a caregiver's care journal for later reference.
+
+You will be given every journal entry from the month. Return a compact summary that:
+- Keeps diagnoses, test results, medication and treatment changes, procedures and appointments, with their dates
+- Keeps care team members, decisions made and questions that were still open
+- Notes how symptoms and the patient's condition changed over the month
+- Drops repetition and day-to-day detail with no lasting significance
+- Is written as concise bullet points, at most 250 words
+
+Respond with only the summary."""
+
+
+def get_journal_rollup_prompt(month_label: str, entries_text: str) -> str:
+    """Generate prompt for summarizing one month of journal entries"""
+    return f"""Month: {month_label}
+
+Journal entries:
+{entries_text}"""
+
 
 # ============================================================================
 # DAILY PLAN GENERATION
@@ -351,14 +546,150 @@ Format the plan in markdown with clear sections and bullet points for easy readi
 # CONTEXT SETTINGS
 # ============================================================================
 
-# Maximum number of conversation messages to include in context
+# Recent conversation messages kept out of the rolling summary (journal chat
+# sends every message the summary does not cover yet; plain chat sends this many)
 MAX_CONVERSATION_CONTEXT = 10
 
 # Maximum number of messages for medical summary context
 MAX_SUMMARY_CONTEXT = 5
 
-# Maximum tokens for journal context (approximate: 1 token ≈ 4 characters)
+# Chain chat turns with the Responses API's stored conversation state
+# (previous_response_id) instead of re-sending prompts, journal and history.
+# The chain restarts with a full replay after a user journal edit or after
+# MAX_CHAINED_TURNS turns, so the server-side context stays bounded.
+USE_SERVER_CONVERSATION_STATE = False
+MAX_CHAINED_TURNS = 20
+
+# Maximum tokens for journal context. Whole entries are added newest tier
+# first until the allowance is used; the rest are noted as omitted.
 MAX_JOURNAL_TOKENS = 10000
 
+# Relevance-ranked journal context: when a prompt has a query (the chat
+# message, term or situation), include the JOURNAL_RECENT_ENTRIES newest entries
+# plus the JOURNAL_RETRIEVAL_TOP_K best BM25 matches instead of the whole
+# journal. Journals small enough to fit both are still included in full.
+JOURNAL_RETRIEVAL_ENABLED = True
+JOURNAL_RETRIEVAL_TOP_K = 8
+JOURNAL_RECENT_ENTRIES = 5
+
+# Near-duplicate AI journal entries: before an AI entry is saved, entries
+# within JOURNAL_DEDUP_WINDOW_DAYS whose estimated shingle similarity is at
+# least JOURNAL_DEDUP_THRESHOLD absorb it instead of a new row being created
+JOURNAL_DEDUP_ENABLED = True
+JOURNAL_DEDUP_THRESHOLD = 0.7
+JOURNAL_DEDUP_WINDOW_DAYS = 7
+
+# Store the tiered journal context per session (journal_context_snapshots) and
+# reuse it until an entry or rollup changes or the date moves entries between tiers
+JOURNAL_CONTEXT_SNAPSHOTS_ENABLED = True
+
+# Document retrieval: uploads are split into chunks of about
+# DOCUMENT_CHUNK_TOKENS tokens, and prompts include only the chunks relevant to
+# the question. Chat about an attached PDF/text file sends its chunks instead
+# of the file; other chat turns and daily plans get the
+# DOCUMENT_RETRIEVAL_TOP_K best chunks across the session's documents that
+# share at least DOCUMENT_RETRIEVAL_MIN_MATCHED_TERMS terms with the question
+# (greetings and acknowledgements get none).
+DOCUMENT_RETRIEVAL_ENABLED = True
+DOCUMENT_CHUNK_TOKENS = 500
+DOCUMENT_RETRIEVAL_TOP_K = 4
+DOCUMENT_RETRIEVAL_MIN_MATCHED_TERMS = 2
+
+# Upload documents sent to the model as files (images, PDFs without text
+# chunks) once to OpenAI file storage and reference them by file id, instead
+# of a presigned S3 URL the provider downloads again every turn
+USE_PROVIDER_FILE_STORAGE = False
+
+# Images sent to vision models use a downscaled JPEG copy (stored next to the
+# original in S3) when the original is larger than these bounds.
+# VISION_IMAGE_DETAIL: "low" (fixed small token cost), "high" or "auto"
+VISION_IMAGE_MAX_SIDE = 1536
+VISION_IMAGE_MAX_BYTES = 1024 * 1024
+VISION_IMAGE_JPEG_QUALITY = 85
+VISION_IMAGE_DETAIL = "auto"
+
+# Sessions whose journal index is kept in memory per worker
+JOURNAL_INDEX_MAX_SESSIONS = 200
+
+# Token allowances for the other prompt sections (see services/prompt_budget.py).
+# "system" is only checked and logged; history keeps the newest whole messages
+# and documents are cut on paragraph boundaries.
+PROMPT_SECTION_TOKENS = {
+    "system": 3000,
+    "history": 4000,
+    "document": 8000,
+}
+
+# tiktoken encoding used to count tokens (falls back to ~4 characters per
+# token if tiktoken or the encoding file is unavailable)
+TOKENIZER_ENCODING = "o200k_base"
+
 # Journal context marker (used to detect empty journal)
 EMPTY_JOURNAL_MARKER = "# Care Journal\n\nNo journal entries yet."
+
+
+# ============================================================================
+# RESPONSE CACHE
+# ============================================================================
+
+# Tasks whose responses are cached, mapped to a TTL in seconds. Only tasks that
+# are deterministic for a given input belong here; chat is never cached.
+# The cache key covers the model and the full input (including journal
+# context), so a changed journal produces a new key.
+LLM_CACHE_TTL_SECONDS = {
+    "medical_summary": 7 * 24 * 3600,
+    "jargon_translation": 7 * 24 * 3600,
+    "conversation_coaching": 24 * 3600,
+}
+
+# Maximum entries held in the in-process LRU tier
+LLM_CACHE_MAX_ENTRIES = 1000
+
+# Also store cached responses in Postgres so they survive restarts and are
+# shared between backend instances
+LLM_CACHE_USE_DATABASE = False
+
+
+# ============================================================================
+# RATE LIMITS
+# ============================================================================
+
+# Model calls are queued (not failed) once these limits are reached.
+# Set them just below the organization's OpenAI limits for CHAT_MODEL.
+LLM_MAX_CONCURRENT_REQUESTS = 8
+LLM_TOKENS_PER_MINUTE = 200000
+
+# Slots that only interactive chat may use, so categorization, synthesis and
+# daily plans cannot occupy every connection during an upload burst
+LLM_INTERACTIVE_RESERVED_SLOTS = 2
+
+# Output tokens assumed per call when budgeting (input is estimated from length)
+LLM_ESTIMATED_OUTPUT_TOKENS = 1000
+
+# Retries for 429 / 5xx / connection errors, with jittered exponential backoff
+# (or the server's retry-after / rate-limit reset time when provided)
+LLM_MAX_RETRIES = 5
+LLM_RETRY_BASE_SECONDS = 1.0
+LLM_RETRY_MAX_SECONDS = 60.0
+
+# Per-call deadlines are set per task in MODEL_PROFILES ("timeout").
+
+# Whole-request deadlines in seconds (see core/request_deadline.py). Model, S3
+# and OCR calls made for the request are bounded by the time left, and the
+# request's work is cancelled if the client disconnects first; the client
+# connection is checked every REQUEST_DISCONNECT_POLL_SECONDS.
+REQUEST_DEADLINE_SECONDS = {
+    "chat": 120,
+    "daily_plan": 180,
+}
+REQUEST_DISCONNECT_POLL_SECONDS = 0.5
+
+# Longest OCR run for one image (shortened further by a request deadline)
+OCR_TIMEOUT_SECONDS = 60
+
+# Circuit breaker: after this many consecutive timeouts / connection errors /
+# 5xx responses, model calls fail immediately with fallbacks and optional AI
+# work (categorization, journal synthesis) is skipped. After the reset period
+# a single probe call tests whether the API has recovered.
+LLM_BREAKER_FAILURE_THRESHOLD = 5
+LLM_BREAKER_RESET_SECONDS = 30
@@ -0,0 +1,122 @@
+"""
+Circuit breaker for the OpenAI dependency.
+
+After `failure_threshold` consecutive failed model calls (timeouts, connection
+errors, 5xx) the circuit opens: calls fail immediately with `CircuitOpenError`
+so endpoints return their fallbacks instead of waiting on a dead upstream, and
+optional work (categorization, journal synthesis) is skipped. After
+`reset_seconds` one probe call is let through (half-open); its success closes
+the circuit, its failure re-opens it.
+"""
+from app.config import ai_config
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Optional
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = ai_config.LLM_BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = ai_config.LLM_BREAKER_RESET_SECONDS
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_failure: Optional[str] = None
+        self._last_state_change = datetime.utcnow()
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            return CircuitState.HALF_OPEN
+        return self._state
+
+    @property
+    def is_degraded(self) -> bool:
+        """True while the dependency is failing; optional work should be skipped"""
+        return self.state != CircuitState.CLOSED
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError unless a call may be made now.
+
+        Returns True if the call is the half-open probe; the caller passes
+        that back to `release_probe` / `record_failure`, so only the probe's
+        own outcome settles it.
+        """
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return False
+        if state == CircuitState.HALF_OPEN and not self._probe_in_flight:
+            # Let exactly one probe through to test recovery
+            self._probe_in_flight = True
+            return True
+        raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def release_probe(self, probe: bool) -> None:
+        """Give up the probe slot without a result (e.g. the probe was cancelled)"""
+        if probe:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self._probe_in_flight = False
+        self._consecutive_failures = 0
+        if self._state != CircuitState.CLOSED:
+            logger.info(f"{self.name} circuit closed: dependency recovered")
+            self._set_state(CircuitState.CLOSED)
+
+    def record_failure(self, error: Exception, probe: bool = False) -> None:
+        self._last_failure = f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+        self._consecutive_failures += 1
+        if probe:
+            self._probe_in_flight = False
+        if probe or self._consecutive_failures >= self.failure_threshold:
+            if self._state != CircuitState.OPEN or probe:
+                logger.error(
+                    f"{self.name} circuit opened after {self._consecutive_failures} consecutive failures: {self._last_failure}"
+                )
+            self._opened_at = time.monotonic()
+            self._set_state(CircuitState.OPEN)
+
+    def _set_state(self, state: CircuitState) -> None:
+        if state != self._state:
+            self._state = state
+            self._last_state_change = datetime.utcnow()
+
+    def snapshot(self) -> Dict:
+        state = self.state
+        retry_in = None
+        if state == CircuitState.OPEN:
+            retry_in = round(max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at)), 1)
+        return {
+            "name": self.name,
+            "state": state.value,
+            "consecutive_failures": self._consecutive_failures,
+            "last_failure": self._last_failure,
+            "last_state_change": self._last_state_change,
+            "retry_in_seconds": retry_in,
+        }
+
+
+openai_circuit = CircuitBreaker("openai")
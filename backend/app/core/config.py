@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -8,6 +8,7 @@ class Settings(BaseSettings):
 
     # OpenAI
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: Optional[str] = None  # Override to point at a proxy or a local fake API server
 
     # AWS S3
     AWS_ACCESS_KEY_ID: str
@@ -0,0 +1,468 @@
+"""
+Admission control for OpenAI requests.
+
+Every model call goes through `llm_scheduler.run` (or `llm_scheduler.stream`
+for streamed replies), which queues the call until it fits within the
+concurrency limit and the tokens-per-minute budget, then retries rate-limited
+or overloaded responses with jittered backoff instead of failing the request.
+A streamed call holds its slot until the stream has been consumed.
+
+The scheduler adapts to the API's own limits: the shared HTTP client reports
+the `x-ratelimit-*` headers of every response via `observe_headers`, and a 429
+halves the concurrency limit (growing back one slot at a time on success) and
+pauses all admissions until the advertised reset time. 5xx and connection
+errors only back off the failing call, so one bad call does not stall the
+others.
+
+Each call carries a `Priority`. Waiting calls are admitted in priority order,
+and `ai_config.LLM_INTERACTIVE_RESERVED_SLOTS` slots are held back for
+interactive chat so background work cannot occupy every connection.
+
+Calls are also guarded by `openai_circuit`: each attempt has a per-task
+deadline, and while the circuit is open calls fail fast with
+`CircuitOpenError` instead of queueing or retrying. Inside a request with a
+deadline (core/request_deadline.py) each attempt is also bounded by the time
+the request has left; running out raises `DeadlineExceeded` without retrying.
+"""
+from app.config import ai_config
+from app.core.circuit_breaker import CircuitOpenError, openai_circuit
+from app.core.request_deadline import DeadlineExceeded, bound
+from collections import deque
+from enum import IntEnum
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import random
+import re
+import time
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+TOKEN_WINDOW_SECONDS = 60.0
+
+
+class Priority(IntEnum):
+    """Scheduling class of a model call; lower values are admitted first"""
+    INTERACTIVE = 0  # A user is waiting on a chat reply
+    STANDARD = 1     # User-initiated tools (summaries, translations, transcription)
+    BACKGROUND = 2   # Categorization, journal synthesis, daily plans, offline jobs
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse rate-limit reset values such as "1s", "6m0s" or "20ms" into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def estimate_tokens(messages: List[Dict]) -> int:
+    """Rough token estimate for a request: input characters / 4 plus expected output"""
+    return len(json.dumps(messages, default=str)) // 4 + ai_config.LLM_ESTIMATED_OUTPUT_TOKENS
+
+
+class LLMScheduler:
+    """Queue model calls behind concurrency, token and server rate limits"""
+
+    def __init__(
+        self,
+        max_concurrency: int = ai_config.LLM_MAX_CONCURRENT_REQUESTS,
+        tokens_per_minute: int = ai_config.LLM_TOKENS_PER_MINUTE,
+        max_retries: int = ai_config.LLM_MAX_RETRIES
+    ):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+
+        # Adaptive concurrency limit: halved on 429, regains one slot per
+        # `limit` successful calls, up to max_concurrency
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+        self._queue: List[Tuple[int, int]] = []
+        self._tickets = itertools.count()
+        self._condition: Optional[asyncio.Condition] = None
+        # (monotonic timestamp, tokens) debits within the last minute
+        self._token_window: Deque[List] = deque()
+        self._paused_until = 0.0
+
+        self._stats = {
+            "completed": 0,
+            "failed": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "timed_out": 0,
+            "rejected_open_circuit": 0,
+            "deadline_exceeded": 0,
+        }
+        self._wait_stats: Dict[str, Dict[str, float]] = {
+            p.name.lower(): {"admitted": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0} for p in Priority
+        }
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        task: str,
+        estimated_tokens: int = 0,
+        priority: Priority = Priority.STANDARD
+    ) -> T:
+        """Run `call` once admitted, retrying rate limits and transient errors.
+
+        `call` must be safe to invoke again on retry. Each attempt is bounded by
+        the task's profile timeout in `ai_config.MODEL_PROFILES`. Non-retryable
+        errors, retries beyond `max_retries` and calls made while the circuit
+        is open are raised to the caller.
+        """
+        timeout = ai_config.get_model_profile(task)["timeout"]
+        attempt = 0
+        backoff = 0.0
+        while True:
+            if backoff:
+                # This call's own backoff; other calls keep being admitted
+                await asyncio.sleep(backoff)
+            debit = await self._acquire(estimated_tokens, priority)
+            probe = False
+            try:
+                probe = openai_circuit.before_call()
+                result = await self._attempt(call, timeout, task)
+            except CircuitOpenError:
+                debit[1] = 0
+                self._stats["rejected_open_circuit"] += 1
+                raise
+            except DeadlineExceeded:
+                # The request ran out of time, not the API: no verdict on the dependency
+                debit[1] = 0
+                self._stats["deadline_exceeded"] += 1
+                openai_circuit.release_probe(probe)
+                raise
+            except Exception as e:
+                # A rejected call consumed no tokens
+                debit[1] = 0
+                backoff = self._after_failure(e, attempt, task, probe)
+                if backoff is None:
+                    raise
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled mid-call: no verdict on the dependency
+                openai_circuit.release_probe(probe)
+                raise
+            finally:
+                await self._release()
+
+            openai_circuit.record_success()
+            self._on_success(debit, result)
+            return result
+
+    async def stream(
+        self,
+        open_stream: Callable[[], Awaitable],
+        task: str,
+        estimated_tokens: int = 0,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> AsyncIterator:
+        """Open a streaming call once admitted and yield its events.
+
+        The call keeps its slot until the stream is consumed or closed, so
+        token generation counts against the concurrency limit. Opening the
+        stream is bounded by the profile's `timeout` and the whole stream by
+        its `stream_timeout`. Failures before the first event are retried like
+        `run`; later failures are raised, since events already reached the
+        caller. The token debit is settled with the usage reported by the
+        `response.completed` event.
+
+        Close the generator (e.g. with `contextlib.aclosing`) when stopping
+        early, so the connection and the slot are released right away.
+        """
+        profile = ai_config.get_model_profile(task)
+        timeout = profile["timeout"]
+        stream_timeout = profile.get("stream_timeout", timeout)
+        attempt = 0
+        backoff = 0.0
+        while True:
+            if backoff:
+                await asyncio.sleep(backoff)
+            debit = await self._acquire(estimated_tokens, priority)
+            probe = False
+            stream = None
+            started = False
+            completed = None
+            try:
+                probe = openai_circuit.before_call()
+                ends_at = time.monotonic() + stream_timeout
+                stream = await self._attempt(open_stream, timeout, task)
+                events = stream.__aiter__()
+                while True:
+                    try:
+                        event = await self._attempt(events.__anext__, ends_at - time.monotonic(), task)
+                    except StopAsyncIteration:
+                        break
+                    started = True
+                    if getattr(event, "type", None) == "response.completed":
+                        completed = event.response
+                    yield event
+            except CircuitOpenError:
+                debit[1] = 0
+                self._stats["rejected_open_circuit"] += 1
+                raise
+            except DeadlineExceeded:
+                if not started:
+                    debit[1] = 0
+                self._stats["deadline_exceeded"] += 1
+                openai_circuit.release_probe(probe)
+                raise
+            except Exception as e:
+                # Tokens generated before a mid-stream failure stay debited
+                if not started:
+                    debit[1] = 0
+                backoff = self._after_failure(e, attempt, task, probe, retry=not started)
+                if backoff is None:
+                    raise
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled or closed early: no verdict on the dependency
+                openai_circuit.release_probe(probe)
+                raise
+            finally:
+                if stream is not None:
+                    try:
+                        await stream.close()
+                    except Exception as e:
+                        logger.debug(f"Closing {task} stream failed: {e}")
+                await self._release()
+
+            openai_circuit.record_success()
+            self._on_success(debit, completed)
+            return
+
+    @staticmethod
+    async def _attempt(call: Callable[[], Awaitable[T]], timeout: float, task: str) -> T:
+        """Await `call()` within `timeout`, shortened to the request's time left"""
+        attempt_timeout = bound(timeout)
+        try:
+            return await asyncio.wait_for(call(), timeout=attempt_timeout)
+        except asyncio.TimeoutError as e:
+            if attempt_timeout < timeout:
+                raise DeadlineExceeded(f"Request deadline reached during {task}") from e
+            raise
+
+    def _after_failure(
+        self, error: Exception, attempt: int, task: str, probe: bool, retry: bool = True
+    ) -> Optional[float]:
+        """Record a failed attempt; return the backoff before retrying, or None to raise"""
+        if isinstance(error, asyncio.TimeoutError):
+            self._stats["timed_out"] += 1
+        if self._is_dependency_failure(error):
+            openai_circuit.record_failure(error, probe=probe)
+        else:
+            # Any API response (even a 4xx) shows the dependency is reachable
+            openai_circuit.record_success()
+        delay = self._retry_delay(error, attempt) if retry else None
+        if delay is None or attempt >= self.max_retries or openai_circuit.is_degraded:
+            self._stats["failed"] += 1
+            return None
+        self._stats["retries"] += 1
+        logger.warning(
+            f"Model call for {task} failed ({type(error).__name__}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+        )
+        if isinstance(error, openai.RateLimitError):
+            # The account is over its limit: hold back every call
+            self._pause(delay)
+            return 0.0
+        return delay
+
+    def _slot_limit(self, priority: Priority) -> int:
+        """Concurrent calls allowed for a priority class"""
+        limit = max(1, int(self._limit))
+        if priority == Priority.INTERACTIVE:
+            return limit
+        return max(1, limit - ai_config.LLM_INTERACTIVE_RESERVED_SLOTS)
+
+    async def _acquire(self, tokens: int, priority: Priority) -> List:
+        enqueued_at = time.monotonic()
+        condition = self.condition
+
+        async with condition:
+            ticket = (int(priority), next(self._tickets))
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    if self._queue[0] == ticket and self._in_flight < self._slot_limit(priority):
+                        delay = self._budget_delay(tokens)
+                        if delay <= 0:
+                            break
+                        try:
+                            await asyncio.wait_for(condition.wait(), timeout=delay)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+                    await condition.wait()
+            except BaseException:
+                # Cancelled while queued: give up the ticket so the queue can advance
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                condition.notify_all()
+                raise
+
+            heapq.heappop(self._queue)
+            self._in_flight += 1
+            debit = [time.monotonic(), tokens]
+            self._token_window.append(debit)
+            condition.notify_all()
+
+        waited_ms = (time.monotonic() - enqueued_at) * 1000
+        wait_stats = self._wait_stats[priority.name.lower()]
+        wait_stats["admitted"] += 1
+        wait_stats["wait_ms_total"] += waited_ms
+        wait_stats["wait_ms_max"] = max(wait_stats["wait_ms_max"], waited_ms)
+        return debit
+
+    async def _release(self) -> None:
+        async with self.condition:
+            self._in_flight -= 1
+            self.condition.notify_all()
+
+    def _budget_delay(self, tokens: int) -> float:
+        """Seconds until the next call may start under the pause and token budget"""
+        now = time.monotonic()
+        if self._paused_until > now:
+            return self._paused_until - now
+
+        while self._token_window and now - self._token_window[0][0] >= TOKEN_WINDOW_SECONDS:
+            self._token_window.popleft()
+        used = sum(tokens_used for _, tokens_used in self._token_window)
+        if self._token_window and used + tokens > self.tokens_per_minute:
+            return self._token_window[0][0] + TOKEN_WINDOW_SECONDS - now
+        return 0.0
+
+    def _on_success(self, debit: List, result) -> None:
+        self._stats["completed"] += 1
+        self._limit = min(float(self.max_concurrency), self._limit + 1.0 / max(1.0, self._limit))
+        # Replace the estimate with the actual usage when the response reports it
+        usage = getattr(result, "usage", None)
+        total_tokens = getattr(usage, "total_tokens", None)
+        if isinstance(total_tokens, int):
+            debit[1] = total_tokens
+
+    def _pause(self, delay: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    @staticmethod
+    def _is_dependency_failure(error: Exception) -> bool:
+        """Errors that indicate the API is down or too slow (counted by the circuit breaker)"""
+        if isinstance(error, (asyncio.TimeoutError, openai.APIConnectionError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Backoff for a retryable error, or None if the error should be raised"""
+        if isinstance(error, openai.RateLimitError):
+            self._stats["rate_limited"] += 1
+            self._limit = max(1.0, self._limit / 2)
+        elif isinstance(error, openai.APIStatusError):
+            if error.status_code not in (500, 502, 503, 504):
+                return None
+        elif not isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return None
+
+        backoff = min(
+            ai_config.LLM_RETRY_MAX_SECONDS,
+            ai_config.LLM_RETRY_BASE_SECONDS * (2 ** attempt)
+        )
+        response = getattr(error, "response", None)
+        advised = self._advised_delay(response.headers) if response is not None else None
+        if advised is not None:
+            # Honor the server's reset time, with jitter so waiters do not stampede
+            return min(ai_config.LLM_RETRY_MAX_SECONDS, advised) * random.uniform(1.0, 1.25)
+        return random.uniform(backoff / 2, backoff)
+
+    @staticmethod
+    def _advised_delay(headers) -> Optional[float]:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000
+            except ValueError:
+                pass
+        delays = [
+            parse_reset_duration(headers.get(name))
+            for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+        ]
+        delays = [d for d in delays if d is not None]
+        return max(delays) if delays else None
+
+    def observe_headers(self, headers) -> None:
+        """Pause admissions when the API reports an exhausted request or token limit"""
+        for remaining_name, reset_name in (
+            ("x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+            ("x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+        ):
+            remaining = headers.get(remaining_name)
+            if remaining is None:
+                continue
+            try:
+                exhausted = int(remaining) <= 0
+            except ValueError:
+                continue
+            if exhausted:
+                reset = parse_reset_duration(headers.get(reset_name))
+                if reset:
+                    self._pause(reset)
+
+    def stats(self) -> Dict:
+        """Queue depth, concurrency and wait times per priority since startup"""
+        now = time.monotonic()
+        priorities = {}
+        for priority in Priority:
+            wait_stats = self._wait_stats[priority.name.lower()]
+            admitted = int(wait_stats["admitted"])
+            priorities[priority.name.lower()] = {
+                "queued": sum(1 for queued_priority, _ in self._queue if queued_priority == priority),
+                "admitted": admitted,
+                "avg_wait_ms": round(wait_stats["wait_ms_total"] / admitted, 1) if admitted else None,
+                "max_wait_ms": round(wait_stats["wait_ms_max"], 1),
+            }
+        return {
+            "queue_depth": len(self._queue),
+            "in_flight": self._in_flight,
+            "concurrency_limit": max(1, int(self._limit)),
+            "max_concurrency": self.max_concurrency,
+            "tokens_last_minute": sum(
+                tokens for ts, tokens in self._token_window if now - ts < TOKEN_WINDOW_SECONDS
+            ),
+            "tokens_per_minute": self.tokens_per_minute,
+            "paused_for_seconds": round(max(0.0, self._paused_until - now), 1),
+            "completed": self._stats["completed"],
+            "failed": self._stats["failed"],
+            "retries": self._stats["retries"],
+            "rate_limited": self._stats["rate_limited"],
+            "timed_out": self._stats["timed_out"],
+            "rejected_open_circuit": self._stats["rejected_open_circuit"],
+            "deadline_exceeded": self._stats["deadline_exceeded"],
+            "priorities": priorities,
+        }
+
+
+llm_scheduler = LLMScheduler()
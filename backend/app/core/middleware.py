@@ -0,0 +1,20 @@
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import Receive, Scope, Send
+
+
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """GZip middleware that leaves server-sent event streams untouched.
+
+    Compressing an event stream makes the compressor hold back small frames
+    until enough bytes accumulate, which defeats token-by-token streaming.
+    Requests that ask for `text/event-stream` are passed straight through.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            if "text/event-stream" in headers.get("Accept", ""):
+                await self.app(scope, receive, send)
+                return
+        await super().__call__(scope, receive, send)
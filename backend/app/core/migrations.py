@@ -60,6 +60,51 @@ def run_migrations():
             else:
                 logger.info("ai_description column already exists in documents")
 
+            # Add model_image_s3_key column if it doesn't exist
+            if 'model_image_s3_key' not in columns:
+                logger.info("Adding model_image_s3_key column to documents table...")
+                try:
+                    conn.execute(text(
+                        "ALTER TABLE documents ADD COLUMN model_image_s3_key VARCHAR NULL"
+                    ))
+                    conn.commit()
+                    logger.info("Successfully added model_image_s3_key column to documents")
+                except Exception as e:
+                    logger.error(f"Failed to add model_image_s3_key column to documents: {e}")
+                    conn.rollback()
+            else:
+                logger.info("model_image_s3_key column already exists in documents")
+
+            # Add provider_file_id column if it doesn't exist
+            if 'provider_file_id' not in columns:
+                logger.info("Adding provider_file_id column to documents table...")
+                try:
+                    conn.execute(text(
+                        "ALTER TABLE documents ADD COLUMN provider_file_id VARCHAR NULL"
+                    ))
+                    conn.commit()
+                    logger.info("Successfully added provider_file_id column to documents")
+                except Exception as e:
+                    logger.error(f"Failed to add provider_file_id column to documents: {e}")
+                    conn.rollback()
+            else:
+                logger.info("provider_file_id column already exists in documents")
+
+            # Add category_source column if it doesn't exist
+            if 'category_source' not in columns:
+                logger.info("Adding category_source column to documents table...")
+                try:
+                    conn.execute(text(
+                        "ALTER TABLE documents ADD COLUMN category_source VARCHAR NULL"
+                    ))
+                    conn.commit()
+                    logger.info("Successfully added category_source column to documents")
+                except Exception as e:
+                    logger.error(f"Failed to add category_source column to documents: {e}")
+                    conn.rollback()
+            else:
+                logger.info("category_source column already exists in documents")
+
         # Check if audio_recordings table exists
         if 'audio_recordings' in inspector.get_table_names():
             columns = [col['name'] for col in inspector.get_columns('audio_recordings')]
@@ -109,6 +154,40 @@ def run_migrations():
             else:
                 logger.info("description column already removed")
 
+            # Add category_source column if it doesn't exist
+            if 'category_source' not in columns:
+                logger.info("Adding category_source column to audio_recordings table...")
+                try:
+                    conn.execute(text(
+                        "ALTER TABLE audio_recordings ADD COLUMN category_source VARCHAR NULL"
+                    ))
+                    conn.commit()
+                    logger.info("Successfully added category_source column to audio_recordings")
+                except Exception as e:
+                    logger.error(f"Failed to add category_source column to audio_recordings: {e}")
+                    conn.rollback()
+            else:
+                logger.info("category_source column already exists in audio_recordings")
+
+        # Check if conversations table exists
+        if 'conversations' in inspector.get_table_names():
+            columns = [col['name'] for col in inspector.get_columns('conversations')]
+
+            # Add synthesis_status column if it doesn't exist
+            if 'synthesis_status' not in columns:
+                logger.info("Adding synthesis_status column to conversations table...")
+                try:
+                    conn.execute(text(
+                        "ALTER TABLE conversations ADD COLUMN synthesis_status VARCHAR NULL"
+                    ))
+                    conn.commit()
+                    logger.info("Successfully added synthesis_status column")
+                except Exception as e:
+                    logger.error(f"Failed to add synthesis_status column: {e}")
+                    conn.rollback()
+            else:
+                logger.info("synthesis_status column already exists")
+
         # Check if users table exists
         if 'users' in inspector.get_table_names():
             columns = [col['name'] for col in inspector.get_columns('users')]
@@ -241,6 +320,58 @@ def run_migrations():
             else:
                 logger.info("owner_id column already exists in sessions")
 
+            # Add journal_edited_at column if it doesn't exist
+            if 'journal_edited_at' not in columns:
+                logger.info("Adding journal_edited_at column to sessions table...")
+                try:
+                    conn.execute(text(
+                        "ALTER TABLE sessions ADD COLUMN journal_edited_at TIMESTAMP NULL"
+                    ))
+                    conn.commit()
+                    logger.info("Successfully added journal_edited_at column to sessions")
+                except Exception as e:
+                    logger.error(f"Failed to add journal_edited_at column to sessions: {e}")
+                    conn.rollback()
+            else:
+                logger.info("journal_edited_at column already exists in sessions")
+
+            # Add rolling conversation summary columns if they don't exist
+            if 'conversation_summary' not in columns:
+                logger.info("Adding conversation summary columns to sessions table...")
+                try:
+                    conn.execute(text(
+                        "ALTER TABLE sessions ADD COLUMN conversation_summary TEXT NULL"
+                    ))
+                    conn.execute(text(
+                        "ALTER TABLE sessions ADD COLUMN summary_through_message_id INTEGER NULL"
+                    ))
+                    conn.commit()
+                    logger.info("Successfully added conversation summary columns to sessions")
+                except Exception as e:
+                    logger.error(f"Failed to add conversation summary columns to sessions: {e}")
+                    conn.rollback()
+            else:
+                logger.info("conversation_summary column already exists in sessions")
+
+        # Check if classifier_models table exists
+        if 'classifier_models' in inspector.get_table_names():
+            columns = [col['name'] for col in inspector.get_columns('classifier_models')]
+
+            # Add validation_accuracy column if it doesn't exist
+            if 'validation_accuracy' not in columns:
+                logger.info("Adding validation_accuracy column to classifier_models table...")
+                try:
+                    conn.execute(text(
+                        "ALTER TABLE classifier_models ADD COLUMN validation_accuracy DOUBLE PRECISION NULL"
+                    ))
+                    conn.commit()
+                    logger.info("Successfully added validation_accuracy column to classifier_models")
+                except Exception as e:
+                    logger.error(f"Failed to add validation_accuracy column to classifier_models: {e}")
+                    conn.rollback()
+            else:
+                logger.info("validation_accuracy column already exists in classifier_models")
+
         # Create session_collaborators table if it doesn't exist
         if 'session_collaborators' not in inspector.get_table_names():
             logger.info("Creating session_collaborators table...")
@@ -328,6 +459,18 @@ def run_migrations():
             logger.warning(f"Index idx_session_collaborators_user may already exist: {e}")
             conn.rollback()
 
+        # Full-text index on document_chunks for chunk retrieval
+        try:
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_document_chunks_content_fts
+                ON document_chunks USING GIN (to_tsvector('english', content))
+            """))
+            conn.commit()
+            logger.info("Created index idx_document_chunks_content_fts")
+        except Exception as e:
+            logger.warning(f"Index idx_document_chunks_content_fts may already exist: {e}")
+            conn.rollback()
+
         # Add index on journal_entries (session_id, entry_date) for efficient queries
         try:
             conn.execute(text("""
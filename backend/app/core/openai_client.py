@@ -0,0 +1,40 @@
+import httpx
+from openai import AsyncOpenAI
+from app.core.config import settings
+from app.core.llm_scheduler import llm_scheduler
+
+# Process-wide OpenAI client shared by every AI service.
+# A single pooled httpx transport keeps TLS connections to the API alive between
+# calls, so concurrent requests reuse sockets instead of reconnecting.
+# max_connections: Upper bound on simultaneous in-flight model calls
+# max_keepalive_connections: Idle connections kept warm for the next call
+# keepalive_expiry: Drop idle connections before the upstream load balancer does
+
+
+async def _observe_rate_limits(response: httpx.Response):
+    """Feed the API's rate-limit headers to the scheduler"""
+    llm_scheduler.observe_headers(response.headers)
+
+
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=100,
+        max_keepalive_connections=20,
+        keepalive_expiry=30.0,
+    ),
+    timeout=httpx.Timeout(120.0, connect=10.0),
+    event_hooks={"response": [_observe_rate_limits]},
+)
+
+# Retries are handled by llm_scheduler so backoff is coordinated across calls
+openai_client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    base_url=settings.OPENAI_BASE_URL,
+    http_client=http_client,
+    max_retries=0,
+)
+
+
+async def close_openai_client():
+    """Close the shared OpenAI client and its connection pool"""
+    await openai_client.close()
@@ -0,0 +1,133 @@
+"""
+Request-scoped deadlines and cancellation on client disconnect.
+
+`run_request` runs an endpoint's work as a task with a deadline stored in a
+context variable. Model calls (via `llm_scheduler`), S3 calls and OCR bound
+their own timeouts by the time left (`bound`, `run_blocking`), so no single
+call can outlive the request. While the work runs the client connection is
+polled; when the client disconnects or the deadline passes the task is
+cancelled, which cancels the in-flight model call and skips the writes and
+background work that would have followed.
+
+Streamed replies set the deadline with `deadline_scope` inside the response
+generator. Outside these (background jobs, other endpoints) there is no
+request deadline and calls keep their own timeouts.
+"""
+from app.config import ai_config
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fastapi import Request
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Monotonic time by which the current request must finish
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The current request ran out of time.
+
+    Deliberately not a TimeoutError: it says nothing about the health of the
+    dependency being called, so it is neither retried nor counted by the
+    circuit breaker.
+    """
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection before the response was ready"""
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, or None without a request deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def bound(timeout: Optional[float]) -> Optional[float]:
+    """`timeout` shortened to the time left; raises DeadlineExceeded if none is left"""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline reached")
+    return left if timeout is None else min(timeout, left)
+
+
+async def run_blocking(func: Callable[..., T], *args, timeout: Optional[float] = None, **kwargs) -> T:
+    """Run a blocking call in a thread, waiting at most `timeout` / the time left.
+
+    On expiry the caller stops waiting and DeadlineExceeded is raised; the
+    thread itself cannot be interrupted and finishes in the background.
+    """
+    limit = bound(timeout)
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), timeout=limit)
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded(f"{getattr(func, '__name__', 'call')} did not finish in time") from e
+
+
+async def run_request(request: Request, work: Callable[[], Awaitable[T]], deadline_seconds: float) -> T:
+    """Run `work` under a request deadline, cancelling it if the client disconnects.
+
+    Raises ClientDisconnected or DeadlineExceeded after cancelling the work.
+    """
+    deadline = time.monotonic() + deadline_seconds
+
+    async def with_deadline() -> T:
+        _deadline.set(deadline)
+        return await work()
+
+    # The task gets its own copy of the context, so the deadline does not leak
+    task = asyncio.create_task(with_deadline())
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=ai_config.REQUEST_DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                if task.done():
+                    # Finished while the connection was checked: keep its outcome
+                    return task.result()
+                await _cancel(task)
+                logger.info(f"Client disconnected; cancelled {request.method} {request.url.path}")
+                raise ClientDisconnected()
+            if time.monotonic() >= deadline:
+                if task.done():
+                    return task.result()
+                await _cancel(task)
+                logger.warning(f"Request deadline of {deadline_seconds}s reached for {request.method} {request.url.path}")
+                raise DeadlineExceeded("Request deadline reached")
+    except asyncio.CancelledError:
+        # The server cancelled the handler itself (e.g. shutdown)
+        await _cancel(task)
+        raise
+
+
+@contextmanager
+def deadline_scope(deadline_seconds: float) -> Iterator[None]:
+    """Apply a request deadline to the calls made inside the block.
+
+    For streaming responses, whose work runs in the response generator where
+    `run_request` cannot wrap it; disconnects cancel the generator instead.
+    """
+    token = _deadline.set(time.monotonic() + deadline_seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+async def _cancel(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
@@ -1,9 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.gzip import GZipMiddleware
 from app.core.config import settings
 from app.core.database import engine, Base, SessionLocal
 from app.core.migrations import run_migrations
+from app.core.middleware import StreamingAwareGZipMiddleware
+from app.core.openai_client import close_openai_client
 from app.api import api_router
 from app.services.admin_service import admin_service
 import logging
@@ -58,7 +59,8 @@ app = FastAPI(
 
 # Configure GZip compression for responses (30-50% size reduction)
 # minimum_size: Only compress responses larger than 1000 bytes
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Server-sent event streams (Accept: text/event-stream) are never compressed
+app.add_middleware(StreamingAwareGZipMiddleware, minimum_size=1000)
 
 # Configure CORS
 app.add_middleware(
@@ -73,6 +75,12 @@ app.add_middleware(
 app.include_router(api_router, prefix="/api")
 
 
+@app.on_event("shutdown")
+async def shutdown_openai_client():
+    """Release pooled OpenAI connections on shutdown"""
+    await close_openai_client()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -7,9 +7,16 @@ from app.models.audio_recording import AudioRecording, AudioRecordingCategory
 from app.models.journal import JournalEntry, EntryType
 from app.models.daily_plan import DailyPlan
 from app.models.admin_audit_log import AdminAuditLog
+from app.models.llm_cache_entry import LLMCacheEntry
+from app.models.classifier_model import ClassifierModel
+from app.models.document_chunk import DocumentChunk
+from app.models.journal_rollup import JournalMonthlyRollup
+from app.models.journal_context_snapshot import JournalContextSnapshot
 
 __all__ = [
     "User", "Session", "SessionCollaborator", "Document", "DocumentCategory",
     "Conversation", "MessageRole", "AudioRecording", "AudioRecordingCategory",
-    "JournalEntry", "EntryType", "DailyPlan", "AdminAuditLog"
+    "JournalEntry", "EntryType", "DailyPlan", "AdminAuditLog", "LLMCacheEntry",
+    "ClassifierModel", "DocumentChunk", "JournalMonthlyRollup",
+    "JournalContextSnapshot"
 ]
@@ -32,6 +32,7 @@ class AudioRecording(Base):
     transcribed_text = Column(Text, nullable=True)
     category = Column(SQLEnum(AudioRecordingCategory), nullable=True)  # AI-generated category
     ai_summary = Column(Text, nullable=True)  # AI-generated brief summary
+    category_source = Column(String, nullable=True)  # "model", "local" or "fallback" (see local_classifier)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, Integer, Float, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+from app.core.database import Base
+
+
+class ClassifierModel(Base):
+    """
+    Trained weights for a local text classifier.
+
+    One row per classifier (e.g. "document_category", "audio_category"),
+    replaced each time the classifier is retrained from labelled rows. The
+    weights are only used if `validation_accuracy` passes the configured
+    minimum.
+    """
+    __tablename__ = "classifier_models"
+
+    name = Column(String, primary_key=True)
+    weights = Column(JSONB, nullable=False)  # Serialized LinearTextClassifier
+    sample_count = Column(Integer, nullable=False, default=0)
+    training_accuracy = Column(Float, nullable=True)
+    validation_accuracy = Column(Float, nullable=True)  # Accuracy on held-out samples
+    trained_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<ClassifierModel {self.name}: {self.sample_count} samples>"
@@ -18,6 +18,14 @@ class MessageType(str, enum.Enum):
     AUDIO = "audio"
 
 
+class SynthesisStatus(str, enum.Enum):
+    """Lifecycle of the background journal synthesis for a user message"""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
 class Conversation(Base):
     __tablename__ = "conversations"
 
@@ -33,6 +41,7 @@ class Conversation(Base):
     media_url = Column(String, nullable=True)
     extracted_text = Column(Text, nullable=True)
     synthesized_to_journal = Column(Boolean, default=False, nullable=False)
+    synthesis_status = Column(Enum(SynthesisStatus), nullable=True)  # Set on user messages queued for synthesis
     message_metadata = Column(JSONB, nullable=True)
 
     # Relationships
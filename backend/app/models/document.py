@@ -29,6 +29,7 @@ class Document(Base):
     filename = Column(String, nullable=False)
     s3_key = Column(String, nullable=False)
     thumbnail_s3_key = Column(String, nullable=True)  # For PDF thumbnails
+    model_image_s3_key = Column(String, nullable=True)  # Downscaled image copy sent to vision models
     content_type = Column(String, nullable=False)
     extracted_text = Column(Text, nullable=True)
     uploaded_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -36,6 +37,14 @@ class Document(Base):
     # AI-generated metadata
     category = Column(SQLEnum(DocumentCategory), nullable=True, default=DocumentCategory.OTHER)
     ai_description = Column(Text, nullable=True)  # Brief AI-generated summary
+    category_source = Column(String, nullable=True)  # "model", "local" or "fallback" (see local_classifier)
+
+    # OpenAI file storage id, so chat turns reference the file instead of re-fetching it
+    provider_file_id = Column(String, nullable=True)
 
     # Relationships
     session = relationship("Session", back_populates="documents")
+    chunks = relationship(
+        "DocumentChunk", back_populates="document", cascade="all, delete-orphan",
+        order_by="DocumentChunk.chunk_index"
+    )
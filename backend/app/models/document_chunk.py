@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.core.database import Base
+
+
+class DocumentChunk(Base):
+    """
+    Page- or section-sized piece of a document's extracted text.
+
+    Chunks are searched with Postgres full-text search so prompts include only
+    the parts of a session's documents that are relevant to a question.
+    """
+    __tablename__ = "document_chunks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)  # Order within the document
+    page = Column(Integer, nullable=True)  # 1-based PDF page, if known
+    content = Column(Text, nullable=False)
+    token_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Relationships
+    document = relationship("Document", back_populates="chunks")
+
+    __table_args__ = (
+        Index('idx_document_chunks_document_order', 'document_id', 'chunk_index'),
+    )
+
+    def __repr__(self):
+        return f"<DocumentChunk document={self.document_id} #{self.chunk_index}>"
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, ForeignKey
+from datetime import datetime
+from app.core.database import Base
+
+
+class JournalContextSnapshot(Base):
+    """
+    Formatted journal context for a session, kept between requests.
+
+    Every journal change bumps `version` and clears `content`; a snapshot is
+    only written back if `version` is unchanged since its build started, so a
+    build racing an edit can never store stale text. `built_on` is the date
+    the age tiers were computed for.
+    """
+    __tablename__ = "journal_context_snapshots"
+
+    session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    content = Column(Text, nullable=True)  # None until built for the current version
+    entry_count = Column(Integer, nullable=True)  # Journal entries when built
+    max_tokens = Column(Integer, nullable=True)  # Allowance the content was rendered for
+    built_on = Column(Date, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<JournalContextSnapshot session={self.session_id} v{self.version}>"
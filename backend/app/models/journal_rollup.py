@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, ForeignKey, UniqueConstraint
+from datetime import datetime
+from app.core.database import Base
+
+
+class JournalMonthlyRollup(Base):
+    """
+    Precomputed summary of one calendar month of a session's journal.
+
+    Journal context for older history reads these rows instead of every
+    entry of those months. `entry_count` and `source_updated_at` record the
+    entries the summary was built from, so edits make it stale.
+    """
+    __tablename__ = "journal_monthly_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    month = Column(Date, nullable=False)  # First day of the month
+    summary = Column(Text, nullable=False)
+    entry_count = Column(Integer, nullable=False)
+    source_updated_at = Column(DateTime, nullable=False)  # Latest updated_at of the month's entries
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('session_id', 'month', name='uq_journal_monthly_rollups_session_month'),
+    )
+
+    def __repr__(self):
+        return f"<JournalMonthlyRollup session={self.session_id} {self.month:%Y-%m}>"
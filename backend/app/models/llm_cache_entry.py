@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, Text, DateTime
+from datetime import datetime
+from app.core.database import Base
+
+
+class LLMCacheEntry(Base):
+    """
+    Persistent tier of the model response cache.
+
+    Keyed by a SHA-256 of the model and the full request input, so identical
+    requests share one stored response across processes and restarts.
+    """
+    __tablename__ = "llm_cache_entries"
+
+    key = Column(String(64), primary_key=True)
+    task = Column(String, nullable=False, index=True)
+    model = Column(String, nullable=False)
+    response_text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<LLMCacheEntry {self.key[:12]} task={self.task}>"
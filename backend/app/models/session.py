@@ -20,6 +20,11 @@ class Session(Base):
     is_primary = Column(Boolean, default=False, nullable=False)
     journal_entry_count = Column(Integer, default=0, nullable=False)
     last_journal_synthesis = Column(DateTime, nullable=True)
+    journal_edited_at = Column(DateTime, nullable=True)  # Last user create/edit/delete of a journal entry
+
+    # Rolling summary of older conversation turns (see services/conversation_summary.py)
+    conversation_summary = Column(Text, nullable=True)
+    summary_through_message_id = Column(Integer, nullable=True)  # Last Conversation id folded into the summary
 
     # Relationships
     user = relationship("User", back_populates="sessions", foreign_keys=[user_id])
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime, date
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict
 
 
 # ==========================================
@@ -204,6 +204,89 @@ class SystemHealth(BaseModel):
     checked_at: datetime
 
 
+# ==========================================
+# AI Usage Schemas
+# ==========================================
+
+class AITaskUsage(BaseModel):
+    """Aggregate model usage for one task."""
+    calls: int
+    errors: int
+    input_tokens: int
+    cached_tokens: int
+    output_tokens: int
+    cached_token_ratio: float
+    cache_hit_calls: int
+    avg_latency_ms: Optional[float] = None
+    avg_cache_hit_latency_ms: Optional[float] = None
+    avg_cache_miss_latency_ms: Optional[float] = None
+
+
+class AICacheTaskStats(BaseModel):
+    """Response cache counters for one task."""
+    memory_hits: int
+    database_hits: int
+    coalesced: int
+    misses: int
+
+
+class AICacheStats(BaseModel):
+    """Response cache counters since the backend process started."""
+    memory_entries: int
+    tasks: Dict[str, AICacheTaskStats]
+
+
+class AIPriorityStats(BaseModel):
+    """Queue wait times for one priority class."""
+    queued: int
+    admitted: int
+    avg_wait_ms: Optional[float] = None
+    max_wait_ms: float
+
+
+class AISchedulerStats(BaseModel):
+    """Model request queue and rate-limit state."""
+    queue_depth: int
+    in_flight: int
+    concurrency_limit: int
+    max_concurrency: int
+    tokens_last_minute: int
+    tokens_per_minute: int
+    paused_for_seconds: float
+    completed: int
+    failed: int
+    retries: int
+    rate_limited: int
+    timed_out: int
+    rejected_open_circuit: int
+    deadline_exceeded: int
+    priorities: Dict[str, AIPriorityStats]
+
+
+class AIPrefilterDay(BaseModel):
+    """Journal synthesis requests checked locally on one day, and calls saved."""
+    checked: int
+    skipped: int
+
+
+class AIUsageResponse(BaseModel):
+    """Model usage per task since the backend process started."""
+    since: datetime
+    tasks: Dict[str, AITaskUsage]
+    cache: AICacheStats
+    scheduler: AISchedulerStats
+    journal_prefilter: Dict[str, AIPrefilterDay]
+
+
+class ClassifierTrainingResult(BaseModel):
+    """Outcome of retraining one local classifier."""
+    trained: bool
+    active: bool  # Used for categorization (passed the held-out accuracy check)
+    sample_count: int
+    training_accuracy: Optional[float] = None
+    validation_accuracy: Optional[float] = None
+
+
 # ==========================================
 # Admin Check Schema
 # ==========================================
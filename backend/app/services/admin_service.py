@@ -17,6 +17,7 @@ from app.models import (
 )
 from app.services.s3_service import s3_service
 from app.core.config import settings
+from app.core.circuit_breaker import openai_circuit, CircuitState
 
 logger = logging.getLogger(__name__)
 
@@ -461,7 +462,7 @@ class AdminService:
         """
         Find S3 files not referenced in the database.
 
-        Scans documents/, thumbnails/, and audio/ prefixes.
+        Scans documents/, thumbnails/ (including model image copies), and audio/ prefixes.
         Uses S3_KEY_PREFIX to only scan current environment's files in shared buckets.
         """
         # Get all valid keys from database
@@ -469,9 +470,12 @@ class AdminService:
         thumb_keys = set(d.thumbnail_s3_key for d in db.query(Document.thumbnail_s3_key).filter(
             Document.thumbnail_s3_key.isnot(None)
         ).all())
+        model_image_keys = set(d.model_image_s3_key for d in db.query(Document.model_image_s3_key).filter(
+            Document.model_image_s3_key.isnot(None)
+        ).all())
         audio_keys = set(a.s3_key for a in db.query(AudioRecording.s3_key).all() if a.s3_key)
 
-        all_valid_keys = doc_keys | thumb_keys | audio_keys
+        all_valid_keys = doc_keys | thumb_keys | model_image_keys | audio_keys
 
         orphaned_files = []
         total_size = 0
@@ -540,8 +544,11 @@ class AdminService:
         thumb_keys = set(d.thumbnail_s3_key for d in db.query(Document.thumbnail_s3_key).filter(
             Document.thumbnail_s3_key.isnot(None)
         ).all())
+        model_image_keys = set(d.model_image_s3_key for d in db.query(Document.model_image_s3_key).filter(
+            Document.model_image_s3_key.isnot(None)
+        ).all())
         audio_keys = set(a.s3_key for a in db.query(AudioRecording.s3_key).all() if a.s3_key)
-        all_valid_keys = doc_keys | thumb_keys | audio_keys
+        all_valid_keys = doc_keys | thumb_keys | model_image_keys | audio_keys
 
         deleted = 0
         failed = 0
@@ -655,6 +662,23 @@ class AdminService:
             if overall_status == "healthy":
                 overall_status = "degraded"
 
+        # OpenAI circuit breaker (open = model calls return fallbacks immediately)
+        circuit = openai_circuit.snapshot()
+        if circuit["state"] == CircuitState.CLOSED.value:
+            circuit_message = None
+        elif circuit["state"] == CircuitState.OPEN.value:
+            circuit_message = f"Open after {circuit['consecutive_failures']} failures, probing in {circuit['retry_in_seconds']}s: {circuit['last_failure']}"
+        else:
+            circuit_message = f"Half-open, probing recovery: {circuit['last_failure']}"
+        services.append({
+            "name": "openai_circuit",
+            "status": "healthy" if circuit["state"] == CircuitState.CLOSED.value else "degraded",
+            "latency_ms": None,
+            "message": circuit_message
+        })
+        if circuit["state"] != CircuitState.CLOSED.value and overall_status == "healthy":
+            overall_status = "degraded"
+
         return {
             "status": overall_status,
             "services": services,
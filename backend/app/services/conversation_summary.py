@@ -0,0 +1,115 @@
+"""
+Rolling conversation summary.
+
+Each session keeps a summary of its older conversation turns in
+`Session.conversation_summary`, covering every message up to
+`Session.summary_through_message_id`. Chat prompts include the summary ahead
+of the messages after that point, so prompt size stays bounded as a session
+grows.
+
+Once more than CONVERSATION_SUMMARY_THRESHOLD messages older than the recent
+window (MAX_CONVERSATION_CONTEXT) are unsummarized, a background job folds
+them into the summary with one model call.
+"""
+from app.config import ai_config
+from app.core.database import SessionLocal
+from app.core.llm_scheduler import Priority
+from app.models.conversation import Conversation, MessageRole
+from app.models.session import Session as SessionModel
+from sqlalchemy.orm import Session
+from typing import Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Longest single message copied into the summary transcript
+MAX_TRANSCRIPT_MESSAGE_CHARS = 2000
+
+# Sessions with an update in flight, so overlapping turns don't summarize twice
+_running: Set[str] = set()
+
+
+def _unsummarized_query(db: Session, session: SessionModel):
+    query = db.query(Conversation).filter(Conversation.session_id == session.id)
+    if session.summary_through_message_id:
+        query = query.filter(Conversation.id > session.summary_through_message_id)
+    return query
+
+
+def summary_update_due(session: SessionModel, db: Session) -> bool:
+    """True if enough messages fell out of the recent window to update the summary"""
+    if session.id in _running:
+        return False
+    unsummarized = _unsummarized_query(db, session).count()
+    return unsummarized - ai_config.MAX_CONVERSATION_CONTEXT >= ai_config.CONVERSATION_SUMMARY_THRESHOLD
+
+
+def _format_transcript(messages) -> str:
+    lines = []
+    for msg in messages:
+        speaker = "Caregiver" if msg.role == MessageRole.USER else "AretaCare"
+        content = msg.content or ""
+        if len(content) > MAX_TRANSCRIPT_MESSAGE_CHARS:
+            content = content[:MAX_TRANSCRIPT_MESSAGE_CHARS] + "..."
+        lines.append(f"{speaker}: {content}")
+    return "\n\n".join(lines)
+
+
+async def run_conversation_summary(session_id: str) -> None:
+    """Fold messages older than the recent window into the session's summary.
+
+    Uses its own database session because the request session is closed by
+    the time background tasks run.
+    """
+    if session_id in _running:
+        return
+    _running.add(session_id)
+
+    from app.services.openai_service import openai_service
+
+    db = SessionLocal()
+    try:
+        session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+        if not session:
+            return
+
+        unsummarized = _unsummarized_query(db, session).order_by(Conversation.id).all()
+        older = unsummarized[:-ai_config.MAX_CONVERSATION_CONTEXT] if ai_config.MAX_CONVERSATION_CONTEXT else unsummarized
+        if len(older) < ai_config.CONVERSATION_SUMMARY_THRESHOLD:
+            return
+        batch = older[:ai_config.CONVERSATION_SUMMARY_MAX_BATCH]
+
+        messages = openai_service.prompt_prefix(ai_config.CONVERSATION_SUMMARY_INSTRUCTIONS)
+        messages.append({
+            "role": "user",
+            "content": ai_config.get_conversation_summary_prompt(
+                session.conversation_summary, _format_transcript(batch)
+            )
+        })
+        summary = await openai_service.generate_text(
+            messages, task="conversation_summary", priority=Priority.BACKGROUND
+        )
+        if not summary:
+            logger.warning(f"Conversation summary update failed for session {session_id}")
+            return
+
+        # Only apply if no other update moved the summary forward meanwhile
+        updated = db.query(SessionModel).filter(
+            SessionModel.id == session_id,
+            SessionModel.summary_through_message_id == session.summary_through_message_id
+            if session.summary_through_message_id is not None
+            else SessionModel.summary_through_message_id.is_(None)
+        ).update({
+            SessionModel.conversation_summary: summary.strip(),
+            SessionModel.summary_through_message_id: batch[-1].id
+        }, synchronize_session=False)
+        db.commit()
+        if updated:
+            logger.info(f"Summarized {len(batch)} messages for session {session_id}")
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Conversation summary update failed for session {session_id}: {e}", exc_info=True)
+    finally:
+        db.close()
+        _running.discard(session_id)
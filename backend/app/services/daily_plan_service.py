@@ -1,21 +1,21 @@
-import openai
 import logging
 from sqlalchemy.orm import Session
 from datetime import datetime, date, timedelta
 from typing import Optional, List, Dict
 from ..models.daily_plan import DailyPlan
 from ..models.journal import JournalEntry
-from ..models.conversation import Conversation
+from ..models.conversation import Conversation, MessageRole
 from ..models.document import Document
 from ..models.session import Session as UserSession
-from ..core.config import settings
 from ..config import ai_config
+from ..core.llm_scheduler import Priority
+from ..core.request_deadline import DeadlineExceeded
+from .document_chunks import document_chunk_service
+from .journal_rollups import journal_rollup_service
 from .s3_service import S3Service
 
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
 s3_service = S3Service()
 
 
@@ -109,7 +109,7 @@ class DailyPlanService:
             db.rollback()
             # Don't log HTTPException as error - it's intentional (e.g., insufficient data)
             from fastapi import HTTPException
-            if isinstance(e, HTTPException):
+            if isinstance(e, (HTTPException, DeadlineExceeded)):
                 raise
             # Log actual errors
             logger.error(f"Error generating daily plan. Exception type: {type(e).__name__}, "
@@ -122,22 +122,29 @@ class DailyPlanService:
         Gather all relevant context for generating the daily plan.
 
         Returns a dict with:
-        - journal_entries: List of recent journal entries
+        - journal_entries: Journal entries after the last rolled-up month
+        - journal_rollups: Monthly summaries of older journal history
         - conversations: Recent conversation excerpts
         - documents: List of uploaded documents (with presigned URLs)
         - previous_plans: Previous 3 daily plans for continuity
         """
         context = {
             "journal_entries": [],
+            "journal_rollups": [],
             "conversations": [],
             "documents": [],
             "previous_plans": []
         }
 
-        # Get journal entries (all entries, grouped by category)
-        journal_entries = db.query(JournalEntry).filter(
-            JournalEntry.session_id == session_id
-        ).order_by(JournalEntry.entry_date.desc()).all()
+        # Get journal entries (grouped by category); months covered by a
+        # rollup are read from the rollup instead of their entries
+        rollups = journal_rollup_service.current_rollups(db, session_id)
+        journal_query = db.query(JournalEntry).filter(JournalEntry.session_id == session_id)
+        if rollups:
+            journal_query = journal_query.filter(
+                JournalEntry.entry_date >= journal_rollup_service.covered_through(rollups)
+            )
+        journal_entries = journal_query.order_by(JournalEntry.entry_date.desc()).all()
 
         context["journal_entries"] = [
             {
@@ -148,6 +155,7 @@ class DailyPlanService:
             }
             for entry in journal_entries
         ]
+        context["journal_rollups"] = journal_rollup_service.format_rollups(rollups)
 
         # Get recent conversations (last 7 days)
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
@@ -170,6 +178,16 @@ class DailyPlanService:
             Document.session_id == session_id
         ).order_by(Document.uploaded_at.desc()).limit(10).all()
 
+        # Document chunks relevant to recent journal topics and conversations
+        excerpts_by_document = {}
+        if ai_config.DOCUMENT_RETRIEVAL_ENABLED and recent_documents:
+            query = " ".join(
+                [entry["title"] for entry in context["journal_entries"][:10]] +
+                [conv["content"] for conv in context["conversations"][-5:] if conv["role"] == MessageRole.USER]
+            )
+            for chunk in document_chunk_service.select_for_session(db, session_id, query):
+                excerpts_by_document.setdefault(chunk.document_id, []).append(chunk.content)
+
         for doc in recent_documents:
             doc_info = {
                 "filename": doc.filename,
@@ -177,8 +195,10 @@ class DailyPlanService:
                 "uploaded_at": doc.uploaded_at.isoformat()
             }
 
-            # Add extracted text if available
-            if doc.extracted_text:
+            # Add relevant excerpts, or the start of the extracted text
+            if doc.id in excerpts_by_document:
+                doc_info["excerpts"] = excerpts_by_document[doc.id]
+            elif doc.extracted_text:
                 doc_info["text_preview"] = doc.extracted_text[:300]  # First 300 chars
 
             context["documents"].append(doc_info)
@@ -213,22 +233,12 @@ class DailyPlanService:
             # Build the user prompt with all context
             user_prompt = DailyPlanService._build_user_prompt(context)
 
-            # Call OpenAI Responses API
-            response = client.responses.create(
-                model=ai_config.CHAT_MODEL,
-                input=[
-                    {"role": "system", "content": ai_config.DAILY_PLAN_SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
+            # Call OpenAI Responses API with the shared, cacheable prompt prefix
+            from .openai_service import openai_service
+            messages = openai_service.prompt_prefix(ai_config.DAILY_PLAN_SYSTEM_PROMPT)
+            messages.append({"role": "user", "content": user_prompt})
 
-            # Extract text from Responses API
-            text = getattr(response, "output_text", None)
-            if text is None and getattr(response, "output", None):
-                first_item = response.output[0]
-                if getattr(first_item, "content", None):
-                    first_content = first_item.content[0]
-                    text = getattr(first_content, "text", None)
+            text = await openai_service.generate_text(messages, task="daily_plan", priority=Priority.BACKGROUND)
 
             if not text:
                 raise Exception("No response from AI")
@@ -272,6 +282,11 @@ class DailyPlanService:
                     if entry['content']:
                         prompt_parts.append(f"  {entry['content'][:200]}")  # Truncate long content
 
+        # Add monthly summaries of older history
+        if context["journal_rollups"]:
+            prompt_parts.append("\n## Earlier Months (Journal Summaries)")
+            prompt_parts.append("".join(context["journal_rollups"]).strip())
+
         # Add recent conversations
         if context["conversations"]:
             prompt_parts.append("\n## Recent Conversations (last 7 days)")
@@ -281,8 +296,12 @@ class DailyPlanService:
         # Add documents
         if context["documents"]:
             prompt_parts.append("\n## Uploaded Documents")
-            for doc in context["documents"][:5]:  # Limit to 5
+            # Limit to 5, listing documents with relevant excerpts first
+            documents = sorted(context["documents"], key=lambda doc: "excerpts" not in doc)
+            for doc in documents[:5]:
                 prompt_parts.append(f"- {doc['filename']} ({doc['file_type']}) - uploaded {doc['uploaded_at']}")
+                for excerpt in doc.get("excerpts", []):
+                    prompt_parts.append(f"  Relevant excerpt:\n  {excerpt}")
                 if "text_preview" in doc:
                     prompt_parts.append(f"  Preview: {doc['text_preview']}")
 
@@ -302,7 +321,7 @@ class DailyPlanService:
             bool: True if there's enough data, False otherwise
         """
         # Check if there are any journal entries
-        has_journal_entries = len(context.get("journal_entries", [])) > 0
+        has_journal_entries = len(context.get("journal_entries", [])) > 0 or len(context.get("journal_rollups", [])) > 0
 
         # Check if there are any conversations
         has_conversations = len(context.get("conversations", [])) > 0
@@ -0,0 +1,265 @@
+"""
+Chunked document text with retrieval.
+
+Uploaded documents are split into page- or section-sized chunks (about
+DOCUMENT_CHUNK_TOKENS each) stored in `document_chunks`. Prompts then include
+only the chunks relevant to the question instead of the whole file: chat turns
+about an attached PDF or text file, chat turns that may concern any of the
+session's documents, journal synthesis and daily plans.
+
+Chunks are ranked with Postgres full-text search (GIN index on
+`to_tsvector('english', content)`, see core/migrations.py). Chat turns that
+are only a greeting or acknowledgement skip the session-wide search.
+
+Documents uploaded before chunking existed can be chunked from their stored
+extracted text:
+
+    python -m app.services.document_chunks backfill
+"""
+from app.config import ai_config
+from app.models.document import Document
+from app.models.document_chunk import DocumentChunk
+from app.services.journal_index import tokenize
+from app.services.prompt_budget import count_tokens
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session, joinedload
+from typing import Dict, List, Optional
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+FTS_CONFIG = "english"
+
+# Most query terms used for a full-text search
+MAX_QUERY_TERMS = 32
+
+
+def _split_block(text: str, max_tokens: int) -> List[str]:
+    """Split one oversized paragraph on lines, then on characters"""
+    pieces = []
+    current = []
+    used = 0
+    for line in text.split("\n"):
+        cost = count_tokens(line)
+        if cost > max_tokens:
+            if current:
+                pieces.append("\n".join(current))
+                current, used = [], 0
+            step = max_tokens * 4
+            pieces.extend(line[i:i + step] for i in range(0, len(line), step))
+            continue
+        if used + cost > max_tokens and current:
+            pieces.append("\n".join(current))
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+def split_into_chunks(pages: List[Optional[str]], max_tokens: int = None, paged: bool = True) -> List[Dict]:
+    """Split page texts into chunks of whole paragraphs.
+
+    Chunks never span pages. Returns dicts with `page` (1-based, or None when
+    `paged` is false), `content` and `token_count`.
+    """
+    if max_tokens is None:
+        max_tokens = ai_config.DOCUMENT_CHUNK_TOKENS
+
+    chunks = []
+    for page_number, page_text in enumerate(pages, start=1):
+        if not page_text or not page_text.strip():
+            continue
+        blocks = []
+        for paragraph in page_text.split("\n\n"):
+            if not paragraph.strip():
+                continue
+            if count_tokens(paragraph) > max_tokens:
+                blocks.extend(_split_block(paragraph, max_tokens))
+            else:
+                blocks.append(paragraph)
+
+        current = []
+        used = 0
+        for block in blocks:
+            cost = count_tokens(block)
+            if used + cost > max_tokens and current:
+                chunks.append(("\n\n".join(current), page_number))
+                current, used = [], 0
+            current.append(block)
+            used += cost
+        if current:
+            chunks.append(("\n\n".join(current), page_number))
+
+    return [
+        {
+            "page": page if paged else None,
+            "content": content.strip(),
+            "token_count": count_tokens(content)
+        }
+        for content, page in chunks
+    ]
+
+
+class DocumentChunkService:
+    """Store document chunks and select the ones relevant to a prompt"""
+
+    @staticmethod
+    def store_chunks(db: Session, document: Document, pages: List[Optional[str]]) -> int:
+        """Replace a document's chunks with chunks of `pages`; returns the count"""
+        db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).delete(synchronize_session=False)
+        chunks = split_into_chunks(pages, paged=document.content_type == "application/pdf")
+        for index, chunk in enumerate(chunks):
+            db.add(DocumentChunk(
+                document_id=document.id,
+                session_id=document.session_id,
+                chunk_index=index,
+                page=chunk["page"],
+                content=chunk["content"],
+                token_count=chunk["token_count"]
+            ))
+        db.commit()
+        return len(chunks)
+
+    @staticmethod
+    def search(
+        db: Session,
+        session_id: str,
+        query: str,
+        k: int,
+        document_id: Optional[int] = None,
+        min_matched_terms: int = 1
+    ) -> List[DocumentChunk]:
+        """Top-k chunks matching at least `min_matched_terms` distinct query terms
+        (or all of them, for shorter queries), best first.
+
+        Each chunk's document filename is loaded with it, since prompts label
+        excerpts with it.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms or k <= 0:
+            return []
+
+        vector = func.to_tsvector(FTS_CONFIG, DocumentChunk.content)
+        ts_query = func.to_tsquery(FTS_CONFIG, " | ".join(terms))
+        rank = func.ts_rank_cd(vector, ts_query)
+
+        # Only the filename: extracted_text would be repeated on every chunk row
+        document = joinedload(DocumentChunk.document).load_only(Document.filename)
+        q = db.query(DocumentChunk).options(document).filter(
+            DocumentChunk.session_id == session_id,
+            vector.op("@@")(ts_query)
+        )
+        required = min(min_matched_terms, len(terms))
+        if required > 1:
+            matched_terms = sum(
+                case((vector.op("@@")(func.to_tsquery(FTS_CONFIG, term)), 1), else_=0) for term in terms
+            )
+            q = q.filter(matched_terms >= required)
+        if document_id is not None:
+            q = q.filter(DocumentChunk.document_id == document_id)
+        return q.order_by(rank.desc(), DocumentChunk.chunk_index).limit(k).all()
+
+    def select_for_document(
+        self,
+        db: Session,
+        document: Document,
+        query: str,
+        allowance: Optional[int] = None
+    ) -> List[DocumentChunk]:
+        """Chunks of one document for a prompt about it.
+
+        Chunks matching the query come first, then the rest in document order,
+        until the allowance is used. Returned in document order.
+        """
+        if allowance is None:
+            allowance = ai_config.PROMPT_SECTION_TOKENS["document"]
+        chunks = list(document.chunks)
+        if not chunks:
+            return []
+
+        ranked = self.search(db, document.session_id, query, len(chunks), document_id=document.id)
+        ranked_ids = {chunk.id for chunk in ranked}
+        ordered = ranked + [chunk for chunk in chunks if chunk.id not in ranked_ids]
+
+        selected = []
+        used = 0
+        for chunk in ordered:
+            if used + chunk.token_count > allowance:
+                continue
+            selected.append(chunk)
+            used += chunk.token_count
+        return sorted(selected, key=lambda chunk: chunk.chunk_index)
+
+    def select_for_session(
+        self,
+        db: Session,
+        session_id: str,
+        query: str,
+        k: Optional[int] = None,
+        allowance: Optional[int] = None
+    ) -> List[DocumentChunk]:
+        """Best-matching chunks across all of a session's documents.
+
+        Only chunks sharing at least DOCUMENT_RETRIEVAL_MIN_MATCHED_TERMS terms
+        with the query are used, so a passing mention of one common word does
+        not add excerpts to the prompt.
+        """
+        if k is None:
+            k = ai_config.DOCUMENT_RETRIEVAL_TOP_K
+        if allowance is None:
+            allowance = ai_config.PROMPT_SECTION_TOKENS["document"]
+
+        selected = []
+        used = 0
+        for chunk in self.search(
+            db, session_id, query, k, min_matched_terms=ai_config.DOCUMENT_RETRIEVAL_MIN_MATCHED_TERMS
+        ):
+            if used + chunk.token_count > allowance:
+                continue
+            selected.append(chunk)
+            used += chunk.token_count
+        return selected
+
+    @staticmethod
+    def format_chunks(chunks: List[DocumentChunk]) -> str:
+        """Render chunks as labelled excerpts"""
+        parts = []
+        for chunk in chunks:
+            label = chunk.document.filename
+            if chunk.page:
+                label += f", page {chunk.page}"
+            parts.append(f"### {label}\n{chunk.content}")
+        return "\n\n".join(parts)
+
+    def backfill(self, db: Session) -> int:
+        """Chunk documents that have extracted text but no chunks; returns the count"""
+        documents = db.query(Document).filter(
+            Document.extracted_text.isnot(None),
+            ~Document.chunks.any()
+        ).all()
+        for document in documents:
+            # Page boundaries are not stored, so the text is chunked as one page
+            self.store_chunks(db, document, [document.extracted_text])
+        return len(documents)
+
+
+document_chunk_service = DocumentChunkService()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] != "backfill":
+        print("Usage: python -m app.services.document_chunks backfill")
+        sys.exit(1)
+
+    from app.core.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        count = document_chunk_service.backfill(db)
+    finally:
+        db.close()
+    print(f"Chunked {count} documents")
@@ -1,9 +1,11 @@
 from PyPDF2 import PdfReader
 from io import BytesIO
-from PIL import Image
+from PIL import Image, ImageOps
 import pytesseract
 from pdf2image import convert_from_bytes
-from typing import Optional
+from typing import List, Optional
+from app.config import ai_config
+from app.core.request_deadline import bound
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,29 +15,29 @@ class DocumentProcessor:
     """Process various document types and extract text"""
 
     @staticmethod
-    def extract_text_from_pdf(file_content: bytes) -> Optional[str]:
-        """Extract text from PDF file"""
+    def extract_pages_from_pdf(file_content: bytes) -> List[str]:
+        """Extract text from each PDF page (empty string for pages without text)"""
         try:
             pdf_file = BytesIO(file_content)
             pdf_reader = PdfReader(pdf_file)
-
-            text_content = []
-            for page in pdf_reader.pages:
-                text = page.extract_text()
-                if text:
-                    text_content.append(text)
-
-            return "\n\n".join(text_content) if text_content else None
+            return [page.extract_text() or "" for page in pdf_reader.pages]
         except Exception as e:
             logger.error(f"Failed to extract text from PDF: {e}")
-            return None
+            return []
+
+    @staticmethod
+    def extract_text_from_pdf(file_content: bytes) -> Optional[str]:
+        """Extract text from PDF file"""
+        text_content = [text for text in DocumentProcessor.extract_pages_from_pdf(file_content) if text]
+        return "\n\n".join(text_content) if text_content else None
 
     @staticmethod
     def extract_text_from_image(file_content: bytes) -> Optional[str]:
         """Extract text from image using OCR"""
         try:
             image = Image.open(BytesIO(file_content))
-            text = pytesseract.image_to_string(image)
+            # Tesseract is killed once the OCR (or request) deadline passes
+            text = pytesseract.image_to_string(image, timeout=bound(ai_config.OCR_TIMEOUT_SECONDS))
             return text.strip() if text else None
         except Exception as e:
             logger.error(f"Failed to extract text from image: {e}")
@@ -69,6 +71,42 @@ class DocumentProcessor:
             logger.error(f"Failed to generate PDF thumbnail: {e}")
             return None
 
+    @staticmethod
+    def generate_model_image(
+        file_content: bytes,
+        max_side: int = ai_config.VISION_IMAGE_MAX_SIDE,
+        quality: int = ai_config.VISION_IMAGE_JPEG_QUALITY
+    ) -> Optional[bytes]:
+        """Downscaled, recompressed JPEG copy of an image for model input.
+
+        Returns None if the original is already within bounds, so it can be
+        used as is.
+        """
+        try:
+            image = Image.open(BytesIO(file_content))
+            if max(image.size) <= max_side and len(file_content) <= ai_config.VISION_IMAGE_MAX_BYTES:
+                return None
+
+            # Apply the camera orientation before the EXIF data is dropped
+            image = ImageOps.exif_transpose(image)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+            output = BytesIO()
+            image.save(output, format="JPEG", quality=quality, optimize=True)
+            return output.getvalue()
+        except Exception as e:
+            logger.error(f"Failed to generate model image: {e}")
+            return None
+
+    @staticmethod
+    def extract_pages(file_content: bytes, content_type: str) -> List[Optional[str]]:
+        """Extract text per page: one entry per PDF page, a single entry otherwise"""
+        if content_type == "application/pdf":
+            return DocumentProcessor.extract_pages_from_pdf(file_content)
+        return [DocumentProcessor.extract_text(file_content, content_type)]
+
     @staticmethod
     def extract_text(file_content: bytes, content_type: str) -> Optional[str]:
         """Extract text based on content type"""
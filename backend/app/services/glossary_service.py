@@ -0,0 +1,171 @@
+"""
+Plain-language glossary for common medical terms.
+
+Common terms (CBC, BUN, ejection fraction, ...) get the same explanation for
+every family, so they are answered from a precomputed glossary instead of a
+model call. Terms are matched through a normalized index that folds case,
+punctuation, plural forms and abbreviation aliases.
+
+The glossary lives in `app/config/medical_glossary.json`. It can be extended in
+bulk offline; explanations are generated once with the model and written back
+to the file:
+
+    python -m app.services.glossary_service warm terms.txt
+"""
+from app.config import ai_config
+from app.core.llm_scheduler import Priority
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+
+logger = logging.getLogger(__name__)
+
+GLOSSARY_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "medical_glossary.json")
+
+GLOSSARY_CONTEXT_NOTE = "Please confirm this explanation with your healthcare provider for your specific situation."
+
+_PUNCTUATION = re.compile(r"[^\w\s/+]")
+_WHITESPACE = re.compile(r"[\s_\-]+")
+
+
+def normalize_term(term: str) -> str:
+    """Fold case, dots, hyphens and extra whitespace ("B.U.N." -> "bun")"""
+    term = term.lower().replace(".", "")
+    term = _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", term))
+    return term.strip()
+
+
+def _singular_variants(key: str) -> List[str]:
+    """Candidate singular forms for a normalized term"""
+    variants = []
+    if key.endswith("ies") and len(key) > 4:
+        variants.append(key[:-3] + "y")
+    if key.endswith("es") and len(key) > 3:
+        variants.append(key[:-2])
+    if key.endswith("s") and not key.endswith("ss") and len(key) > 2:
+        variants.append(key[:-1])
+    return variants
+
+
+class GlossaryService:
+    """In-memory glossary with a normalized term index"""
+
+    def __init__(self, path: str = GLOSSARY_PATH):
+        self.path = path
+        self._entries: Dict[str, Dict] = {}
+        self._index: Dict[str, Dict] = {}
+        self.load()
+
+    def load(self) -> None:
+        """(Re)load the glossary file and rebuild the index"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"Medical glossary not found at {self.path}")
+            data = {"entries": []}
+        except json.JSONDecodeError as e:
+            logger.error(f"Medical glossary is not valid JSON: {e}")
+            data = {"entries": []}
+
+        self._entries = {}
+        self._index = {}
+        self.add_entries(data.get("entries", []))
+        logger.info(f"Loaded {len(self._entries)} glossary terms")
+
+    def add_entries(self, entries: Iterable[Dict]) -> None:
+        """Add entries to the index; later entries override earlier ones"""
+        for entry in entries:
+            if not entry.get("term") or not (entry.get("explanation") or entry.get("definition")):
+                continue
+            self._entries[normalize_term(entry["term"])] = entry
+            for name in [entry["term"]] + list(entry.get("aliases", [])):
+                key = normalize_term(name)
+                if key:
+                    self._index[key] = entry
+
+    def lookup(self, term: str) -> Optional[Dict]:
+        """Return the glossary entry for a term, or None if it is unknown"""
+        key = normalize_term(term)
+        if not key:
+            return None
+        entry = self._index.get(key)
+        if entry is None:
+            for variant in _singular_variants(key):
+                entry = self._index.get(variant)
+                if entry is not None:
+                    break
+        return entry
+
+    def translate(self, term: str) -> Optional[Dict]:
+        """Return a jargon translation payload for a known term, or None"""
+        entry = self.lookup(term)
+        if entry is None:
+            return None
+        return {
+            "term": term,
+            "explanation": self.format_explanation(entry),
+            "context_note": GLOSSARY_CONTEXT_NOTE
+        }
+
+    @staticmethod
+    def format_explanation(entry: Dict) -> str:
+        """Render an entry in the same markdown layout as model translations"""
+        if entry.get("explanation"):
+            return entry["explanation"]
+        return (
+            f"## What It Means\n\n{entry['definition']}\n\n"
+            f"## Common Context\n\n{entry.get('context', '')}\n\n"
+            f"## Relevance to This Patient\n\n"
+            f"This is general information about {entry['term']}. "
+            f"Add details about your situation for a more specific explanation."
+        ).strip()
+
+    def save(self) -> None:
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "entries": list(self._entries.values())}, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+    async def warm(self, terms: Iterable[str]) -> int:
+        """Generate explanations for unknown terms with the model and save them.
+
+        Intended for offline use; returns the number of terms added.
+        """
+        from app.services.openai_service import openai_service
+
+        added = 0
+        for term in terms:
+            term = term.strip()
+            if not term or self.lookup(term) is not None:
+                continue
+            messages = openai_service.prompt_prefix(ai_config.JARGON_TRANSLATION_INSTRUCTIONS)
+            messages.append({"role": "user", "content": ai_config.get_jargon_translation_prompt(term)})
+
+            response = await openai_service.generate_text(messages, task="glossary_warm", priority=Priority.BACKGROUND)
+            if not response:
+                logger.warning(f"Skipping glossary term {term!r}: no response from model")
+                continue
+            self.add_entries([{"term": term, "aliases": [], "explanation": response}])
+            added += 1
+
+        if added:
+            self.save()
+        return added
+
+
+glossary_service = GlossaryService()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "warm":
+        print("Usage: python -m app.services.glossary_service warm <terms.txt>")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO)
+    with open(sys.argv[2], encoding="utf-8") as f:
+        count = asyncio.run(glossary_service.warm(f.read().splitlines()))
+    print(f"Added {count} glossary terms to {glossary_service.path}")
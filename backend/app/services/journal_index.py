@@ -0,0 +1,230 @@
+"""
+In-process BM25 index over journal entries.
+
+Each session gets a lexical index over entry titles and content, built from
+the database on first use and kept current as entries are created, edited or
+deleted through JournalService. Journal context for chat, jargon and coaching
+prompts then includes only the entries relevant to the current message plus a
+small recency window, instead of the whole journal.
+
+Indexes live in this process only. Before a search the index is checked
+against the entry count and latest `updated_at` in the database, so changes
+made by another worker trigger a rebuild of that session's index.
+
+The index also keeps a MinHash sketch of each entry's word shingles, so
+near-duplicates of a new AI entry can be found without comparing it to every
+entry (see JournalService.create_entry).
+"""
+from app.config import ai_config
+from app.models.journal import JournalEntry
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+import hashlib
+import heapq
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from had has have he her his how i if in into is it its "
+    "me my of on or our she so that the their them they this to was we were what when which who why will "
+    "with you your".split()
+)
+
+# Title terms count this many times, so a match in the title outranks one in the body
+TITLE_WEIGHT = 2
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Near-duplicate detection: bottom-k MinHash sketches (the SKETCH_SIZE smallest
+# shingle hashes) of word 2-shingles. One hash per shingle keeps index builds cheap.
+SHINGLE_SIZE = 2
+SKETCH_SIZE = 64
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in _STOPWORDS and len(t) > 1]
+
+
+def shingles(text: str) -> Set[str]:
+    """Word shingles of a text; texts shorter than one shingle give their words"""
+    tokens = tokenize(text)
+    if len(tokens) < SHINGLE_SIZE:
+        return set(tokens)
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_set: Set[str]) -> FrozenSet[int]:
+    """Bottom-k MinHash sketch of a shingle set"""
+    hashes = {
+        int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for shingle in shingle_set
+    }
+    return frozenset(heapq.nsmallest(SKETCH_SIZE, hashes))
+
+
+def estimate_similarity(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    """Estimated Jaccard similarity of the sets two sketches were built from"""
+    union = heapq.nsmallest(SKETCH_SIZE, a | b)
+    if not union:
+        return 0.0
+    return sum(1 for h in union if h in a and h in b) / len(union)
+
+
+def _sketch(title: str, content: str) -> FrozenSet[int]:
+    return minhash(shingles(f"{title}\n{content}"))
+
+
+class JournalIndex:
+    """BM25 index for one session's journal entries"""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._doc_terms: Dict[int, Counter] = {}
+        self._doc_length: Dict[int, int] = {}
+        self._doc_updated: Dict[int, datetime] = {}
+        self._total_length = 0
+        self._sketches: Dict[int, FrozenSet[int]] = {}
+        self._sketch_postings: Dict[int, Set[int]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    @property
+    def stamp(self) -> Tuple[int, Optional[datetime]]:
+        """(entry count, latest updated_at) of the indexed entries"""
+        return len(self._doc_terms), max(self._doc_updated.values(), default=None)
+
+    def upsert(self, entry_id: int, title: str, content: str, updated_at: datetime) -> None:
+        self.remove(entry_id)
+        terms = Counter(tokenize(content))
+        for term in tokenize(title):
+            terms[term] += TITLE_WEIGHT
+        self._doc_terms[entry_id] = terms
+        self._doc_length[entry_id] = sum(terms.values())
+        self._doc_updated[entry_id] = updated_at
+        self._total_length += self._doc_length[entry_id]
+        for term, tf in terms.items():
+            self._postings[term][entry_id] = tf
+        sketch = _sketch(title, content)
+        self._sketches[entry_id] = sketch
+        for h in sketch:
+            self._sketch_postings[h].add(entry_id)
+
+    def remove(self, entry_id: int) -> None:
+        terms = self._doc_terms.pop(entry_id, None)
+        self._doc_updated.pop(entry_id, None)
+        for h in self._sketches.pop(entry_id, ()):
+            members = self._sketch_postings.get(h)
+            if members is not None:
+                members.discard(entry_id)
+                if not members:
+                    del self._sketch_postings[h]
+        if terms is None:
+            return
+        self._total_length -= self._doc_length.pop(entry_id)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(entry_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (entry_id, score) pairs for a query, best first; zero scores are dropped"""
+        n = len(self._doc_terms)
+        if not n or k <= 0:
+            return []
+        avg_length = self._total_length / n or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for entry_id, tf in postings.items():
+                length = self._doc_length[entry_id]
+                scores[entry_id] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg_length))
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def near_duplicates(self, title: str, content: str, threshold: float) -> List[Tuple[int, float]]:
+        """(entry_id, estimated Jaccard similarity) pairs at or above threshold, most similar first"""
+        sketch = _sketch(title, content)
+        # Only entries sharing a sketch value can be similar
+        candidates = set()
+        for h in sketch:
+            candidates |= self._sketch_postings.get(h, set())
+
+        matches = []
+        for entry_id in candidates:
+            similarity = estimate_similarity(sketch, self._sketches[entry_id])
+            if similarity >= threshold:
+                matches.append((entry_id, similarity))
+        return sorted(matches, key=lambda item: item[1], reverse=True)
+
+
+class JournalIndexRegistry:
+    """Per-session journal indexes, least recently used sessions evicted first"""
+
+    def __init__(self, max_sessions: int = ai_config.JOURNAL_INDEX_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._indexes: "OrderedDict[str, JournalIndex]" = OrderedDict()
+
+    def _build(self, session_id: str, db: Session) -> JournalIndex:
+        index = JournalIndex()
+        rows = db.query(
+            JournalEntry.id, JournalEntry.title, JournalEntry.content, JournalEntry.updated_at
+        ).filter(JournalEntry.session_id == session_id).all()
+        for row in rows:
+            index.upsert(row.id, row.title, row.content, row.updated_at)
+        self._indexes[session_id] = index
+        self._indexes.move_to_end(session_id)
+        while len(self._indexes) > self.max_sessions:
+            self._indexes.popitem(last=False)
+        logger.debug(f"Built journal index for session {session_id} ({len(index)} entries)")
+        return index
+
+    def get(self, session_id: str, db: Session) -> JournalIndex:
+        """Return the session's index, (re)building it if missing or stale"""
+        index = self._indexes.get(session_id)
+        if index is not None:
+            count, latest = db.query(
+                func.count(JournalEntry.id), func.max(JournalEntry.updated_at)
+            ).filter(JournalEntry.session_id == session_id).one()
+            if (count, latest) == index.stamp:
+                self._indexes.move_to_end(session_id)
+                return index
+        return self._build(session_id, db)
+
+    def search(self, session_id: str, query: str, k: int, db: Session) -> List[Tuple[int, float]]:
+        return self.get(session_id, db).search(query, k)
+
+    def near_duplicates(
+        self, session_id: str, title: str, content: str, threshold: float, db: Session
+    ) -> List[Tuple[int, float]]:
+        return self.get(session_id, db).near_duplicates(title, content, threshold)
+
+    def entry_saved(self, entry: JournalEntry) -> None:
+        """Apply a created or edited entry to its session's index, if loaded"""
+        index = self._indexes.get(entry.session_id)
+        if index is not None:
+            index.upsert(entry.id, entry.title, entry.content, entry.updated_at)
+
+    def entry_deleted(self, session_id: str, entry_id: int) -> None:
+        """Drop a deleted entry from its session's index, if loaded"""
+        index = self._indexes.get(session_id)
+        if index is not None:
+            index.remove(entry_id)
+
+
+journal_index = JournalIndexRegistry()
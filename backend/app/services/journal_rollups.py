@@ -0,0 +1,254 @@
+"""
+Monthly journal rollups.
+
+Older journal history used to be rebuilt on every request from every entry
+(titles grouped by month). Instead, each calendar month that ended more than
+JOURNAL_ROLLUP_AGE_DAYS ago is summarized once with the model and stored in
+`journal_monthly_rollups`. Journal context and daily plans read those rows
+plus the entries after the last rolled-up month, so prompt size and query
+cost stay flat however long a session runs.
+
+A rollup is rebuilt when its month's entry count or latest `updated_at`
+changes. Months are rolled up oldest first and a failed month stops the run,
+so the rolled-up months always form a prefix of the journal and everything
+after the last one is read entry by entry. Readers use `current_rollups`,
+which stops at the first month changed since its rollup was built, so an
+added, edited or deleted entry in a rolled-up month is read directly until
+the rollup is rebuilt.
+
+Rollups are refreshed in the background after a chat turn, at most once a day
+per session and worker unless a rollup was found stale, or for every session
+with:
+
+    python -m app.services.journal_rollups refresh
+"""
+from app.config import ai_config
+from app.core.circuit_breaker import openai_circuit
+from app.core.database import SessionLocal
+from app.core.llm_scheduler import Priority
+from app.models.journal import JournalEntry
+from app.models.journal_rollup import JournalMonthlyRollup
+from app.services import journal_snapshots
+from app.services.prompt_budget import budget_document
+from sqlalchemy import Date, cast, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Sessions refreshed today by this worker, so chat turns schedule at most one run a day
+_last_refreshed: Dict[str, date] = {}
+
+
+def _mark_refreshed(session_id: str) -> None:
+    """Record today's refresh, dropping sessions refreshed on earlier days"""
+    today = date.today()
+    for refreshed_id in [key for key, day in _last_refreshed.items() if day != today]:
+        del _last_refreshed[refreshed_id]
+    _last_refreshed[session_id] = today
+
+
+def _next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def rollup_cutoff(today: Optional[date] = None) -> date:
+    """First day of the oldest month that is not rolled up yet"""
+    today = today or date.today()
+    return (today - timedelta(days=ai_config.JOURNAL_ROLLUP_AGE_DAYS)).replace(day=1)
+
+
+def rollups_due(session_id: str) -> bool:
+    """True if this worker has not refreshed the session's rollups today"""
+    return ai_config.JOURNAL_ROLLUPS_ENABLED and _last_refreshed.get(session_id) != date.today()
+
+
+class JournalRollupService:
+    """Build monthly journal rollups and read them for prompts"""
+
+    @staticmethod
+    def get_rollups(db: Session, session_id: str) -> List[JournalMonthlyRollup]:
+        """The session's rollups, oldest month first"""
+        if not ai_config.JOURNAL_ROLLUPS_ENABLED:
+            return []
+        return db.query(JournalMonthlyRollup).filter(
+            JournalMonthlyRollup.session_id == session_id
+        ).order_by(JournalMonthlyRollup.month).all()
+
+    def current_rollups(self, db: Session, session_id: str) -> List[JournalMonthlyRollup]:
+        """The session's rollups up to the first month whose entries changed since it was built"""
+        rollups = self.get_rollups(db, session_id)
+        if not rollups:
+            return []
+        months = {
+            row.month: row for row in self._month_stats(db, session_id, self.covered_through(rollups))
+        }
+
+        current = []
+        for rollup in rollups:
+            row = months.get(rollup.month)
+            if not row or row.entry_count != rollup.entry_count or row.latest != rollup.source_updated_at:
+                # Read this month and later ones entry by entry; refresh on the next chat turn
+                _last_refreshed.pop(session_id, None)
+                break
+            current.append(rollup)
+        return current
+
+    @staticmethod
+    def _month_stats(db: Session, session_id: str, before: date) -> list:
+        """Entry count and latest `updated_at` per month, for entries dated before `before`"""
+        month_col = cast(func.date_trunc("month", JournalEntry.entry_date), Date)
+        return db.query(
+            month_col.label("month"),
+            func.count(JournalEntry.id).label("entry_count"),
+            func.max(JournalEntry.updated_at).label("latest")
+        ).filter(
+            JournalEntry.session_id == session_id,
+            JournalEntry.entry_date < before
+        ).group_by(month_col).order_by(month_col).all()
+
+    @staticmethod
+    def covered_through(rollups: List[JournalMonthlyRollup]) -> Optional[date]:
+        """First date not covered by the rollups; entries from then on are read individually"""
+        if not rollups:
+            return None
+        return _next_month(rollups[-1].month)
+
+    @staticmethod
+    def format_rollups(rollups: List[JournalMonthlyRollup]) -> List[str]:
+        """One block per month, newest first"""
+        return [
+            f"**{rollup.month:%B %Y}** ({rollup.entry_count} entries)\n{rollup.summary}\n\n"
+            for rollup in reversed(rollups)
+        ]
+
+    async def refresh(self, db: Session, session_id: str) -> int:
+        """Build missing and stale rollups for a session; returns the number written"""
+        months = self._month_stats(db, session_id, rollup_cutoff())
+        existing = {rollup.month: rollup for rollup in self.get_rollups(db, session_id)}
+
+        # Months whose entries were all deleted
+        current_months = {row.month for row in months}
+        stale_months = [month for month in existing if month not in current_months]
+        if stale_months:
+            db.query(JournalMonthlyRollup).filter(
+                JournalMonthlyRollup.session_id == session_id,
+                JournalMonthlyRollup.month.in_(stale_months)
+            ).delete(synchronize_session=False)
+            journal_snapshots.invalidate(db, session_id)
+            db.commit()
+
+        written = 0
+        for row in months:
+            rollup = existing.get(row.month)
+            if rollup and rollup.entry_count == row.entry_count and rollup.source_updated_at == row.latest:
+                continue
+
+            summary = await self._summarize_month(db, session_id, row.month)
+            if not summary:
+                # Stop so rolled-up months stay a prefix of the journal
+                logger.warning(f"Journal rollup for {row.month:%Y-%m} failed for session {session_id}")
+                break
+
+            now = datetime.utcnow()
+            statement = insert(JournalMonthlyRollup).values(
+                session_id=session_id,
+                month=row.month,
+                summary=summary,
+                entry_count=row.entry_count,
+                source_updated_at=row.latest,
+                created_at=now,
+                updated_at=now
+            )
+            db.execute(statement.on_conflict_do_update(
+                constraint="uq_journal_monthly_rollups_session_month",
+                set_={
+                    "summary": statement.excluded.summary,
+                    "entry_count": statement.excluded.entry_count,
+                    "source_updated_at": statement.excluded.source_updated_at,
+                    "updated_at": statement.excluded.updated_at
+                }
+            ))
+            journal_snapshots.invalidate(db, session_id)
+            db.commit()
+            written += 1
+
+        if written:
+            logger.info(f"Wrote {written} journal rollups for session {session_id}")
+        return written
+
+    @staticmethod
+    async def _summarize_month(db: Session, session_id: str, month: date) -> Optional[str]:
+        entries = db.query(JournalEntry).filter(
+            JournalEntry.session_id == session_id,
+            JournalEntry.entry_date >= month,
+            JournalEntry.entry_date < _next_month(month)
+        ).order_by(JournalEntry.entry_date, JournalEntry.created_at).all()
+        if not entries:
+            return None
+
+        entries_text = "\n\n".join(
+            f"{entry.entry_date} [{entry.entry_type.value}] {entry.title}\n{entry.content}"
+            for entry in entries
+        )
+        entries_text = budget_document(entries_text, ai_config.PROMPT_SECTION_TOKENS["document"])
+
+        from app.services.openai_service import openai_service
+        messages = openai_service.prompt_prefix(ai_config.JOURNAL_ROLLUP_INSTRUCTIONS)
+        messages.append({
+            "role": "user",
+            "content": ai_config.get_journal_rollup_prompt(f"{month:%B %Y}", entries_text)
+        })
+        summary = await openai_service.generate_text(messages, task="journal_rollup", priority=Priority.BACKGROUND)
+        return summary.strip() if summary else None
+
+
+journal_rollup_service = JournalRollupService()
+
+
+async def run_journal_rollups(session_id: str) -> None:
+    """Refresh a session's rollups in the background with its own database session"""
+    if not rollups_due(session_id) or openai_circuit.is_degraded:
+        return
+    _mark_refreshed(session_id)
+
+    db = SessionLocal()
+    try:
+        await journal_rollup_service.refresh(db, session_id)
+    except Exception as e:
+        db.rollback()
+        _last_refreshed.pop(session_id, None)
+        logger.error(f"Journal rollup refresh failed for session {session_id}: {e}", exc_info=True)
+    finally:
+        db.close()
+
+
+async def _refresh_all() -> int:
+    db = SessionLocal()
+    try:
+        session_ids = [
+            row.session_id for row in db.query(JournalEntry.session_id).filter(
+                JournalEntry.entry_date < rollup_cutoff()
+            ).distinct().all()
+        ]
+        written = 0
+        for session_id in session_ids:
+            written += await journal_rollup_service.refresh(db, session_id)
+        return written
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] != "refresh":
+        print("Usage: python -m app.services.journal_rollups refresh")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO)
+    count = asyncio.run(_refresh_all())
+    print(f"Wrote {count} journal rollups")
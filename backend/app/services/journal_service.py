@@ -1,6 +1,15 @@
-from openai import OpenAI
-from app.core.config import settings
 from app.config import ai_config
+from app.core.llm_scheduler import Priority
+from app.services.journal_index import journal_index
+from app.services.journal_rollups import journal_rollup_service
+from app.services import journal_snapshots
+from app.services.prompt_budget import count_tokens, fill_greedy
+from app.services.synthesis_prefilter import (
+    SKIP_REASON,
+    is_trivial_exchange,
+    skip_synthesis,
+    synthesis_prefilter_stats
+)
 from app.models.journal import JournalEntry, EntryType
 from app.schemas.journal import (
     JournalEntryCreate,
@@ -57,8 +66,6 @@ class JournalService:
 
     def __init__(self, db: Session):
         self.db = db
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.model = ai_config.CHAT_MODEL
 
     async def assess_and_synthesize(
         self,
@@ -69,6 +76,65 @@ class JournalService:
         entry_date: Optional[date] = None
     ) -> JournalSynthesisResult:
         """Assess if conversation contains journal-worthy information"""
+        if skip_synthesis(user_message, ai_response):
+            return self._skipped_result()
+        return await self._synthesize(
+            f"User: {user_message}\nAssistant: {ai_response}",
+            session_id=session_id,
+            source_message_ids=[conversation_id] if conversation_id else None,
+            entry_date=entry_date
+        )
+
+    async def assess_and_synthesize_batch(
+        self,
+        exchanges: List[Dict],
+        session_id: str,
+        entry_date: Optional[date] = None
+    ) -> JournalSynthesisResult:
+        """Synthesize journal entries for several exchanges with one model call.
+
+        `exchanges` are dicts with `conversation_id`, `user_message` and
+        `ai_response`, oldest first. Related information across exchanges is
+        merged into as few entries as needed. Greetings and acknowledgements
+        are left out; if nothing else remains, no model call is made.
+        """
+        if ai_config.JOURNAL_PREFILTER_ENABLED:
+            exchanges = [
+                exchange for exchange in exchanges
+                if not is_trivial_exchange(exchange["user_message"], exchange["ai_response"])
+            ]
+            synthesis_prefilter_stats.record(skipped=not exchanges)
+            if not exchanges:
+                return self._skipped_result()
+
+        transcript = "\n\n".join(
+            f"User: {exchange['user_message']}\nAssistant: {exchange['ai_response']}"
+            for exchange in exchanges
+        )
+        return await self._synthesize(
+            transcript,
+            session_id=session_id,
+            source_message_ids=[exchange["conversation_id"] for exchange in exchanges],
+            entry_date=entry_date,
+            note=(
+                f"This conversation covers {len(exchanges)} exchanges. Merge related "
+                "information into as few entries as needed; do not create one entry per exchange."
+            ) if len(exchanges) > 1 else None
+        )
+
+    @staticmethod
+    def _skipped_result() -> JournalSynthesisResult:
+        return JournalSynthesisResult(should_create=False, reasoning=SKIP_REASON, suggested_entries=[])
+
+    async def _synthesize(
+        self,
+        conversation_text: str,
+        session_id: str,
+        source_message_ids: Optional[List[int]] = None,
+        entry_date: Optional[date] = None,
+        note: Optional[str] = None
+    ) -> JournalSynthesisResult:
+        """Run the synthesis model call over a conversation transcript and save its entries"""
         try:
             recent_entries = self._get_recent_entries(session_id, days=7)
             recent_context = self._format_recent_journal_brief(recent_entries)
@@ -77,49 +143,18 @@ class JournalService:
 {recent_context}
 
 Conversation:
-User: {user_message}
-Assistant: {ai_response}
-
-Create a journal entry for this conversation. Set should_create to true unless this is just a greeting with no substance (like just "hi" or "thanks").
-
-Choose the appropriate entry type (MEDICAL_UPDATE, TREATMENT_CHANGE, APPOINTMENT, QUESTION, INSIGHT, or MILESTONE).
-
-Adjust detail level based on importance:
-- Important topics (test results, new diagnoses, treatment changes) = detailed entry with context
-- Routine topics (general questions, simple updates) = brief entry (1-2 sentences)
-- Significant moments (milestones, major decisions) = thoughtful entry
-
-IMPORTANT: Respond with ONLY a valid JSON object in this exact format, with no additional text before or after:
-{{
-  "should_create": true or false,
-  "reasoning": "brief explanation",
-  "suggested_entries": [
-    {{
-      "title": "entry title (max 100 chars)",
-      "content": "entry content",
-      "entry_type": "MEDICAL_UPDATE or TREATMENT_CHANGE or APPOINTMENT or QUESTION or INSIGHT or MILESTONE"
-    }}
-  ]
-}}"""
-
-            messages = [
-                {"role": "system", "content": ai_config.JOURNAL_SYNTHESIS_PROMPT},
-                {"role": "user", "content": prompt}
-            ]
-
-            # Use Responses API
-            response = self.client.responses.create(
-                model=self.model,
-                input=messages
+{conversation_text}"""
+            if note:
+                prompt += f"\n\n{note}"
+
+            # Stable instructions first so the prompt prefix can be cached
+            from app.services.openai_service import openai_service
+            messages = openai_service.prompt_prefix(
+                f"{ai_config.JOURNAL_SYNTHESIS_PROMPT}\n{ai_config.JOURNAL_SYNTHESIS_INSTRUCTIONS}"
             )
+            messages.append({"role": "user", "content": prompt})
 
-            # Extract text from Responses API
-            text = getattr(response, "output_text", None)
-            if text is None and getattr(response, "output", None):
-                first_item = response.output[0]
-                if getattr(first_item, "content", None):
-                    first_content = first_item.content[0]
-                    text = getattr(first_content, "text", None)
+            text = await openai_service.generate_text(messages, task="journal_synthesis", priority=Priority.BACKGROUND)
 
             if not text:
                 raise Exception("No response from AI")
@@ -138,40 +173,13 @@ IMPORTANT: Respond with ONLY a valid JSON object in this exact format, with no a
 
             result_json = json.loads(cleaned_text)
 
-            # Convert to Pydantic models
-            suggestions = [
-                JournalSuggestion(
-                    title=entry["title"],
-                    content=entry["content"],
-                    entry_type=EntryType(entry["entry_type"]),
-                    confidence=1.0  # Always save - no confidence filtering
-                )
-                for entry in result_json["suggested_entries"]
-            ]
-
-            synthesis_result = JournalSynthesisResult(
-                should_create=result_json["should_create"],
-                reasoning=result_json["reasoning"],
-                suggested_entries=suggestions
+            return await self.apply_synthesis(
+                result_json,
+                session_id=session_id,
+                entry_date=entry_date,
+                source_message_ids=source_message_ids
             )
 
-            # Auto-save ALL suggested entries with user's date
-            use_date = entry_date if entry_date else date.today()
-            for suggestion in suggestions:
-                await self.create_entry(
-                    session_id=session_id,
-                    entry_data=JournalEntryCreate(
-                        title=suggestion.title,
-                        content=suggestion.content,
-                        entry_type=suggestion.entry_type,
-                        entry_date=use_date
-                    ),
-                    created_by="ai",
-                    source_message_ids=[conversation_id] if conversation_id else None
-                )
-
-            return synthesis_result
-
         except json.JSONDecodeError as e:
             logger.error(f"JSON decode error during journal synthesis: {e}")
             logger.error(f"Response text: {text if 'text' in locals() else 'No text'}")
@@ -188,71 +196,240 @@ IMPORTANT: Respond with ONLY a valid JSON object in this exact format, with no a
                 suggested_entries=[]
             )
 
+    @classmethod
+    def chat_with_synthesis_schema(cls) -> Dict:
+        """JSON Schema for a chat reply plus journal synthesis in one structured response.
+
+        Extends JOURNAL_SYNTHESIS_SCHEMA with a `reply` field. Keywords that strict
+        structured output does not accept (maxLength) are dropped; titles are
+        truncated when saved instead.
+        """
+        entry_schema = dict(cls.JOURNAL_SYNTHESIS_SCHEMA["properties"]["suggested_entries"]["items"])
+        entry_schema["properties"] = dict(entry_schema["properties"], title={"type": "string"})
+
+        properties = {
+            "reply": {
+                "type": "string",
+                "description": "The markdown response shown to the caregiver"
+            },
+            **cls.JOURNAL_SYNTHESIS_SCHEMA["properties"],
+            "suggested_entries": {"type": "array", "items": entry_schema}
+        }
+        return {
+            "type": "object",
+            "properties": properties,
+            "required": ["reply"] + cls.JOURNAL_SYNTHESIS_SCHEMA["required"],
+            "additionalProperties": False
+        }
+
+    async def apply_synthesis(
+        self,
+        result_json: Dict,
+        session_id: str,
+        conversation_id: Optional[int] = None,
+        entry_date: Optional[date] = None,
+        source_message_ids: Optional[List[int]] = None
+    ) -> JournalSynthesisResult:
+        """Convert a synthesis JSON payload to a result and auto-save its entries"""
+        # Convert to Pydantic models
+        suggestions = [
+            JournalSuggestion(
+                title=entry["title"][:100],
+                content=entry["content"],
+                entry_type=EntryType(entry["entry_type"]),
+                confidence=1.0  # Always save - no confidence filtering
+            )
+            for entry in result_json["suggested_entries"]
+        ]
+
+        synthesis_result = JournalSynthesisResult(
+            should_create=result_json["should_create"],
+            reasoning=result_json["reasoning"],
+            suggested_entries=suggestions
+        )
+
+        # Auto-save ALL suggested entries with user's date
+        use_date = entry_date if entry_date else date.today()
+        for suggestion in suggestions:
+            await self.create_entry(
+                session_id=session_id,
+                entry_data=JournalEntryCreate(
+                    title=suggestion.title,
+                    content=suggestion.content,
+                    entry_type=suggestion.entry_type,
+                    entry_date=use_date
+                ),
+                created_by="ai",
+                source_message_ids=source_message_ids or ([conversation_id] if conversation_id else None)
+            )
+
+        return synthesis_result
+
     async def format_journal_context(
         self,
         session_id: str,
-        max_tokens: int = None
+        max_tokens: int = None,
+        query: Optional[str] = None
     ) -> str:
-        """Format journal context for conversation with tiered loading"""
+        """Format journal context for a prompt.
+
+        With a `query` (the user's message, term or situation), larger journals
+        are narrowed to the newest entries plus the entries most relevant to the
+        query. Otherwise entries are loaded in tiers by age, with months covered
+        by monthly rollups read from the rollups instead of their entries. The
+        tiered context is stored per session and reused until the journal
+        changes or the date moves entries between tiers.
+        """
         if max_tokens is None:
             max_tokens = ai_config.MAX_JOURNAL_TOKENS
         try:
-            entries = self.db.query(JournalEntry).filter(
-                JournalEntry.session_id == session_id
-            ).order_by(desc(JournalEntry.entry_date)).all()
-
-            if not entries:
-                return "# Care Journal\n\nNo journal entries yet."
+            retrieval = bool(query) and ai_config.JOURNAL_RETRIEVAL_ENABLED
+            snapshot = journal_snapshots.load_current(self.db, session_id, max_tokens)
+            if snapshot and not (
+                retrieval and snapshot.entry_count > ai_config.JOURNAL_RECENT_ENTRIES + ai_config.JOURNAL_RETRIEVAL_TOP_K
+            ):
+                return snapshot.content
 
-            now = date.today()
-            full_detail = []
-            summarized = []
-            titles_only = []
+            if retrieval:
+                sections, hidden = self._retrieval_sections(session_id, query)
+                if sections is not None:
+                    return self._render_context(sections, max_tokens, hidden)
 
-            for entry in entries:
-                days_old = (now - entry.entry_date).days
-
-                if days_old <= 7:
-                    full_detail.append(entry)
-                elif days_old <= 30:
-                    summarized.append(entry)
-                else:
-                    titles_only.append(entry)
-
-            context = "# Care Journal Context\n\n"
-
-            # Recent entries (full detail)
-            if full_detail:
-                context += "## Recent Entries (Last 7 Days)\n\n"
-                for e in full_detail:
-                    context += f"**{e.entry_date}** [{e.entry_type.value}] **{e.title}**\n{e.content}\n\n"
-
-            # Mid-range entries (summarized)
-            if summarized:
-                context += "## Previous Entries (8-30 Days Ago)\n\n"
-                for e in summarized:
-                    summary = e.content[:150] + "..." if len(e.content) > 150 else e.content
-                    context += f"**{e.entry_date}** {e.title}: {summary}\n\n"
-
-            # Older entries (titles only)
-            if titles_only:
-                context += "## Earlier History (30+ Days Ago)\n\n"
-                by_month = self._group_by_month(titles_only)
-                for month, month_entries in by_month.items():
-                    context += f"**{month}**: "
-                    context += ", ".join([e.title for e in month_entries])
-                    context += "\n\n"
-
-            # Rough token limit (4 chars per token estimate)
-            if len(context) > max_tokens * 4:
-                context = context[:max_tokens * 4] + "\n\n[Context truncated]"
-
-            return context
+            return self._tiered_context(session_id, max_tokens)
 
         except Exception as e:
+            self.db.rollback()
             logger.error(f"Error formatting journal context: {e}")
             return "# Care Journal\n\nUnable to load journal context."
 
+    def _tiered_context(self, session_id: str, max_tokens: int) -> str:
+        """Build the tiered journal context and store it as the session's snapshot"""
+        # Taken before reading entries, so a change made during the build discards it
+        version = journal_snapshots.begin_build(self.db, session_id)
+
+        rollups = journal_rollup_service.current_rollups(self.db, session_id)
+        query_entries = self.db.query(JournalEntry).filter(JournalEntry.session_id == session_id)
+        if rollups:
+            query_entries = query_entries.filter(
+                JournalEntry.entry_date >= journal_rollup_service.covered_through(rollups)
+            )
+        entries = query_entries.order_by(desc(JournalEntry.entry_date)).all()
+
+        if not entries and not rollups:
+            context = "# Care Journal\n\nNo journal entries yet."
+        else:
+            sections = self._tiered_sections(entries)
+            if rollups:
+                sections.append((
+                    "## Monthly Summaries (Older History)\n\n",
+                    journal_rollup_service.format_rollups(rollups)
+                ))
+            context = self._render_context(sections, max_tokens)
+
+        if version is not None:
+            entry_count = len(entries) if not rollups else self.db.query(JournalEntry).filter(
+                JournalEntry.session_id == session_id
+            ).count()
+            journal_snapshots.store(self.db, session_id, version, context, entry_count, max_tokens)
+        return context
+
+    @staticmethod
+    def _format_entry(entry: JournalEntry) -> str:
+        return f"**{entry.entry_date}** [{entry.entry_type.value}] **{entry.title}**\n{entry.content}\n\n"
+
+    def _tiered_sections(self, entries: List[JournalEntry]) -> List[tuple]:
+        """Sections for the whole journal: full detail, summaries, then titles by month"""
+        now = date.today()
+        full_detail = []
+        summarized = []
+        titles_only = []
+
+        for entry in entries:
+            days_old = (now - entry.entry_date).days
+
+            if days_old <= 7:
+                full_detail.append(entry)
+            elif days_old <= 30:
+                summarized.append(entry)
+            else:
+                titles_only.append(entry)
+
+        sections = []
+        if full_detail:
+            sections.append((
+                "## Recent Entries (Last 7 Days)\n\n",
+                [self._format_entry(e) for e in full_detail]
+            ))
+        if summarized:
+            blocks = []
+            for e in summarized:
+                summary = e.content[:150] + "..." if len(e.content) > 150 else e.content
+                blocks.append(f"**{e.entry_date}** {e.title}: {summary}\n\n")
+            sections.append(("## Previous Entries (8-30 Days Ago)\n\n", blocks))
+        if titles_only:
+            by_month = self._group_by_month(titles_only)
+            sections.append((
+                "## Earlier History (30+ Days Ago)\n\n",
+                [f"**{month}**: " + ", ".join([e.title for e in month_entries]) + "\n\n"
+                 for month, month_entries in by_month.items()]
+            ))
+        return sections
+
+    def _retrieval_sections(self, session_id: str, query: str):
+        """Sections for the newest entries plus the best BM25 matches for the query.
+
+        Returns (sections, number of entries left out), or (None, 0) when the
+        journal is small enough to include in full.
+        """
+        recent_count = ai_config.JOURNAL_RECENT_ENTRIES
+        top_k = ai_config.JOURNAL_RETRIEVAL_TOP_K
+        total = self.db.query(JournalEntry).filter(JournalEntry.session_id == session_id).count()
+        if total <= recent_count + top_k:
+            return None, 0
+
+        recent = self.db.query(JournalEntry).filter(
+            JournalEntry.session_id == session_id
+        ).order_by(desc(JournalEntry.entry_date), desc(JournalEntry.created_at)).limit(recent_count).all()
+        recent_ids = {e.id for e in recent}
+
+        hits = journal_index.search(session_id, query, top_k + recent_count, self.db)
+        relevant_ids = [entry_id for entry_id, _ in hits if entry_id not in recent_ids][:top_k]
+        relevant = []
+        if relevant_ids:
+            by_id = {
+                e.id: e for e in self.db.query(JournalEntry).filter(JournalEntry.id.in_(relevant_ids)).all()
+            }
+            relevant = [by_id[entry_id] for entry_id in relevant_ids if entry_id in by_id]
+
+        sections = [("## Recent Entries\n\n", [self._format_entry(e) for e in recent])]
+        if relevant:
+            sections.append((
+                "## Relevant Earlier Entries\n\n",
+                [self._format_entry(e) for e in relevant]
+            ))
+        return sections, total - len(recent) - len(relevant)
+
+    @staticmethod
+    def _render_context(sections: List[tuple], max_tokens: int, hidden: int = 0) -> str:
+        """Render sections with whole entries, in order, until the token allowance is used"""
+        parts = ["# Care Journal Context\n\n"]
+        remaining = max_tokens - count_tokens(parts[0])
+        total_omitted = 0
+        for heading, blocks in sections:
+            kept, used, omitted = fill_greedy(blocks, remaining - count_tokens(heading), count_tokens)
+            total_omitted += omitted
+            if kept:
+                parts.append(heading)
+                parts.extend(kept)
+                remaining -= count_tokens(heading) + used
+
+        if total_omitted:
+            parts.append(f"[{total_omitted} older journal item(s) omitted to fit the context budget]\n")
+        if hidden:
+            parts.append(f"[{hidden} other journal entries not relevant to this message are not shown]\n")
+
+        return "".join(parts)
+
     async def create_entry(
         self,
         session_id: str,
@@ -260,10 +437,19 @@ IMPORTANT: Respond with ONLY a valid JSON object in this exact format, with no a
         created_by: str,
         source_message_ids: Optional[List[int]] = None
     ) -> JournalEntry:
-        """Create a new journal entry"""
+        """Create a new journal entry.
+
+        AI entries that nearly duplicate a recent entry are merged into it
+        instead (see `_merge_near_duplicate`), and the existing entry is returned.
+        """
         try:
             entry_date = entry_data.entry_date or date.today()
 
+            if created_by == "ai" and ai_config.JOURNAL_DEDUP_ENABLED:
+                existing = self._merge_near_duplicate(session_id, entry_data, entry_date, source_message_ids)
+                if existing:
+                    return existing
+
             entry = JournalEntry(
                 session_id=session_id,
                 entry_date=entry_date,
@@ -275,8 +461,10 @@ IMPORTANT: Respond with ONLY a valid JSON object in this exact format, with no a
             )
 
             self.db.add(entry)
+            journal_snapshots.invalidate(self.db, session_id)
             self.db.commit()
             self.db.refresh(entry)
+            journal_index.entry_saved(entry)
 
             # Update session journal count
             from app.models.session import Session
@@ -284,6 +472,8 @@ IMPORTANT: Respond with ONLY a valid JSON object in this exact format, with no a
             if session:
                 session.journal_entry_count += 1
                 session.last_journal_synthesis = datetime.utcnow()
+                if created_by != "ai":
+                    session.journal_edited_at = datetime.utcnow()
                 self.db.commit()
 
             return entry
@@ -293,6 +483,64 @@ IMPORTANT: Respond with ONLY a valid JSON object in this exact format, with no a
             logger.error(f"Error creating journal entry: {e}")
             raise
 
+    def _merge_near_duplicate(
+        self,
+        session_id: str,
+        entry_data: JournalEntryCreate,
+        entry_date: date,
+        source_message_ids: Optional[List[int]]
+    ) -> Optional[JournalEntry]:
+        """Fold a new AI entry into a near-identical entry, if there is one.
+
+        Candidates are entries within JOURNAL_DEDUP_WINDOW_DAYS of the new
+        entry's date whose estimated similarity reaches JOURNAL_DEDUP_THRESHOLD.
+        The new entry's source messages are added to the match. If the match is
+        an AI entry and the new text is longer, the new text replaces it;
+        otherwise the new entry is dropped. User-written entries are never
+        rewritten. Returns the matched entry, or None if there is no match.
+        """
+        matches = journal_index.near_duplicates(
+            session_id, entry_data.title, entry_data.content, ai_config.JOURNAL_DEDUP_THRESHOLD, self.db
+        )
+        if not matches:
+            return None
+
+        window = timedelta(days=ai_config.JOURNAL_DEDUP_WINDOW_DAYS)
+        candidates = {
+            entry.id: entry
+            for entry in self.db.query(JournalEntry).filter(
+                JournalEntry.id.in_([entry_id for entry_id, _ in matches]),
+                JournalEntry.entry_date >= entry_date - window,
+                JournalEntry.entry_date <= entry_date + window
+            ).all()
+        }
+        match = next(
+            ((candidates[entry_id], similarity) for entry_id, similarity in matches if entry_id in candidates),
+            None
+        )
+        if match is None:
+            return None
+        existing, similarity = match
+
+        existing.source_message_ids = list(dict.fromkeys(
+            (existing.source_message_ids or []) + (source_message_ids or [])
+        ))
+        replaced = existing.created_by == "ai" and len(entry_data.content) > len(existing.content)
+        if replaced:
+            existing.title = entry_data.title
+            existing.content = entry_data.content
+            existing.updated_at = datetime.utcnow()
+
+        journal_snapshots.invalidate(self.db, session_id)
+        self.db.commit()
+        self.db.refresh(existing)
+        journal_index.entry_saved(existing)
+        logger.info(
+            f"{'Merged' if replaced else 'Dropped'} AI journal entry near-duplicate of entry {existing.id} "
+            f"(similarity {similarity:.2f}) in session {session_id}"
+        )
+        return existing
+
     async def update_entry(
         self,
         entry_id: int,
@@ -332,9 +580,12 @@ IMPORTANT: Respond with ONLY a valid JSON object in this exact format, with no a
                 entry.entry_date = updates.entry_date
 
             entry.updated_at = datetime.utcnow()
+            session.journal_edited_at = datetime.utcnow()
+            journal_snapshots.invalidate(self.db, session.id)
 
             self.db.commit()
             self.db.refresh(entry)
+            journal_index.entry_saved(entry)
 
             return entry
 
@@ -375,8 +626,11 @@ IMPORTANT: Respond with ONLY a valid JSON object in this exact format, with no a
             # Update session journal count
             if session:
                 session.journal_entry_count = max(0, session.journal_entry_count - 1)
+                session.journal_edited_at = datetime.utcnow()
+            journal_snapshots.invalidate(self.db, session.id)
 
             self.db.commit()
+            journal_index.entry_deleted(session.id, entry_id)
             return True
 
         except Exception as e:
@@ -0,0 +1,77 @@
+"""
+Stored journal context per session.
+
+The tiered journal context (see JournalService.format_journal_context) only
+changes when the journal or its rollups change, or when the date moves
+entries between age tiers. It is kept in `journal_context_snapshots`, so most
+prompts read one row by primary key instead of loading and formatting the
+whole journal.
+
+Writers call `invalidate` in the same transaction as their change. Readers
+build a missing or outdated snapshot with `begin_build` and `store`; `store`
+only writes if no change happened since `begin_build`.
+"""
+from app.config import ai_config
+from app.models.journal_context_snapshot import JournalContextSnapshot
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from datetime import date, datetime
+from typing import Optional
+
+
+def load_current(db: Session, session_id: str, max_tokens: int) -> Optional[JournalContextSnapshot]:
+    """The session's snapshot if it is built for today and this allowance"""
+    if not ai_config.JOURNAL_CONTEXT_SNAPSHOTS_ENABLED:
+        return None
+    snapshot = db.get(JournalContextSnapshot, session_id)
+    if (
+        snapshot is None
+        or snapshot.content is None
+        or snapshot.built_on != date.today()
+        or snapshot.max_tokens != max_tokens
+    ):
+        return None
+    return snapshot
+
+
+def invalidate(db: Session, session_id: str) -> None:
+    """Mark the session's snapshot outdated; commits with the caller's change"""
+    db.query(JournalContextSnapshot).filter(
+        JournalContextSnapshot.session_id == session_id
+    ).update({
+        JournalContextSnapshot.version: JournalContextSnapshot.version + 1,
+        JournalContextSnapshot.content: None
+    }, synchronize_session=False)
+
+
+def begin_build(db: Session, session_id: str) -> Optional[int]:
+    """Return the snapshot version a new build is based on (None if disabled)"""
+    if not ai_config.JOURNAL_CONTEXT_SNAPSHOTS_ENABLED:
+        return None
+    db.execute(
+        insert(JournalContextSnapshot)
+        .values(session_id=session_id, version=0, updated_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["session_id"])
+    )
+    db.commit()
+    return db.query(JournalContextSnapshot.version).filter(
+        JournalContextSnapshot.session_id == session_id
+    ).scalar()
+
+
+def store(db: Session, session_id: str, version: Optional[int], content: str, entry_count: int, max_tokens: int) -> bool:
+    """Save a built snapshot unless the journal changed since `begin_build`"""
+    if version is None:
+        return False
+    updated = db.query(JournalContextSnapshot).filter(
+        JournalContextSnapshot.session_id == session_id,
+        JournalContextSnapshot.version == version
+    ).update({
+        JournalContextSnapshot.content: content,
+        JournalContextSnapshot.entry_count: entry_count,
+        JournalContextSnapshot.max_tokens: max_tokens,
+        JournalContextSnapshot.built_on: date.today(),
+        JournalContextSnapshot.updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.commit()
+    return bool(updated)
@@ -0,0 +1,196 @@
+"""
+Content-addressed cache for model responses.
+
+Responses are keyed by a SHA-256 of the model, the full message list and any
+request options, so only byte-identical requests share a result. Caching is
+opt-in per task via `ai_config.LLM_CACHE_TTL_SECONDS`. Lookups check an
+in-process LRU first, then (optionally) the `llm_cache_entries` table.
+Identical requests that arrive while a call is already running wait for that
+call instead of starting their own; if that call is abandoned because its
+request was cancelled or ran out of time, they make their own call instead.
+Database reads and writes run in a worker thread so they never block the
+event loop.
+"""
+from app.config import ai_config
+from app.core.database import SessionLocal
+from app.core.request_deadline import DeadlineExceeded, run_blocking
+from app.models.llm_cache_entry import LLMCacheEntry
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# In-flight result when the leading call was abandoned by its request
+_ABANDONED = object()
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + Postgres) response cache with single-flight"""
+
+    def __init__(self, max_entries: int = ai_config.LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, datetime]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    @staticmethod
+    def is_enabled(task: str) -> bool:
+        return task in ai_config.LLM_CACHE_TTL_SECONDS
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict], request_options: Optional[Dict] = None) -> str:
+        payload = json.dumps(
+            {"model": model, "input": messages, "options": request_options or {}},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get_or_create(
+        self,
+        task: str,
+        model: str,
+        messages: List[Dict],
+        producer: Callable[[], Awaitable[Optional[str]]],
+        request_options: Optional[Dict] = None
+    ) -> Optional[str]:
+        """Return a cached response for this request, calling `producer` on a miss.
+
+        `producer` returns the response text or None on failure; failures are
+        never cached. Tasks without a configured TTL bypass the cache.
+        """
+        if not self.is_enabled(task):
+            return await producer()
+
+        key = self.make_key(model, messages, request_options)
+        stats = self._stats[task]
+
+        cached = self._get_memory(key)
+        if cached is not None:
+            stats["memory_hits"] += 1
+            return cached
+
+        # Join an identical call that is already running
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            stats["coalesced"] += 1
+            result = await asyncio.shield(inflight)
+            if result is not _ABANDONED:
+                return result
+            # The leading call's own request was cancelled or ran out of time
+            return await producer()
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = None
+            if ai_config.LLM_CACHE_USE_DATABASE:
+                result = await run_blocking(self._get_database, key)
+                if result is not None:
+                    stats["database_hits"] += 1
+                    self._set_memory(key, result, task)
+
+            if result is None:
+                stats["misses"] += 1
+                result = await producer()
+                if result is not None:
+                    self._set_memory(key, result, task)
+                    if ai_config.LLM_CACHE_USE_DATABASE:
+                        # Not bounded by the request deadline, so a slow write cannot fail a finished call
+                        await asyncio.to_thread(self._set_database, key, result, task, model)
+
+            future.set_result(result)
+            return result
+        except DeadlineExceeded:
+            future.set_result(_ABANDONED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieve the exception so it is not reported as unhandled when no caller joined
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled (client disconnected): joined callers make their own call
+            future.set_result(_ABANDONED)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        text, expires_at = entry
+        if expires_at <= datetime.utcnow():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return text
+
+    def _set_memory(self, key: str, text: str, task: str) -> None:
+        expires_at = datetime.utcnow() + timedelta(seconds=ai_config.LLM_CACHE_TTL_SECONDS[task])
+        self._entries[key] = (text, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_database(self, key: str) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            entry = db.query(LLMCacheEntry).filter(LLMCacheEntry.key == key).first()
+            if entry is None:
+                return None
+            if entry.expires_at <= datetime.utcnow():
+                db.delete(entry)
+                db.commit()
+                return None
+            return entry.response_text
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"LLM cache database read failed: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _set_database(self, key: str, text: str, task: str, model: str) -> None:
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.merge(LLMCacheEntry(
+                key=key,
+                task=task,
+                model=model,
+                response_text=text,
+                created_at=now,
+                expires_at=now + timedelta(seconds=ai_config.LLM_CACHE_TTL_SECONDS[task])
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"LLM cache database write failed: {e}")
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters per task plus current in-memory size"""
+        return {
+            "memory_entries": len(self._entries),
+            "tasks": {
+                task: {
+                    "memory_hits": counts["memory_hits"],
+                    "database_hits": counts["database_hits"],
+                    "coalesced": counts["coalesced"],
+                    "misses": counts["misses"],
+                }
+                for task, counts in self._stats.items()
+            }
+        }
+
+
+llm_response_cache = LLMResponseCache()
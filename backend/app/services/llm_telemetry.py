@@ -0,0 +1,85 @@
+"""
+Per-call telemetry for model requests.
+
+Records token usage (including provider-side cached prompt tokens) and latency
+for every Responses API call, aggregated per task, so prompt-cache hit rates
+and their effect on latency can be checked from the admin console.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LLMTelemetry:
+    """In-process aggregate of model call usage, keyed by task"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started_at = datetime.utcnow()
+        self._tasks: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def record_call(
+        self,
+        task: str,
+        model: str,
+        usage,
+        latency_ms: float,
+        error: Optional[str] = None
+    ) -> None:
+        """Record one model call from its `response.usage` object (may be None)"""
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        output_tokens = getattr(usage, "output_tokens", 0) or 0
+        input_details = getattr(usage, "input_tokens_details", None)
+        cached_tokens = getattr(input_details, "cached_tokens", 0) or 0
+
+        with self._lock:
+            stats = self._tasks[task]
+            stats["calls"] += 1
+            stats["latency_ms_total"] += latency_ms
+            if error:
+                stats["errors"] += 1
+                return
+            stats["input_tokens"] += input_tokens
+            stats["cached_tokens"] += cached_tokens
+            stats["output_tokens"] += output_tokens
+            # Split latency by whether the prompt prefix hit the provider cache
+            if cached_tokens:
+                stats["cache_hit_calls"] += 1
+                stats["cache_hit_latency_ms_total"] += latency_ms
+            else:
+                stats["cache_miss_latency_ms_total"] += latency_ms
+
+        logger.info(
+            f"LLM call task={task} model={model} latency_ms={latency_ms:.0f} "
+            f"input_tokens={input_tokens} cached_tokens={cached_tokens} output_tokens={output_tokens}"
+        )
+
+    def snapshot(self) -> Dict:
+        """Return aggregate usage per task since process start"""
+        with self._lock:
+            tasks = {}
+            for task, stats in self._tasks.items():
+                calls = int(stats["calls"])
+                successes = calls - int(stats["errors"])
+                hit_calls = int(stats["cache_hit_calls"])
+                miss_calls = successes - hit_calls
+                tasks[task] = {
+                    "calls": calls,
+                    "errors": int(stats["errors"]),
+                    "input_tokens": int(stats["input_tokens"]),
+                    "cached_tokens": int(stats["cached_tokens"]),
+                    "output_tokens": int(stats["output_tokens"]),
+                    "cached_token_ratio": round(stats["cached_tokens"] / stats["input_tokens"], 3) if stats["input_tokens"] else 0.0,
+                    "cache_hit_calls": hit_calls,
+                    "avg_latency_ms": round(stats["latency_ms_total"] / calls, 1) if calls else None,
+                    "avg_cache_hit_latency_ms": round(stats["cache_hit_latency_ms_total"] / hit_calls, 1) if hit_calls else None,
+                    "avg_cache_miss_latency_ms": round(stats["cache_miss_latency_ms_total"] / miss_calls, 1) if miss_calls else None,
+                }
+            return {"since": self._started_at, "tasks": tasks}
+
+
+llm_telemetry = LLMTelemetry()
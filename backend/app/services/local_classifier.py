@@ -0,0 +1,368 @@
+"""
+Local fast-path classifier for document and audio categories.
+
+Many uploads are easy to classify from their text (lab reports with reference
+ranges, discharge summaries, imaging reports), so a small linear model over
+word n-gram features scores the categories locally and the LLM is only called
+when its confidence is below `ai_config.LOCAL_CLASSIFIER_CONFIDENCE_THRESHOLD`.
+
+Training (`train_from_database`, also exposed as POST
+/api/admin/classifiers/train) fits a softmax regression, starting from
+hand-picked keyword weights, on documents and recordings whose category came
+from the model (`category_source`), so the classifier never learns from its
+own predictions. A share of the samples is held out, and the classifier is
+only used once its held-out accuracy reaches
+`ai_config.LOCAL_CLASSIFIER_MIN_VALIDATION_ACCURACY`; until then every upload
+is categorized by the model. Results are stored in the `classifier_models`
+table.
+"""
+from app.config import ai_config
+from app.models.audio_recording import AudioRecording, AudioRecordingCategory
+from app.models.classifier_model import ClassifierModel
+from app.models.document import Document, DocumentCategory
+from sqlalchemy.orm import Session
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import math
+import random
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_CLASSIFIER = "document_category"
+AUDIO_CLASSIFIER = "audio_category"
+
+# Where a stored category came from (Document/AudioRecording.category_source)
+CATEGORY_SOURCE_MODEL = "model"        # Categorized by the model
+CATEGORY_SOURCE_LOCAL = "local"        # Categorized by this classifier
+CATEGORY_SOURCE_FALLBACK = "fallback"  # Model answer missing or unusable
+# Sources used as training labels
+TRAINING_CATEGORY_SOURCES = (CATEGORY_SOURCE_MODEL,)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Seed keyword features per category (phrases of up to three words)
+DOCUMENT_KEYWORDS = {
+    "lab_results": [
+        "reference range", "ref range", "specimen", "collected", "hemoglobin", "hematocrit", "wbc",
+        "platelet count", "creatinine", "glucose", "sodium", "potassium", "metabolic panel", "cbc",
+        "urinalysis", "culture", "a1c", "cholesterol", "abnormal flag", "units",
+    ],
+    "imaging_reports": [
+        "impression", "findings", "radiology", "radiologist", "ct", "mri", "x ray", "xray",
+        "ultrasound", "contrast", "technique", "comparison", "mammogram", "pet scan", "views",
+    ],
+    "clinic_notes": [
+        "chief complaint", "history of present", "hpi", "review of systems", "physical exam",
+        "assessment and plan", "progress note", "office visit", "subjective", "objective", "vitals",
+    ],
+    "medication_records": [
+        "medication list", "mg", "tablet", "capsule", "pharmacy", "refill", "refills", "sig",
+        "prescription", "dispense", "by mouth", "daily", "twice daily", "ndc",
+    ],
+    "discharge_summary": [
+        "discharge summary", "discharge diagnosis", "admission date", "discharge date",
+        "hospital course", "discharged", "after visit summary", "date of admission", "length of stay",
+    ],
+    "treatment_plan": [
+        "treatment plan", "plan of care", "care plan", "regimen", "cycle", "chemotherapy",
+        "radiation therapy", "goals of care", "protocol", "therapy schedule",
+    ],
+    "test_results": [
+        "ecg", "ekg", "echocardiogram", "stress test", "pulmonary function", "eeg", "holter",
+        "sleep study", "audiogram", "colonoscopy", "endoscopy", "nerve conduction",
+    ],
+    "referral": [
+        "referral", "referred", "reason for referral", "referring physician", "referring provider",
+        "consultation request", "second opinion",
+    ],
+    "insurance_billing": [
+        "explanation of benefits", "eob", "claim", "amount billed", "amount due", "balance due",
+        "insurance", "copay", "deductible", "invoice", "cpt", "patient responsibility",
+    ],
+    "consent_form": [
+        "consent", "i authorize", "risks and benefits", "signature", "witness", "hipaa",
+        "release of information", "advance directive", "power of attorney", "dnr",
+    ],
+    "care_instructions": [
+        "instructions", "call your doctor", "wound care", "when to call", "what to expect",
+        "home care", "exercises", "diet", "activity", "return to the",
+    ],
+}
+
+AUDIO_KEYWORDS = {
+    "symptom_update": ["pain", "fever", "headache", "nausea", "tired", "dizzy", "symptoms", "feeling", "cough"],
+    "appointment_recap": ["appointment", "doctor said", "the doctor", "visit", "nurse said", "we saw", "met with"],
+    "medication_note": ["medication", "dose", "pill", "pills", "mg", "prescription", "refill", "took his", "took her"],
+    "question_for_doctor": ["ask the doctor", "question", "questions", "want to ask", "need to ask", "wondering"],
+    "daily_reflection": ["today was", "today", "reflection", "grateful", "long day", "good day"],
+    "progress_update": ["progress", "better", "improving", "recovery", "walking", "stronger"],
+    "side_effects": ["side effect", "side effects", "rash", "vomiting", "reaction", "hair loss"],
+    "care_instruction": ["instructions", "make sure", "change the", "dressing", "remember to"],
+    "emergency_note": ["emergency", "urgent", "er", "ambulance", "911", "can not breathe", "chest pain"],
+    "family_update": ["family", "everyone", "update for", "let you know", "mom", "dad", "grandma"],
+    "treatment_observation": ["treatment", "infusion", "chemo", "therapy", "session", "responding"],
+}
+
+# Initial weight of a seed keyword for its category when training starts
+KEYWORD_WEIGHT = 1.5
+
+# Characters of text used for features (matches the LLM categorization samples)
+DOCUMENT_SAMPLE_CHARS = 2000
+AUDIO_SAMPLE_CHARS = 1500
+
+
+def extract_features(text: str) -> List[str]:
+    """Distinct unigram, bigram and trigram features of lowercased text"""
+    tokens = _TOKEN.findall(text.lower())
+    features = set(tokens)
+    features.update(" ".join(tokens[i:i + 2]) for i in range(len(tokens) - 1))
+    features.update(" ".join(tokens[i:i + 3]) for i in range(len(tokens) - 2))
+    return list(features)
+
+
+def _keyword_feature(phrase: str) -> str:
+    return " ".join(_TOKEN.findall(phrase.lower()))
+
+
+class LinearTextClassifier:
+    """Softmax regression over binary n-gram features"""
+
+    def __init__(self, labels: List[str], weights: Dict[str, Dict[str, float]] = None, bias: Dict[str, float] = None):
+        self.labels = labels
+        self.weights: Dict[str, Dict[str, float]] = weights or {}
+        self.bias: Dict[str, float] = bias or {label: 0.0 for label in labels}
+
+    @classmethod
+    def from_keywords(cls, labels: List[str], keywords: Dict[str, List[str]]) -> "LinearTextClassifier":
+        model = cls(labels)
+        for label, phrases in keywords.items():
+            for phrase in phrases:
+                feature = _keyword_feature(phrase)
+                model.weights.setdefault(feature, {})[label] = KEYWORD_WEIGHT
+        return model
+
+    def _scores(self, features: Iterable[str]) -> Dict[str, float]:
+        scores = dict(self.bias)
+        for feature in features:
+            for label, weight in self.weights.get(feature, {}).items():
+                scores[label] += weight
+        return scores
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        scores = self._scores(extract_features(text))
+        top = max(scores.values())
+        exp_scores = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp_scores.values())
+        return {label: value / total for label, value in exp_scores.items()}
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return the most likely label and its probability"""
+        probabilities = self.predict_proba(text)
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+
+    def train(
+        self,
+        samples: List[Tuple[str, str]],
+        epochs: int = 8,
+        learning_rate: float = 0.2,
+        l2: float = 1e-4,
+        min_feature_count: int = 2,
+        max_features: int = 20000
+    ) -> float:
+        """Fit weights with SGD on (text, label) samples; returns training accuracy"""
+        featurized = [(extract_features(text), label) for text, label in samples if label in self.labels]
+        if not featurized:
+            return 0.0
+
+        # Keep features seen in several samples (plus the seed keywords)
+        counts = Counter(feature for features, _ in featurized for feature in features)
+        vocabulary = {
+            feature for feature, count in counts.most_common(max_features) if count >= min_feature_count
+        } | set(self.weights)
+        featurized = [([f for f in features if f in vocabulary], label) for features, label in featurized]
+
+        rng = random.Random(0)
+        for epoch in range(epochs):
+            rng.shuffle(featurized)
+            rate = learning_rate / (1 + epoch)
+            for features, label in featurized:
+                scores = self._scores(features)
+                top = max(scores.values())
+                exp_scores = {l: math.exp(s - top) for l, s in scores.items()}
+                total = sum(exp_scores.values())
+                for candidate in self.labels:
+                    gradient = exp_scores[candidate] / total - (1.0 if candidate == label else 0.0)
+                    if abs(gradient) < 1e-4:
+                        continue
+                    self.bias[candidate] -= rate * gradient
+                    for feature in features:
+                        feature_weights = self.weights.setdefault(feature, {})
+                        weight = feature_weights.get(candidate, 0.0)
+                        feature_weights[candidate] = weight - rate * (gradient + l2 * weight)
+
+        # Drop negligible weights to keep the stored model small
+        self.weights = {
+            feature: {label: round(w, 4) for label, w in label_weights.items() if abs(w) >= 1e-3}
+            for feature, label_weights in self.weights.items()
+        }
+        self.weights = {feature: w for feature, w in self.weights.items() if w}
+
+        correct = sum(1 for features, label in featurized if max(self._scores(features).items(), key=lambda x: x[1])[0] == label)
+        return correct / len(featurized)
+
+    def accuracy(self, samples: List[Tuple[str, str]]) -> float:
+        """Share of (text, label) samples predicted correctly"""
+        if not samples:
+            return 0.0
+        return sum(1 for text, label in samples if self.predict(text)[0] == label) / len(samples)
+
+    def to_dict(self) -> Dict:
+        return {"labels": self.labels, "weights": self.weights, "bias": self.bias}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LinearTextClassifier":
+        return cls(data["labels"], data["weights"], data["bias"])
+
+
+class LocalClassifierService:
+    """Loads, applies and retrains the document and audio category classifiers"""
+
+    def __init__(self):
+        # None caches "no validated model", so uploads do not query it each time
+        self._models: Dict[str, Optional[LinearTextClassifier]] = {}
+
+    @staticmethod
+    def _seed_model(name: str) -> LinearTextClassifier:
+        if name == DOCUMENT_CLASSIFIER:
+            return LinearTextClassifier.from_keywords([c.value for c in DocumentCategory], DOCUMENT_KEYWORDS)
+        return LinearTextClassifier.from_keywords([c.value for c in AudioRecordingCategory], AUDIO_KEYWORDS)
+
+    def _get_model(self, name: str) -> Optional[LinearTextClassifier]:
+        if name not in self._models:
+            self._models[name] = self._load_model(name)
+        return self._models[name]
+
+    @staticmethod
+    def _passes_validation(validation_accuracy: Optional[float]) -> bool:
+        return (
+            validation_accuracy is not None
+            and validation_accuracy >= ai_config.LOCAL_CLASSIFIER_MIN_VALIDATION_ACCURACY
+        )
+
+    def _load_model(self, name: str) -> Optional[LinearTextClassifier]:
+        """The stored classifier, if it passed its held-out accuracy check"""
+        from app.core.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            row = db.query(ClassifierModel).filter(ClassifierModel.name == name).first()
+            if row is None or not self._passes_validation(row.validation_accuracy):
+                return None
+            return LinearTextClassifier.from_dict(row.weights)
+        except Exception as e:
+            logger.warning(f"Could not load classifier {name}, using the model for categorization: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _classify(self, name: str, text: str, min_chars: int) -> Optional[Tuple[str, float]]:
+        if not ai_config.LOCAL_CLASSIFIER_ENABLED or len(text.strip()) < min_chars:
+            return None
+        model = self._get_model(name)
+        if model is None:
+            return None
+        label, confidence = model.predict(text)
+        if confidence < ai_config.LOCAL_CLASSIFIER_CONFIDENCE_THRESHOLD:
+            return None
+        return label, confidence
+
+    def classify_document(self, text: str, filename: str = "") -> Optional[Tuple[str, float]]:
+        """Return (category, confidence) if the document can be classified locally, else None"""
+        return self._classify(
+            DOCUMENT_CLASSIFIER,
+            f"{filename}\n{text[:DOCUMENT_SAMPLE_CHARS]}",
+            ai_config.LOCAL_CLASSIFIER_MIN_DOCUMENT_CHARS
+        )
+
+    def classify_audio(self, transcribed_text: str) -> Optional[Tuple[str, float]]:
+        """Return (category, confidence) if the recording can be classified locally, else None"""
+        return self._classify(
+            AUDIO_CLASSIFIER,
+            transcribed_text[:AUDIO_SAMPLE_CHARS],
+            ai_config.LOCAL_CLASSIFIER_MIN_AUDIO_CHARS
+        )
+
+    @staticmethod
+    def _split(samples: List[Tuple[str, str]]) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """Deterministic (training, held-out) split of the samples"""
+        shuffled = list(samples)
+        random.Random(0).shuffle(shuffled)
+        held_out = max(1, int(len(shuffled) * ai_config.LOCAL_CLASSIFIER_VALIDATION_FRACTION))
+        return shuffled[held_out:], shuffled[:held_out]
+
+    def train_from_database(self, db: Session) -> Dict[str, Dict]:
+        """Retrain both classifiers from model-categorized rows and store the weights"""
+        documents = db.query(Document.filename, Document.extracted_text, Document.category).filter(
+            Document.category.isnot(None),
+            Document.category_source.in_(TRAINING_CATEGORY_SOURCES),
+            Document.extracted_text.isnot(None)
+        ).all()
+        recordings = db.query(AudioRecording.transcribed_text, AudioRecording.category).filter(
+            AudioRecording.category.isnot(None),
+            AudioRecording.category_source.in_(TRAINING_CATEGORY_SOURCES),
+            AudioRecording.transcribed_text.isnot(None)
+        ).all()
+
+        training_sets = {
+            DOCUMENT_CLASSIFIER: [
+                (f"{filename}\n{text[:DOCUMENT_SAMPLE_CHARS]}", category.value)
+                for filename, text, category in documents
+            ],
+            AUDIO_CLASSIFIER: [(text[:AUDIO_SAMPLE_CHARS], category.value) for text, category in recordings],
+        }
+
+        results = {}
+        for name, samples in training_sets.items():
+            if len(samples) < ai_config.LOCAL_CLASSIFIER_MIN_TRAINING_SAMPLES:
+                results[name] = {
+                    "trained": False, "active": self._get_model(name) is not None, "sample_count": len(samples),
+                    "training_accuracy": None, "validation_accuracy": None
+                }
+                continue
+
+            training_samples, held_out = self._split(samples)
+            model = self._seed_model(name)
+            accuracy = model.train(training_samples)
+            validation_accuracy = model.accuracy(held_out)
+            active = self._passes_validation(validation_accuracy)
+
+            row = db.query(ClassifierModel).filter(ClassifierModel.name == name).first()
+            if row is None:
+                row = ClassifierModel(name=name)
+                db.add(row)
+            row.weights = model.to_dict()
+            row.sample_count = len(samples)
+            row.training_accuracy = accuracy
+            row.validation_accuracy = validation_accuracy
+            row.trained_at = datetime.utcnow()
+            db.commit()
+
+            self._models[name] = model if active else None
+            logger.info(
+                f"Trained classifier {name} on {len(training_samples)} samples (training accuracy {accuracy:.2f}, "
+                f"held-out accuracy {validation_accuracy:.2f} on {len(held_out)}); "
+                f"{'in use' if active else 'not used, below the validation threshold'}"
+            )
+            results[name] = {
+                "trained": True, "active": active, "sample_count": len(samples),
+                "training_accuracy": round(accuracy, 3), "validation_accuracy": round(validation_accuracy, 3)
+            }
+
+        return results
+
+
+local_classifier = LocalClassifierService()
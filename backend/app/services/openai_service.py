@@ -1,47 +1,200 @@
-from openai import OpenAI
-from app.core.config import settings
+from app.core.openai_client import openai_client
+from app.core.llm_scheduler import llm_scheduler, estimate_tokens, Priority
+from app.core.circuit_breaker import CircuitOpenError, openai_circuit
+from app.core.request_deadline import DeadlineExceeded
 from app.config import ai_config
-from typing import List, Dict, Optional
+from app.services.llm_cache import llm_response_cache
+from app.services.llm_telemetry import llm_telemetry
+from app.services.local_classifier import (
+    CATEGORY_SOURCE_FALLBACK, CATEGORY_SOURCE_LOCAL, CATEGORY_SOURCE_MODEL, local_classifier
+)
+from app.services.prompt_budget import budget_history, log_prompt_size
+from contextlib import aclosing
+from typing import AsyncIterator, List, Dict, Optional
 import logging
+import json
+import re
+import time
 
 logger = logging.getLogger(__name__)
 
 
+class _StreamedJsonString:
+    """Decode one top-level string field of a JSON object while it streams in"""
+
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self, field: str):
+        self._start = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._position: Optional[int] = None
+        self.complete = False
+
+    def feed(self, chunk: str) -> str:
+        """Add streamed JSON text; return the newly decoded part of the field"""
+        self._buffer += chunk
+        if self.complete:
+            return ""
+        if self._position is None:
+            match = self._start.search(self._buffer)
+            if not match:
+                return ""
+            self._position = match.end()
+
+        decoded = []
+        buffer, i = self._buffer, self._position
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.complete = True
+                i += 1
+                break
+            if char != "\\":
+                decoded.append(char)
+                i += 1
+                continue
+            # Escape sequence: wait until it has fully arrived
+            if i + 1 >= len(buffer):
+                break
+            if buffer[i + 1] != "u":
+                decoded.append(self._ESCAPES.get(buffer[i + 1], buffer[i + 1]))
+                i += 2
+                continue
+            length = 6
+            if i + 6 <= len(buffer) and 0xD800 <= int(buffer[i + 2:i + 6], 16) <= 0xDBFF:
+                length = 12  # Surrogate pair
+            if i + length > len(buffer):
+                break
+            decoded.append(json.loads(f'"{buffer[i:i + length]}"'))
+            i += length
+        self._position = i
+        return "".join(decoded)
+
+
 class OpenAIService:
     """Service for OpenAI API interactions with safety boundaries"""
 
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.model = ai_config.CHAT_MODEL
+        self.client = openai_client
+
+    @staticmethod
+    def prompt_prefix(task_instructions: str) -> List[Dict[str, str]]:
+        """Stable leading messages shared by every request.
+
+        SYSTEM_PROMPT is byte-identical across all tasks and the task
+        instructions are fixed per task, so provider-side prompt caching can
+        reuse this prefix. Volatile content (journal, history, user input)
+        must be appended after it.
+        """
+        return [
+            {"role": "system", "content": ai_config.SYSTEM_PROMPT},
+            {"role": "system", "content": task_instructions}
+        ]
 
-    def _create_chat_completion(
+    @staticmethod
+    def _profile_request(task: str, request_options: Dict) -> Dict:
+        """Build `responses.create` arguments from the task's model profile.
+
+        Explicit request options take precedence over the profile.
+        """
+        profile = ai_config.get_model_profile(task)
+        request = {
+            "model": profile["model"],
+            "extra_body": {"prompt_cache_key": f"aretacare-{task}"},
+        }
+        if profile.get("reasoning_effort"):
+            request["reasoning"] = {"effort": profile["reasoning_effort"]}
+        if profile.get("max_output_tokens"):
+            request["max_output_tokens"] = profile["max_output_tokens"]
+        request.update(request_options)
+        return request
+
+    async def _create_response(
         self,
         messages: List[Dict[str, str]],
-    ) -> Optional[str]:
-        """Create chat completion with error handling using Responses API"""
+        task: str = "chat",
+        priority: Priority = Priority.STANDARD,
+        **request_options
+    ):
+        """Call the Responses API, returning the raw response or None on error.
+
+        `task` labels the call in usage telemetry and routes requests with the
+        same prefix to the same prompt cache; `priority` orders it in the
+        request scheduler. The model, reasoning effort and output cap come from
+        the task's profile in `ai_config.MODEL_PROFILES`. Extra keyword
+        arguments (e.g. a structured output `text` format or
+        `previous_response_id`) are passed through to `responses.create`.
+        """
+        request = self._profile_request(task, request_options)
+        log_prompt_size(task, messages)
+        start = time.monotonic()
         try:
-            response = self.client.responses.create(
-                model=self.model,
-                input=messages,
+            response = await llm_scheduler.run(
+                lambda: self.client.responses.create(input=messages, **request),
+                task=task,
+                estimated_tokens=estimate_tokens(messages),
+                priority=priority
             )
+        except DeadlineExceeded as e:
+            # The request is out of time: let the endpoint fail instead of using a fallback
+            llm_telemetry.record_call(task, request["model"], None, (time.monotonic() - start) * 1000, error=str(e))
+            raise
+        except Exception as e:
+            llm_telemetry.record_call(task, request["model"], None, (time.monotonic() - start) * 1000, error=str(e))
+            logger.error(f"OpenAI API error: {e}")
+            return None
 
-            # Prefer the convenience property if available
-            text = getattr(response, "output_text", None)
-            if text is not None:
-                return text
+        llm_telemetry.record_call(task, request["model"], getattr(response, "usage", None), (time.monotonic() - start) * 1000)
+        return response
 
-            # Fallback: extract first text segment from output
-            if getattr(response, "output", None):
-                first_item = response.output[0]
-                if getattr(first_item, "content", None):
-                    first_content = first_item.content[0]
-                    return getattr(first_content, "text", None)
+    @staticmethod
+    def extract_text(response) -> Optional[str]:
+        """Extract the output text from a Responses API response"""
+        # Prefer the convenience property if available
+        text = getattr(response, "output_text", None)
+        if text is not None:
+            return text
 
-            return None
+        # Fallback: extract first text segment from output
+        if getattr(response, "output", None):
+            first_item = response.output[0]
+            if getattr(first_item, "content", None):
+                first_content = first_item.content[0]
+                return getattr(first_content, "text", None)
 
-        except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
-            return None
+        return None
+
+    async def _create_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        task: str = "chat",
+        priority: Priority = Priority.STANDARD,
+        **request_options
+    ) -> Optional[str]:
+        """Create chat completion with error handling using Responses API.
+
+        Tasks listed in `ai_config.LLM_CACHE_TTL_SECONDS` are served from the
+        response cache when the same model and input were seen before.
+        """
+        async def produce() -> Optional[str]:
+            response = await self._create_response(messages, task=task, priority=priority, **request_options)
+            if response is None:
+                return None
+            return self.extract_text(response)
+
+        return await llm_response_cache.get_or_create(
+            task, ai_config.get_model_profile(task)["model"], messages, produce,
+            request_options=self._profile_request(task, request_options)
+        )
+
+    async def generate_text(
+        self,
+        messages: List[Dict[str, str]],
+        task: str,
+        priority: Priority = Priority.BACKGROUND
+    ) -> Optional[str]:
+        """Run a prepared message list for another service, returning the text or None"""
+        return await self._create_chat_completion(messages, task=task, priority=priority)
 
     async def generate_medical_summary(
         self,
@@ -52,14 +205,14 @@ class OpenAIService:
 
         prompt = ai_config.get_medical_summary_prompt(medical_text)
 
-        messages = [{"role": "system", "content": ai_config.SYSTEM_PROMPT}]
+        messages = self.prompt_prefix(ai_config.MEDICAL_SUMMARY_INSTRUCTIONS)
 
         if context:
             messages.extend(context[-ai_config.MAX_SUMMARY_CONTEXT:])
 
         messages.append({"role": "user", "content": prompt})
 
-        response = self._create_chat_completion(messages)
+        response = await self._create_chat_completion(messages, task="medical_summary", priority=Priority.STANDARD)
 
         if response:
             return {"content": response}
@@ -156,9 +309,7 @@ class OpenAIService:
 
         prompt = ai_config.get_jargon_translation_prompt(medical_term, context)
 
-        messages = [
-            {"role": "system", "content": ai_config.SYSTEM_PROMPT}
-        ]
+        messages = self.prompt_prefix(ai_config.JARGON_TRANSLATION_INSTRUCTIONS)
 
         # Add journal context if available
         if journal_context:
@@ -166,7 +317,7 @@ class OpenAIService:
 
         messages.append({"role": "user", "content": prompt})
 
-        response = self._create_chat_completion(messages)
+        response = await self._create_chat_completion(messages, task="jargon_translation", priority=Priority.STANDARD)
 
         if response:
             return {
@@ -190,7 +341,7 @@ class OpenAIService:
 
         prompt = ai_config.get_conversation_coaching_prompt(situation)
 
-        messages = [{"role": "system", "content": ai_config.SYSTEM_PROMPT}]
+        messages = self.prompt_prefix(ai_config.CONVERSATION_COACHING_INSTRUCTIONS)
 
         # Add journal context if available
         if journal_context:
@@ -198,7 +349,7 @@ class OpenAIService:
 
         messages.append({"role": "user", "content": prompt})
 
-        response = self._create_chat_completion(messages)
+        response = await self._create_chat_completion(messages, task="conversation_coaching", priority=Priority.STANDARD)
 
         if response:
             return {"content": response}
@@ -208,17 +359,32 @@ class OpenAIService:
     async def categorize_document(self, extracted_text: str, filename: str, image_url: str = None) -> Dict:
         """Categorize a document and generate a brief description using AI.
 
-        For images, pass image_url to use GPT vision for better categorization.
+        Documents the local classifier recognizes confidently are categorized
+        without a model call. For images, pass image_url to use GPT vision for
+        better categorization. Raises CircuitOpenError if the model is needed
+        while the OpenAI circuit is open.
         """
 
+        local = local_classifier.classify_document(extracted_text or "", filename)
+        if local:
+            category, confidence = local
+            logger.info(f"Categorized {filename} locally as {category} ({confidence:.2f})")
+            return {
+                "category": category,
+                "description": f"{category.replace('_', ' ').capitalize()}: {filename}"[:200],
+                "source": CATEGORY_SOURCE_LOCAL
+            }
+
+        # Model categorization is optional work: skip it while the OpenAI circuit is open
+        if openai_circuit.is_degraded:
+            raise CircuitOpenError("Skipping document categorization: OpenAI circuit is open")
+
         # Take first 2000 characters for categorization to avoid token limits
         text_sample = extracted_text[:2000] if extracted_text else ""
 
         prompt = ai_config.get_document_categorization_prompt(filename, text_sample)
 
-        messages = [
-            {"role": "system", "content": ai_config.DOCUMENT_CLASSIFIER_PROMPT},
-        ]
+        messages = self.prompt_prefix(ai_config.DOCUMENT_CATEGORIZATION_INSTRUCTIONS)
 
         # Use vision for images to get better categorization
         if image_url:
@@ -226,13 +392,13 @@ class OpenAIService:
                 "role": "user",
                 "content": [
                     {"type": "input_text", "text": prompt},
-                    {"type": "input_image", "image_url": image_url}
+                    {"type": "input_image", "image_url": image_url, "detail": ai_config.VISION_IMAGE_DETAIL}
                 ]
             })
         else:
             messages.append({"role": "user", "content": prompt})
 
-        response = self._create_chat_completion(messages)
+        response = await self._create_chat_completion(messages, task="document_categorization", priority=Priority.BACKGROUND)
 
         if response:
             try:
@@ -250,34 +416,52 @@ class OpenAIService:
                 data = json.loads(cleaned_response)
                 return {
                     "category": data.get("category", ai_config.FALLBACK_DOCUMENT_CATEGORY),
-                    "description": data.get("description", "Document uploaded")[:200]  # Limit length
+                    "description": data.get("description", "Document uploaded")[:200],  # Limit length
+                    "source": CATEGORY_SOURCE_MODEL if data.get("category") else CATEGORY_SOURCE_FALLBACK
                 }
             except (json.JSONDecodeError, KeyError) as e:
                 logger.error(f"Failed to parse document categorization response: {e}, Response: {response}")
                 return {
                     "category": ai_config.FALLBACK_DOCUMENT_CATEGORY,
-                    "description": f"Document: {filename}"[:200]
+                    "description": f"Document: {filename}"[:200],
+                    "source": CATEGORY_SOURCE_FALLBACK
                 }
         else:
             return {
                 "category": ai_config.FALLBACK_DOCUMENT_CATEGORY,
-                "description": f"Document: {filename}"[:200]
+                "description": f"Document: {filename}"[:200],
+                "source": CATEGORY_SOURCE_FALLBACK
             }
 
     async def categorize_audio_recording(self, transcribed_text: str, duration: float = None) -> Dict:
-        """Categorize an audio recording and generate a brief summary using AI"""
+        """Categorize an audio recording and generate a brief summary using AI.
+
+        Recordings the local classifier recognizes confidently are categorized
+        without a model call. Raises CircuitOpenError if the model is needed
+        while the OpenAI circuit is open.
+        """
+
+        local = local_classifier.classify_audio(transcribed_text or "")
+        if local:
+            category, confidence = local
+            logger.info(f"Categorized audio recording locally as {category} ({confidence:.2f})")
+            # Use the opening sentence of the transcription as the summary
+            first_sentence = re.split(r"(?<=[.!?])\s", transcribed_text.strip(), maxsplit=1)[0]
+            return {"category": category, "summary": first_sentence[:200], "source": CATEGORY_SOURCE_LOCAL}
+
+        # Model categorization is optional work: skip it while the OpenAI circuit is open
+        if openai_circuit.is_degraded:
+            raise CircuitOpenError("Skipping audio categorization: OpenAI circuit is open")
 
         # Take first 1500 characters for categorization to avoid token limits
         text_sample = transcribed_text[:1500] if transcribed_text else ""
 
         prompt = ai_config.get_audio_categorization_prompt(text_sample, duration)
 
-        messages = [
-            {"role": "system", "content": ai_config.AUDIO_CLASSIFIER_PROMPT},
-            {"role": "user", "content": prompt}
-        ]
+        messages = self.prompt_prefix(ai_config.AUDIO_CATEGORIZATION_INSTRUCTIONS)
+        messages.append({"role": "user", "content": prompt})
 
-        response = self._create_chat_completion(messages)
+        response = await self._create_chat_completion(messages, task="audio_categorization", priority=Priority.BACKGROUND)
 
         if response:
             try:
@@ -295,18 +479,21 @@ class OpenAIService:
                 data = json.loads(cleaned_response)
                 return {
                     "category": data.get("category", ai_config.FALLBACK_AUDIO_CATEGORY),
-                    "summary": data.get("summary", "Audio recording")[:200]  # Limit length
+                    "summary": data.get("summary", "Audio recording")[:200],  # Limit length
+                    "source": CATEGORY_SOURCE_MODEL if data.get("category") else CATEGORY_SOURCE_FALLBACK
                 }
             except (json.JSONDecodeError, KeyError) as e:
                 logger.error(f"Failed to parse audio categorization response: {e}, Response: {response}")
                 return {
                     "category": ai_config.FALLBACK_AUDIO_CATEGORY,
-                    "summary": "Audio recording"
+                    "summary": "Audio recording",
+                    "source": CATEGORY_SOURCE_FALLBACK
                 }
         else:
             return {
                 "category": ai_config.FALLBACK_AUDIO_CATEGORY,
-                "summary": "Audio recording"
+                "summary": "Audio recording",
+                "source": CATEGORY_SOURCE_FALLBACK
             }
 
     def _parse_coaching_response(self, response: str) -> Dict:
@@ -376,28 +563,28 @@ class OpenAIService:
     async def chat(self, message: str, conversation_history: List[Dict[str, str]]) -> str:
         """General chat interface with safety boundaries"""
 
-        messages = [{"role": "system", "content": ai_config.SYSTEM_PROMPT}]
-        messages.extend(conversation_history[-ai_config.MAX_CONVERSATION_CONTEXT:])
+        messages = self.prompt_prefix(ai_config.CONVERSATION_INSTRUCTIONS)
+        messages.extend(budget_history(conversation_history[-ai_config.MAX_CONVERSATION_CONTEXT:]))
         messages.append({"role": "user", "content": message})
 
-        response = self._create_chat_completion(messages)
+        response = await self._create_chat_completion(messages, task="chat", priority=Priority.INTERACTIVE)
 
         return response if response else ai_config.FALLBACK_CHAT
 
-    async def chat_with_journal(
+    def _build_journal_chat_messages(
         self,
         message: str,
         conversation_history: List[Dict[str, str]],
         journal_context: str,
         document_url: Optional[str] = None,
-        document_type: Optional[str] = None
-    ) -> str:
-        """Chat interface with journal context and native file/image support"""
+        document_type: Optional[str] = None,
+        conversation_summary: Optional[str] = None,
+        document_context: Optional[str] = None,
+        document_file_id: Optional[str] = None
+    ) -> List[Dict]:
+        """Build the chat input with journal context and optional file/image"""
 
-        messages = [
-            {"role": "system", "content": ai_config.SYSTEM_PROMPT},
-            {"role": "system", "content": ai_config.CONVERSATION_INSTRUCTIONS}
-        ]
+        messages = self.prompt_prefix(ai_config.CONVERSATION_INSTRUCTIONS)
 
         # Add journal context as system message
         if journal_context and journal_context.strip() != ai_config.EMPTY_JOURNAL_MARKER:
@@ -406,45 +593,392 @@ class OpenAIService:
                 "content": f"Care journal for context:\n\n{journal_context}"
             })
 
-        # Add recent conversation history
-        messages.extend(conversation_history[-ai_config.MAX_CONVERSATION_CONTEXT:])
+        # Excerpts from the session's documents relevant to this message
+        if document_context:
+            messages.append(self._document_context_message(document_context))
+
+        # Summary of turns older than the history below
+        if conversation_summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n\n{conversation_summary}"
+            })
+
+        # Add the history not covered by the summary, newest whole messages within the token allowance
+        messages.extend(budget_history(conversation_history))
 
         # Add current message with file/image support
-        if document_url and document_type:
+        messages.append(self._build_user_input(message, document_url, document_type, document_file_id))
+
+        return messages
+
+    @staticmethod
+    def _document_context_message(document_context: str) -> Dict:
+        return {
+            "role": "system",
+            "content": f"Relevant excerpts from the family's uploaded documents:\n\n{document_context}"
+        }
+
+    def _build_chained_input(
+        self,
+        message: str,
+        document_url: Optional[str] = None,
+        document_type: Optional[str] = None,
+        document_context: Optional[str] = None,
+        document_file_id: Optional[str] = None
+    ) -> List[Dict]:
+        """Input for a chained turn: the new message plus this turn's document excerpts"""
+        messages = [self._document_context_message(document_context)] if document_context else []
+        messages.append(self._build_user_input(message, document_url, document_type, document_file_id))
+        return messages
+
+    def _build_user_input(
+        self,
+        message: str,
+        document_url: Optional[str] = None,
+        document_type: Optional[str] = None,
+        document_file_id: Optional[str] = None
+    ) -> Dict:
+        """Build the current user message, attaching a file or image if provided.
+
+        A provider `document_file_id` is used in place of `document_url` when given.
+        """
+        if (document_url or document_file_id) and document_type:
             # Multi-modal message with file or image
             content_items = [{"type": "input_text", "text": message}]
+            reference = {"file_id": document_file_id} if document_file_id else None
 
             if document_type == "image":
                 content_items.append({
                     "type": "input_image",
-                    "image_url": document_url
+                    "detail": ai_config.VISION_IMAGE_DETAIL,
+                    **(reference or {"image_url": document_url})
                 })
             else:  # document (PDF, text, etc.)
                 content_items.append({
                     "type": "input_file",
-                    "file_url": document_url
+                    **(reference or {"file_url": document_url})
                 })
 
-            messages.append({
+            return {
                 "role": "user",
                 "content": content_items
-            })
-        else:
-            # Text-only message
-            messages.append({"role": "user", "content": message})
+            }
 
-        response = self._create_chat_completion(messages)
+        # Text-only message
+        return {"role": "user", "content": message}
 
-        return response if response else ai_config.FALLBACK_CHAT
+    async def chat_with_journal(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, str]],
+        journal_context: str,
+        document_url: Optional[str] = None,
+        document_type: Optional[str] = None,
+        conversation_summary: Optional[str] = None,
+        document_context: Optional[str] = None,
+        document_file_id: Optional[str] = None
+    ) -> str:
+        """Chat interface with journal context and native file/image support"""
+
+        turn = await self.chat_with_journal_turn(
+            message, conversation_history, journal_context, document_url, document_type,
+            conversation_summary=conversation_summary,
+            document_context=document_context,
+            document_file_id=document_file_id
+        )
+        return turn["content"]
+
+    async def chat_with_journal_turn(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, str]],
+        journal_context: str,
+        document_url: Optional[str] = None,
+        document_type: Optional[str] = None,
+        conversation_summary: Optional[str] = None,
+        document_context: Optional[str] = None,
+        document_file_id: Optional[str] = None,
+        previous_response_id: Optional[str] = None
+    ) -> Dict:
+        """Journal-aware chat turn that can continue a server-side conversation.
+
+        With `previous_response_id`, only the new user message is sent and the
+        provider supplies the earlier prompt and turns from its stored state. If
+        the chain is rejected (e.g. expired), the full context is replayed.
+
+        Returns a dict with `content`, `response_id` (None on failure) and
+        `chained` (whether the stored conversation state was used).
+        """
+
+        if previous_response_id:
+            response = await self._create_response(
+                self._build_chained_input(
+                    message, document_url, document_type, document_context, document_file_id
+                ),
+                task="chat",
+                priority=Priority.INTERACTIVE,
+                previous_response_id=previous_response_id
+            )
+            text = self.extract_text(response) if response is not None else None
+            if text:
+                return {"content": text, "response_id": response.id, "chained": True}
+            logger.warning(f"Chained chat turn failed for {previous_response_id}, replaying full context")
+
+        messages = self._build_journal_chat_messages(
+            message, conversation_history, journal_context, document_url, document_type,
+            conversation_summary, document_context, document_file_id
+        )
+
+        response = await self._create_response(messages, task="chat", priority=Priority.INTERACTIVE)
+        text = self.extract_text(response) if response is not None else None
+
+        if not text:
+            return {"content": ai_config.FALLBACK_CHAT, "response_id": None, "chained": False}
+        return {"content": text, "response_id": response.id, "chained": False}
+
+    async def chat_with_journal_synthesis(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, str]],
+        journal_context: str,
+        document_url: Optional[str] = None,
+        document_type: Optional[str] = None,
+        conversation_summary: Optional[str] = None,
+        document_context: Optional[str] = None,
+        document_file_id: Optional[str] = None
+    ) -> Optional[Dict]:
+        """Get the chat reply and journal synthesis from one structured-output call.
+
+        Returns the parsed JSON (`reply` plus JOURNAL_SYNTHESIS_SCHEMA fields), or
+        None if the call or parsing failed so the caller can use the two-call path.
+        """
+
+        messages = self._build_synthesis_chat_messages(
+            message, conversation_history, journal_context, document_url, document_type,
+            conversation_summary, document_context, document_file_id
+        )
+        response = await self._create_chat_completion(
+            messages,
+            task="chat_with_synthesis",
+            priority=Priority.INTERACTIVE,
+            text=self._synthesis_text_format()
+        )
+
+        if not response:
+            return None
+
+        try:
+            data = json.loads(response)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse chat with journal synthesis response: {e}")
+            return None
+
+        if not data.get("reply"):
+            return None
+        return data
+
+    def _build_synthesis_chat_messages(self, *args) -> List[Dict]:
+        """Journal chat messages plus the single-call synthesis instructions"""
+        messages = self._build_journal_chat_messages(*args)
+        # Instructions go right after the fixed system prompts, before journal and history
+        messages.insert(2, {"role": "system", "content": ai_config.CHAT_WITH_JOURNAL_SYNTHESIS_INSTRUCTIONS})
+        return messages
+
+    @staticmethod
+    def _synthesis_text_format() -> Dict:
+        """Structured output format for the single-call reply and journal synthesis"""
+        from app.services.journal_service import JournalService
+
+        return {
+            "format": {
+                "type": "json_schema",
+                "name": "chat_with_journal_synthesis",
+                "schema": JournalService.chat_with_synthesis_schema(),
+                "strict": True
+            }
+        }
+
+    async def stream_chat_with_journal_synthesis(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, str]],
+        journal_context: str,
+        document_url: Optional[str] = None,
+        document_type: Optional[str] = None,
+        conversation_summary: Optional[str] = None,
+        document_context: Optional[str] = None,
+        document_file_id: Optional[str] = None,
+        previous_response_id: Optional[str] = None,
+        turn_state: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Stream the reply of the single-call structured response as text deltas.
+
+        The `reply` field comes first in the schema, so its text is decoded
+        from the JSON as it arrives. Once the response completes, the journal
+        synthesis fields are written to `turn_state["synthesis"]`; if they
+        cannot be parsed, the reply is kept and synthesis runs separately. If
+        the call fails before any reply text, the two-call stream
+        (stream_chat_with_journal) is used instead.
+        """
+
+        messages = self._build_synthesis_chat_messages(
+            message, conversation_history, journal_context, document_url, document_type,
+            conversation_summary, document_context, document_file_id
+        )
+        request = self._profile_request("chat_with_synthesis", {"text": self._synthesis_text_format()})
+        log_prompt_size("chat_with_synthesis", messages)
+        start = time.monotonic()
+        reply = _StreamedJsonString("reply")
+        output = []
+        produced_text = False
+        try:
+            async with aclosing(llm_scheduler.stream(
+                lambda: self.client.responses.create(input=messages, stream=True, **request),
+                task="chat_with_synthesis",
+                estimated_tokens=estimate_tokens(messages),
+                priority=Priority.INTERACTIVE
+            )) as events:
+                async for event in events:
+                    if event.type == "response.output_text.delta" and event.delta:
+                        output.append(event.delta)
+                        text = reply.feed(event.delta)
+                        if text:
+                            produced_text = True
+                            yield text
+                    elif event.type == "response.completed":
+                        llm_telemetry.record_call(
+                            "chat_with_synthesis", request["model"], getattr(event.response, "usage", None),
+                            (time.monotonic() - start) * 1000
+                        )
+        except DeadlineExceeded as e:
+            llm_telemetry.record_call("chat_with_synthesis", request["model"], None, (time.monotonic() - start) * 1000, error=str(e))
+            raise
+        except Exception as e:
+            llm_telemetry.record_call("chat_with_synthesis", request["model"], None, (time.monotonic() - start) * 1000, error=str(e))
+            logger.error(f"OpenAI streaming error: {e}")
+            if produced_text:
+                raise
+
+        if not produced_text:
+            logger.warning("Single-call chat synthesis failed, falling back to two-call stream")
+            async with aclosing(self.stream_chat_with_journal(
+                message, conversation_history, journal_context, document_url, document_type,
+                conversation_summary, document_context, document_file_id,
+                previous_response_id=previous_response_id, turn_state=turn_state
+            )) as deltas:
+                async for delta in deltas:
+                    yield delta
+            return
+
+        try:
+            data = json.loads("".join(output))
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse chat with journal synthesis response: {e}")
+            return
+        if turn_state is not None:
+            turn_state["synthesis"] = {key: value for key, value in data.items() if key != "reply"}
+
+    async def stream_chat_with_journal(
+        self,
+        message: str,
+        conversation_history: List[Dict[str, str]],
+        journal_context: str,
+        document_url: Optional[str] = None,
+        document_type: Optional[str] = None,
+        conversation_summary: Optional[str] = None,
+        document_context: Optional[str] = None,
+        document_file_id: Optional[str] = None,
+        previous_response_id: Optional[str] = None,
+        turn_state: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Stream a journal-aware chat response as text deltas.
+
+        Supports `previous_response_id` chaining like chat_with_journal_turn,
+        replaying the full context if the chained call fails before any text.
+        If `turn_state` is given, `response_id` and `chained` are written to it
+        once the response completes. Yields FALLBACK_CHAT if every attempt fails
+        before any text was produced; a failure after text was produced is
+        raised, so the caller can discard the partial reply.
+        """
+
+        attempts = []
+        if previous_response_id:
+            attempts.append((
+                self._build_chained_input(
+                    message, document_url, document_type, document_context, document_file_id
+                ),
+                {"previous_response_id": previous_response_id}
+            ))
+        attempts.append((
+            self._build_journal_chat_messages(
+                message, conversation_history, journal_context, document_url, document_type,
+                conversation_summary, document_context, document_file_id
+            ),
+            {}
+        ))
+
+        produced_text = False
+        for messages, request_options in attempts:
+            request = self._profile_request("chat_stream", request_options)
+            request["extra_body"] = {"prompt_cache_key": "aretacare-chat"}
+            log_prompt_size("chat_stream", messages)
+            start = time.monotonic()
+            try:
+                # The scheduler holds the call's slot until the stream is consumed
+                async with aclosing(llm_scheduler.stream(
+                    lambda: self.client.responses.create(input=messages, stream=True, **request),
+                    task="chat_stream",
+                    estimated_tokens=estimate_tokens(messages),
+                    priority=Priority.INTERACTIVE
+                )) as events:
+                    async for event in events:
+                        if event.type == "response.output_text.delta" and event.delta:
+                            produced_text = True
+                            yield event.delta
+                        elif event.type == "response.completed":
+                            llm_telemetry.record_call(
+                                "chat_stream", request["model"], getattr(event.response, "usage", None),
+                                (time.monotonic() - start) * 1000
+                            )
+                            if turn_state is not None:
+                                turn_state["response_id"] = event.response.id
+                                turn_state["chained"] = bool(request_options)
+            except DeadlineExceeded as e:
+                # The request is out of time: fail the turn instead of using a fallback
+                llm_telemetry.record_call("chat_stream", request["model"], None, (time.monotonic() - start) * 1000, error=str(e))
+                raise
+            except Exception as e:
+                llm_telemetry.record_call("chat_stream", request["model"], None, (time.monotonic() - start) * 1000, error=str(e))
+                logger.error(f"OpenAI streaming error: {e}")
+                # Part of the reply already reached the client: fail the turn
+                # instead of saving a truncated reply
+                if produced_text:
+                    raise
+
+            # Only retry with the full context if nothing reached the client yet
+            if produced_text:
+                break
+
+        if not produced_text:
+            yield ai_config.FALLBACK_CHAT
 
     async def transcribe_audio(self, audio_file, filename: str) -> Optional[str]:
         """Transcribe audio file using OpenAI's speech-to-text API"""
         try:
             # OpenAI expects a tuple of (filename, file_content, content_type) for in-memory files
-            transcription = self.client.audio.transcriptions.create(
-                model=ai_config.TRANSCRIPTION_MODEL,
-                file=(filename, audio_file, "audio/mpeg"),
-                response_format="text"
+            async def transcribe():
+                # Rewind so a retried upload sends the whole file again
+                if hasattr(audio_file, "seek"):
+                    audio_file.seek(0)
+                return await self.client.audio.transcriptions.create(
+                    model=ai_config.get_model_profile("transcription")["model"],
+                    file=(filename, audio_file, "audio/mpeg"),
+                    response_format="text"
+                )
+
+            transcription = await llm_scheduler.run(
+                transcribe, task="transcription", priority=Priority.STANDARD
             )
             return transcription
         except Exception as e:
@@ -0,0 +1,155 @@
+"""
+Token budgeting for prompt sections.
+
+Each prompt section (system, journal, history, document) gets a token
+allowance from `ai_config.PROMPT_SECTION_TOKENS` / `MAX_JOURNAL_TOKENS`.
+Sections are filled greedily with whole items (journal entries, chat messages,
+document paragraphs) so nothing is cut mid-entry.
+
+Tokens are counted with tiktoken when it is installed and its encoding is
+available locally; otherwise a 4-characters-per-token estimate is used.
+"""
+from app.config import ai_config
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+import logging
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Per-message framing overhead in chat-formatted input
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding(ai_config.TOKENIZER_ENCODING)
+        except Exception as e:
+            # e.g. the encoding file is not cached and there is no network access
+            logger.warning(f"tiktoken encoding unavailable, estimating tokens from length: {e}")
+            _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Number of tokens in text"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(message: Dict) -> int:
+    """Tokens for one input message, counting only its text parts"""
+    content = message.get("content")
+    if isinstance(content, list):
+        text = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    else:
+        text = content or ""
+    return count_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+
+
+def fill_greedy(
+    items: Sequence[T],
+    allowance: int,
+    cost: Callable[[T], int]
+) -> Tuple[List[T], int, int]:
+    """Take items in order while they fit, skipping any single item that does not.
+
+    Returns (kept items, tokens used, number of items omitted).
+    """
+    kept = []
+    used = 0
+    omitted = 0
+    for item in items:
+        item_cost = cost(item)
+        if used + item_cost > allowance:
+            omitted += 1
+            continue
+        kept.append(item)
+        used += item_cost
+    return kept, used, omitted
+
+
+def budget_history(messages: List[Dict], allowance: Optional[int] = None) -> List[Dict]:
+    """Keep the most recent whole messages that fit the history allowance"""
+    if allowance is None:
+        allowance = ai_config.PROMPT_SECTION_TOKENS["history"]
+    kept = []
+    used = 0
+    for message in reversed(messages):
+        message_cost = count_message_tokens(message)
+        if used + message_cost > allowance:
+            break
+        kept.append(message)
+        used += message_cost
+    kept.reverse()
+    return kept
+
+
+def budget_document(text: Optional[str], allowance: Optional[int] = None) -> Optional[str]:
+    """Trim document text to the allowance on paragraph boundaries"""
+    if not text:
+        return text
+    if allowance is None:
+        allowance = ai_config.PROMPT_SECTION_TOKENS["document"]
+    if count_tokens(text) <= allowance:
+        return text
+
+    # Prefer paragraph boundaries; OCR output without blank lines falls back to lines
+    for separator in ("\n\n", "\n"):
+        kept = []
+        used = 0
+        for block in text.split(separator):
+            block_cost = count_tokens(block)
+            if used + block_cost > allowance:
+                break
+            kept.append(block)
+            used += block_cost
+        if kept:
+            return separator.join(kept) + "\n\n[Document truncated]"
+    return text[:allowance * 4] + "\n\n[Document truncated]"
+
+
+def split_sections(messages: List[Dict]) -> Dict[str, List[Dict]]:
+    """Group request messages into prompt sections.
+
+    Follows the layout built by `OpenAIService.prompt_prefix`: the two leading
+    system messages are the fixed prompt, later system messages carry context
+    (journal), earlier turns are history and the last message is the input.
+    """
+    sections = {"system": [], "context": [], "history": [], "input": []}
+    for i, message in enumerate(messages):
+        if i == len(messages) - 1:
+            sections["input"].append(message)
+        elif message.get("role") == "system":
+            sections["system" if i < 2 else "context"].append(message)
+        else:
+            sections["history"].append(message)
+    return sections
+
+
+def log_prompt_size(task: str, messages: List[Dict]) -> int:
+    """Log the token size of each prompt section and return the total"""
+    sections = split_sections(messages)
+    sizes = {name: sum(count_message_tokens(m) for m in section) for name, section in sections.items()}
+    total = sum(sizes.values())
+    breakdown = " ".join(f"{name}={size}" for name, size in sizes.items())
+    logger.info(f"Prompt size task={task} total={total} {breakdown}")
+
+    system_allowance = ai_config.PROMPT_SECTION_TOKENS["system"]
+    if sizes.get("system", 0) > system_allowance:
+        logger.warning(f"System prompt for {task} uses {sizes['system']} tokens (allowance {system_allowance})")
+    return total
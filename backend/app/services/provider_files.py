@@ -0,0 +1,103 @@
+"""
+Provider-side file storage for documents.
+
+With `ai_config.USE_PROVIDER_FILE_STORAGE`, a document that is sent to the
+model as a file (images, and PDFs that are not sent as text chunks) is
+uploaded once to OpenAI file storage. The returned id is kept on
+`Document.provider_file_id`, and chat turns reference it instead of a presigned
+S3 URL, so the provider does not download and re-parse the file every turn.
+The provider copy is deleted along with the document.
+"""
+from app.config import ai_config
+from app.core.circuit_breaker import openai_circuit
+from app.core.openai_client import openai_client
+from app.core.request_deadline import DeadlineExceeded, bound
+from app.models.document import Document
+from app.services.s3_service import s3_service
+from sqlalchemy.orm import Session
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Longest wait for one upload (shortened further by a request deadline)
+UPLOAD_TIMEOUT_SECONDS = 60.0
+
+# Content types the Responses API accepts by file id
+SUPPORTED_CONTENT_TYPES = {"application/pdf", "image/jpeg", "image/jpg", "image/png"}
+
+
+class ProviderFileService:
+    """Upload, reuse and delete documents in the provider's file storage"""
+
+    def __init__(self):
+        self.client = openai_client
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return ai_config.USE_PROVIDER_FILE_STORAGE
+
+    @staticmethod
+    def supports(content_type: str) -> bool:
+        return content_type in SUPPORTED_CONTENT_TYPES
+
+    async def upload(self, file_content: bytes, filename: str, content_type: str) -> Optional[str]:
+        """Upload a file and return its provider file id, or None on failure"""
+        if openai_circuit.is_degraded:
+            return None
+        purpose = "vision" if content_type.startswith("image/") else "user_data"
+        try:
+            uploaded = await self.client.files.create(
+                file=(filename, file_content, content_type),
+                purpose=purpose,
+                timeout=bound(UPLOAD_TIMEOUT_SECONDS)
+            )
+            logger.info(f"Uploaded {filename} to provider file storage as {uploaded.id}")
+            return uploaded.id
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to upload {filename} to provider file storage: {e}")
+            return None
+
+    async def ensure(self, db: Session, document: Document, file_content: Optional[bytes] = None) -> Optional[str]:
+        """Return the document's provider file id, uploading it first if needed.
+
+        `file_content` is the file to upload (the model image copy, if the
+        document has one); it is downloaded from S3 when not given.
+
+        Returns None when provider storage is disabled, the type is not
+        supported or the upload fails; callers then fall back to a presigned URL.
+        """
+        if document.provider_file_id:
+            return document.provider_file_id
+        if not self.is_enabled() or not self.supports(document.content_type):
+            return None
+
+        # Images are stored as their downscaled model copy when there is one
+        content_type = "image/jpeg" if document.model_image_s3_key else document.content_type
+        if file_content is None:
+            file_content = await s3_service.download_file(document.model_image_s3_key or document.s3_key)
+            if file_content is None:
+                return None
+
+        file_id = await self.upload(file_content, document.filename, content_type)
+        if file_id:
+            document.provider_file_id = file_id
+            db.commit()
+        return file_id
+
+    async def delete(self, file_id: Optional[str]) -> bool:
+        """Delete a file from provider storage; missing ids are ignored"""
+        if not file_id:
+            return False
+        try:
+            await self.client.files.delete(file_id)
+            logger.info(f"Deleted provider file {file_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to delete provider file {file_id}: {e}")
+            return False
+
+
+provider_file_service = ProviderFileService()
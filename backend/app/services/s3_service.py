@@ -1,11 +1,22 @@
 import boto3
-from botocore.exceptions import ClientError
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from app.core.config import settings
+from app.core.request_deadline import DeadlineExceeded, run_blocking
 from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Socket timeouts and retries for S3 requests; calls made during a request
+# are additionally bounded by the request's deadline
+S3_CLIENT_CONFIG = Config(connect_timeout=5, read_timeout=30, retries={"max_attempts": 3})
+# Longest wait for one upload/download/delete
+S3_CALL_TIMEOUT_SECONDS = 60
+# Failures reported to callers as False/None: API errors, connection and
+# socket timeouts, and calls cut short by the timeout or the request deadline
+S3_CALL_ERRORS = (ClientError, BotoCoreError, DeadlineExceeded)
+
 
 class S3Service:
     def __init__(self):
@@ -13,7 +24,8 @@ class S3Service:
             's3',
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION
+            region_name=settings.AWS_REGION,
+            config=S3_CLIENT_CONFIG
         )
         self.bucket_name = settings.S3_BUCKET_NAME
         self.key_prefix = settings.S3_KEY_PREFIX  # e.g., "dev/" or "prod/"
@@ -33,40 +45,47 @@ class S3Service:
     async def upload_file(self, file_content: bytes, key: str, content_type: str) -> bool:
         """Upload file to S3 bucket"""
         try:
-            self.s3_client.put_object(
+            await run_blocking(
+                self.s3_client.put_object,
                 Bucket=self.bucket_name,
                 Key=key,
                 Body=file_content,
-                ContentType=content_type
+                ContentType=content_type,
+                timeout=S3_CALL_TIMEOUT_SECONDS
             )
             logger.info(f"Successfully uploaded file to S3: {key}")
             return True
-        except ClientError as e:
+        except S3_CALL_ERRORS as e:
             logger.error(f"Failed to upload file to S3: {e}")
             return False
 
     async def download_file(self, key: str) -> Optional[bytes]:
         """Download file from S3 bucket"""
         try:
-            response = self.s3_client.get_object(
-                Bucket=self.bucket_name,
-                Key=key
-            )
-            return response['Body'].read()
-        except ClientError as e:
+            def get_object() -> bytes:
+                response = self.s3_client.get_object(
+                    Bucket=self.bucket_name,
+                    Key=key
+                )
+                return response['Body'].read()
+
+            return await run_blocking(get_object, timeout=S3_CALL_TIMEOUT_SECONDS)
+        except S3_CALL_ERRORS as e:
             logger.error(f"Failed to download file from S3: {e}")
             return None
 
     async def delete_file(self, key: str) -> bool:
         """Delete file from S3 bucket"""
         try:
-            self.s3_client.delete_object(
+            await run_blocking(
+                self.s3_client.delete_object,
                 Bucket=self.bucket_name,
-                Key=key
+                Key=key,
+                timeout=S3_CALL_TIMEOUT_SECONDS
             )
             logger.info(f"Successfully deleted file from S3: {key}")
             return True
-        except ClientError as e:
+        except S3_CALL_ERRORS as e:
             logger.error(f"Failed to delete file from S3: {e}")
             return False
 
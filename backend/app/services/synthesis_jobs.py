@@ -0,0 +1,254 @@
+"""
+Background journal synthesis.
+
+Journal synthesis is a second model round trip, so it runs after the chat
+response has been sent. Progress is recorded on the user message's
+Conversation row (`synthesis_status`) and the resulting suggestion is stored in
+its `message_metadata` so clients can fetch it later.
+
+With `JOURNAL_SYNTHESIS_MODE = "batched"`, messages wait as PENDING and one
+call covers all of a session's waiting messages once the session goes idle or
+enough messages have accumulated (see `SynthesisBatcher`).
+"""
+from app.config import ai_config
+from app.core.circuit_breaker import openai_circuit
+from app.core.database import SessionLocal
+from app.models.conversation import Conversation, MessageRole, SynthesisStatus
+from app.schemas.journal import JournalSynthesisResult
+from app.services.journal_service import JournalService
+from app.services.prompt_budget import budget_document
+from typing import Dict, Optional
+from datetime import date
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def format_journal_suggestion(result: JournalSynthesisResult) -> Optional[dict]:
+    """Convert a synthesis result into the API's journal_suggestion payload"""
+    if not result.should_create:
+        return None
+    return {
+        "should_create": result.should_create,
+        "reasoning": result.reasoning,
+        "entries": [
+            {
+                "title": entry.title,
+                "content": entry.content,
+                "entry_type": entry.entry_type.value,
+                "confidence": entry.confidence
+            }
+            for entry in result.suggested_entries
+        ]
+    }
+
+
+async def run_journal_synthesis(
+    conversation_id: int,
+    assistant_message_id: int,
+    user_message: str,
+    ai_response: str,
+    session_id: str,
+    entry_date: Optional[date] = None,
+    synthesis_json: Optional[Dict] = None
+) -> None:
+    """Synthesize journal entries for one exchange, keyed by the user message id.
+
+    When `synthesis_json` is given (single-call chat mode) the model already
+    produced the entries, so they are saved without another model call.
+    Uses its own database session because the request session is closed by
+    the time background tasks run.
+    """
+    db = SessionLocal()
+    try:
+        conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+        if not conversation:
+            logger.warning(f"Skipping journal synthesis: conversation {conversation_id} no longer exists")
+            return
+
+        conversation.synthesis_status = SynthesisStatus.RUNNING
+        db.commit()
+
+        journal_service = JournalService(db)
+        if synthesis_json is not None:
+            synthesis_result = await journal_service.apply_synthesis(
+                synthesis_json,
+                session_id=session_id,
+                conversation_id=conversation_id,
+                entry_date=entry_date
+            )
+        else:
+            synthesis_result = await journal_service.assess_and_synthesize(
+                user_message=user_message,
+                ai_response=ai_response,
+                session_id=session_id,
+                conversation_id=conversation_id,
+                entry_date=entry_date
+            )
+
+        # Mark messages as synthesized if entries were created
+        if synthesis_result.should_create and len(synthesis_result.suggested_entries) > 0:
+            conversation.synthesized_to_journal = True
+            db.query(Conversation).filter(Conversation.id == assistant_message_id).update(
+                {Conversation.synthesized_to_journal: True}
+            )
+
+        metadata = dict(conversation.message_metadata or {})
+        metadata["journal_suggestion"] = format_journal_suggestion(synthesis_result)
+        conversation.message_metadata = metadata
+        conversation.synthesis_status = SynthesisStatus.COMPLETED
+        db.commit()
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Background journal synthesis failed for conversation {conversation_id}: {e}", exc_info=True)
+        try:
+            db.query(Conversation).filter(Conversation.id == conversation_id).update(
+                {Conversation.synthesis_status: SynthesisStatus.FAILED}
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+    finally:
+        db.close()
+
+
+def _complete_message(message: Conversation, document_allowance: int) -> str:
+    """User message text including (budgeted) document content, as synthesis sees it"""
+    if message.extracted_text:
+        return f"{message.content}\n\n[Document content]:\n{budget_document(message.extracted_text, document_allowance)}"
+    return message.content
+
+
+async def run_batched_journal_synthesis(session_id: str) -> None:
+    """Synthesize all of a session's pending user messages with one model call.
+
+    Pending rows are claimed with SKIP LOCKED, so workers flushing the same
+    session at once never synthesize a message twice.
+    """
+    db = SessionLocal()
+    claimed = []
+    try:
+        if openai_circuit.is_degraded:
+            # Leave the messages pending; the next message reschedules the batch
+            logger.info(f"Deferring batched journal synthesis for session {session_id}: OpenAI circuit is open")
+            return
+
+        claimed = db.query(Conversation).filter(
+            Conversation.session_id == session_id,
+            Conversation.role == MessageRole.USER,
+            Conversation.synthesis_status == SynthesisStatus.PENDING
+        ).order_by(Conversation.created_at).with_for_update(skip_locked=True).all()
+        if not claimed:
+            db.commit()
+            return
+        for message in claimed:
+            message.synthesis_status = SynthesisStatus.RUNNING
+        db.commit()
+
+        # Pair each user message with the assistant reply that followed it
+        replies = db.query(Conversation).filter(
+            Conversation.session_id == session_id,
+            Conversation.role == MessageRole.ASSISTANT,
+            Conversation.created_at >= claimed[0].created_at
+        ).order_by(Conversation.created_at).all()
+
+        documents = sum(1 for message in claimed if message.extracted_text) or 1
+        document_allowance = ai_config.PROMPT_SECTION_TOKENS["document"] // documents
+        exchanges = []
+        reply_ids = []
+        for i, message in enumerate(claimed):
+            next_at = claimed[i + 1].created_at if i + 1 < len(claimed) else None
+            reply = next(
+                (r for r in replies if r.created_at >= message.created_at and (next_at is None or r.created_at < next_at)),
+                None
+            )
+            if reply is not None:
+                reply_ids.append(reply.id)
+            exchanges.append({
+                "conversation_id": message.id,
+                "user_message": _complete_message(message, document_allowance),
+                "ai_response": reply.content if reply is not None else ""
+            })
+
+        # Entries are dated with the user's local date sent with the latest message
+        entry_date = None
+        latest_date = (claimed[-1].message_metadata or {}).get("entry_date")
+        if latest_date:
+            entry_date = date.fromisoformat(latest_date)
+
+        synthesis_result = await JournalService(db).assess_and_synthesize_batch(
+            exchanges, session_id=session_id, entry_date=entry_date
+        )
+
+        created = synthesis_result.should_create and len(synthesis_result.suggested_entries) > 0
+        if created:
+            db.query(Conversation).filter(Conversation.id.in_(reply_ids)).update(
+                {Conversation.synthesized_to_journal: True}, synchronize_session=False
+            )
+
+        # The suggestion is stored on the latest message; earlier ones point to it
+        latest = claimed[-1]
+        for message in claimed:
+            metadata = dict(message.message_metadata or {})
+            if message is latest:
+                metadata["journal_suggestion"] = format_journal_suggestion(synthesis_result)
+            else:
+                metadata["journal_suggestion"] = None
+                metadata["batched_into"] = latest.id
+            message.message_metadata = metadata
+            message.synthesized_to_journal = created
+            message.synthesis_status = SynthesisStatus.COMPLETED
+        db.commit()
+        logger.info(f"Batched journal synthesis covered {len(claimed)} messages in session {session_id}")
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Batched journal synthesis failed for session {session_id}: {e}", exc_info=True)
+        if claimed:
+            try:
+                db.query(Conversation).filter(Conversation.id.in_([m.id for m in claimed])).update(
+                    {Conversation.synthesis_status: SynthesisStatus.FAILED}, synchronize_session=False
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+    finally:
+        db.close()
+
+
+class SynthesisBatcher:
+    """Debounce batched journal synthesis per session.
+
+    Each new message restarts the session's idle timer; the batch runs when the
+    timer expires or as soon as JOURNAL_SYNTHESIS_BATCH_MESSAGES are pending.
+    Timers live in this worker only; messages left pending by a restart are
+    picked up by the session's next batch.
+    """
+
+    def __init__(self):
+        self._timers: Dict[str, asyncio.Task] = {}
+
+    def schedule(self, session_id: str, pending_count: int) -> None:
+        timer = self._timers.pop(session_id, None)
+        if timer is not None:
+            timer.cancel()
+        if pending_count >= ai_config.JOURNAL_SYNTHESIS_BATCH_MESSAGES:
+            delay = 0
+        else:
+            delay = ai_config.JOURNAL_SYNTHESIS_IDLE_SECONDS
+        self._timers[session_id] = asyncio.create_task(self._run_after(session_id, delay))
+
+    async def _run_after(self, session_id: str, delay: float) -> None:
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        # Once running, a new message must not cancel this batch
+        if self._timers.get(session_id) is asyncio.current_task():
+            del self._timers[session_id]
+        await run_batched_journal_synthesis(session_id)
+
+
+synthesis_batcher = SynthesisBatcher()
@@ -0,0 +1,119 @@
+"""
+Local pre-filter for journal synthesis.
+
+Exchanges like "thanks" / "You're welcome!" or "ok" / "Sounds good." never
+produce journal entries, but each one still costs a synthesis call that
+returns `should_create: false`. `is_trivial_exchange` recognizes them
+locally so JournalService can skip the call:
+
+- the user message is short and made up only of greeting, thanks and
+  acknowledgement words
+- it mentions no medical entity (numbers, glossary terms)
+- the assistant reply is short, so an "ok" that accepted an offer to explain
+  something is still synthesized
+
+Skipped calls are counted per day (UTC) and reported in the admin AI usage
+endpoint. Chat turns also use `is_trivial_message` to skip document retrieval.
+"""
+from app.config import ai_config
+from app.services.glossary_service import glossary_service
+from app.services.prompt_budget import count_tokens
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict
+import threading
+import re
+
+_WORD = re.compile(r"[a-z']+|\d+")
+_DIGIT = re.compile(r"\d")
+
+# Greetings, thanks, acknowledgements and sign-offs. Bare "yes"/"no" are left
+# out on purpose: they often answer a question about symptoms.
+ACKNOWLEDGEMENT_WORDS = frozenset(
+    "hi hello hey hiya morning afternoon evening good night goodnight bye goodbye cya later "
+    "thanks thank thx ty cheers appreciate appreciated grateful "
+    "ok okay kk alright sure fine cool great awesome perfect nice "
+    "got it understood gotcha noted sounds makes sense will do done right lol haha".split()
+)
+
+# Words that may accompany an acknowledgement without adding substance
+FILLER_WORDS = frozenset(
+    "a an and again all i it that this so very much lot lots you your u for the just really "
+    "that's it's i'm im i'll ill oh well then too as always help helpful there".split()
+)
+
+# Days of counters kept in memory
+STATS_DAYS = 30
+
+SKIP_REASON = "Greeting or acknowledgement with nothing to journal"
+
+
+def _has_medical_entity(words) -> bool:
+    """True if any word or two-word phrase is a glossary term"""
+    for i, word in enumerate(words):
+        if glossary_service.lookup(word):
+            return True
+        if i + 1 < len(words) and glossary_service.lookup(f"{word} {words[i + 1]}"):
+            return True
+    return False
+
+
+def is_trivial_message(user_message: str) -> bool:
+    """True if the message is only a greeting, thanks or acknowledgement"""
+    text = (user_message or "").strip().lower()
+    if not text or len(text) > ai_config.JOURNAL_PREFILTER_MAX_CHARS or _DIGIT.search(text):
+        return False
+
+    words = _WORD.findall(text)
+    if not words or len(words) > ai_config.JOURNAL_PREFILTER_MAX_WORDS:
+        return False
+    if not any(word in ACKNOWLEDGEMENT_WORDS for word in words):
+        return False
+    if any(word not in ACKNOWLEDGEMENT_WORDS and word not in FILLER_WORDS for word in words):
+        return False
+    return not _has_medical_entity(words)
+
+
+def is_trivial_exchange(user_message: str, ai_response: str) -> bool:
+    """True if the exchange cannot contain journal-worthy information"""
+    return (
+        is_trivial_message(user_message)
+        and count_tokens(ai_response or "") <= ai_config.JOURNAL_PREFILTER_MAX_REPLY_TOKENS
+    )
+
+
+class SynthesisPrefilterStats:
+    """In-process per-day counts of pre-filtered synthesis requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._days: "OrderedDict[date, Dict[str, int]]" = OrderedDict()
+
+    def record(self, skipped: bool) -> None:
+        today = datetime.utcnow().date()
+        with self._lock:
+            counts = self._days.get(today)
+            if counts is None:
+                counts = self._days[today] = {"checked": 0, "skipped": 0}
+                while len(self._days) > STATS_DAYS:
+                    self._days.popitem(last=False)
+            counts["checked"] += 1
+            if skipped:
+                counts["skipped"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Checked and skipped (model calls saved) counts per day, oldest first"""
+        with self._lock:
+            return {day.isoformat(): dict(counts) for day, counts in self._days.items()}
+
+
+synthesis_prefilter_stats = SynthesisPrefilterStats()
+
+
+def skip_synthesis(user_message: str, ai_response: str) -> bool:
+    """Check one exchange and count the result; True if synthesis can be skipped"""
+    if not ai_config.JOURNAL_PREFILTER_ENABLED:
+        return False
+    trivial = is_trivial_exchange(user_message, ai_response)
+    synthesis_prefilter_stats.record(trivial)
+    return trivial
@@ -0,0 +1,415 @@
+"""
+Check the scheduler's admission, retry and streaming behavior against stubbed calls.
+
+Each check runs a fresh `LLMScheduler` with small limits and stub calls that
+stand in for the OpenAI client (no network, database or API key is used):
+
+- queued calls are admitted in priority order
+- reserved slots keep room for interactive calls
+- the token budget delays calls and is settled with the reported usage
+- a 429 pauses every call, while a 5xx only backs off the failing call
+- non-retryable errors are raised after one attempt
+- the request deadline ends a call without retrying
+- a stream holds its slot until consumed or closed, and is closed on exit
+- a stream is retried only before its first event
+- only the half-open probe settles the circuit breaker's probe slot
+
+Run from backend/:
+
+    python -m scripts.check_llm_scheduler
+
+Exits with status 1 if any check fails.
+"""
+from contextlib import aclosing
+from types import SimpleNamespace
+import asyncio
+import sys
+import time
+
+import httpx
+import openai
+
+from app.config import ai_config
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, openai_circuit
+from app.core.llm_scheduler import LLMScheduler, Priority
+from app.core.request_deadline import DeadlineExceeded, deadline_scope
+
+# Short backoff so retries finish quickly
+ai_config.LLM_RETRY_BASE_SECONDS = 0.1
+ai_config.LLM_RETRY_MAX_SECONDS = 1.0
+
+# Margin for event loop scheduling when comparing timings
+SLACK_SECONDS = 0.05
+
+
+def api_error(error_class, status_code: int, headers: dict = None) -> openai.APIStatusError:
+    """An OpenAI status error as raised by the client for an HTTP response"""
+    request = httpx.Request("POST", "https://api.openai.com/v1/responses")
+    response = httpx.Response(status_code, headers=headers or {}, request=request)
+    return error_class(f"Error code: {status_code}", response=response, body=None)
+
+
+def usage_result(total_tokens: int) -> SimpleNamespace:
+    return SimpleNamespace(usage=SimpleNamespace(total_tokens=total_tokens))
+
+
+async def settle() -> None:
+    """Let queued tasks run until they block"""
+    await asyncio.sleep(0.01)
+
+
+class StubStream:
+    """Stands in for the client's AsyncStream of response events"""
+
+    def __init__(self, events, fail_after: int = None, gate: asyncio.Event = None):
+        self.events = events
+        self.fail_after = fail_after
+        self.gate = gate
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for i, event in enumerate(self.events):
+            if self.fail_after is not None and i == self.fail_after:
+                raise api_error(openai.InternalServerError, 500)
+            if self.gate is not None and i > 0:
+                await self.gate.wait()
+            yield event
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def stream_events(total_tokens: int = 7) -> list:
+    return [
+        SimpleNamespace(type="response.output_text.delta", delta="Hel"),
+        SimpleNamespace(type="response.output_text.delta", delta="lo"),
+        SimpleNamespace(type="response.completed", response=usage_result(total_tokens)),
+    ]
+
+
+async def check_priority_order() -> None:
+    scheduler = LLMScheduler(max_concurrency=1)
+    gate = asyncio.Event()
+    order = []
+
+    async def blocker():
+        await gate.wait()
+
+    def record(name):
+        async def call():
+            order.append(name)
+        return call
+
+    first = asyncio.create_task(scheduler.run(blocker, task="chat", priority=Priority.BACKGROUND))
+    await settle()
+    waiting = []
+    for name, priority in (("background", Priority.BACKGROUND), ("standard", Priority.STANDARD), ("interactive", Priority.INTERACTIVE)):
+        waiting.append(asyncio.create_task(scheduler.run(record(name), task="chat", priority=priority)))
+        await settle()
+    assert scheduler.stats()["queue_depth"] == 3, scheduler.stats()
+
+    gate.set()
+    await asyncio.gather(first, *waiting)
+    assert order == ["interactive", "standard", "background"], order
+
+
+async def check_reserved_slots() -> None:
+    scheduler = LLMScheduler(max_concurrency=ai_config.LLM_INTERACTIVE_RESERVED_SLOTS + 1)
+    gate = asyncio.Event()
+
+    async def blocker():
+        await gate.wait()
+
+    background = [
+        asyncio.create_task(scheduler.run(blocker, task="chat", priority=Priority.BACKGROUND))
+        for _ in range(2)
+    ]
+    await settle()
+    # Only one slot is left over for non-interactive work
+    assert scheduler.stats()["in_flight"] == 1, scheduler.stats()
+
+    async def reply():
+        return "ok"
+
+    interactive = await asyncio.wait_for(
+        scheduler.run(reply, task="chat", priority=Priority.INTERACTIVE), timeout=1.0
+    )
+    assert interactive == "ok"
+    assert scheduler.stats()["in_flight"] == 1, scheduler.stats()
+
+    gate.set()
+    await asyncio.gather(*background)
+
+
+async def check_token_budget() -> None:
+    scheduler = LLMScheduler(tokens_per_minute=100)
+
+    async def call():
+        return usage_result(10)
+
+    # The 80-token estimate is replaced with the 10 tokens the response reports
+    await scheduler.run(call, task="chat", estimated_tokens=80)
+    assert scheduler.stats()["tokens_last_minute"] == 10, scheduler.stats()
+
+    await asyncio.wait_for(scheduler.run(call, task="chat", estimated_tokens=80), timeout=1.0)
+    assert scheduler.stats()["tokens_last_minute"] == 20, scheduler.stats()
+
+    # 20 used + 90 estimated is over budget: the call waits for the window to roll
+    try:
+        await asyncio.wait_for(scheduler.run(call, task="chat", estimated_tokens=90), timeout=0.2)
+    except asyncio.TimeoutError:
+        pass
+    else:
+        raise AssertionError("call over the token budget was admitted")
+    assert scheduler.stats()["queue_depth"] == 0, "cancelled call left its ticket queued"
+
+
+async def check_rate_limit_pauses_all() -> None:
+    scheduler = LLMScheduler()
+    attempts = []
+
+    async def rate_limited_once():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise api_error(openai.RateLimitError, 429, {"retry-after-ms": "300"})
+        return "ok"
+
+    limited = asyncio.create_task(scheduler.run(rate_limited_once, task="chat"))
+    while not attempts:
+        await asyncio.sleep(0.01)
+    await settle()
+    stats = scheduler.stats()
+    assert stats["paused_for_seconds"] > 0, stats
+    assert stats["concurrency_limit"] == scheduler.max_concurrency // 2, stats
+
+    # A call that did not hit the limit also waits for the pause
+    started = time.monotonic()
+
+    async def other():
+        return time.monotonic()
+
+    other_started = await scheduler.run(other, task="chat")
+    assert other_started - started >= 0.3 - SLACK_SECONDS, other_started - started
+    assert await limited == "ok"
+    assert len(attempts) == 2 and attempts[1] - attempts[0] >= 0.3 - SLACK_SECONDS, attempts
+    assert scheduler.stats()["rate_limited"] == 1
+
+
+async def check_server_error_backs_off_one_call() -> None:
+    scheduler = LLMScheduler()
+    attempts = []
+
+    async def failing_once():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise api_error(openai.InternalServerError, 500)
+        return "ok"
+
+    failing = asyncio.create_task(scheduler.run(failing_once, task="chat"))
+    while not attempts:
+        await asyncio.sleep(0.01)
+    await settle()
+    assert scheduler.stats()["paused_for_seconds"] == 0, scheduler.stats()
+
+    # Other calls are admitted while the failed call backs off
+    started = time.monotonic()
+
+    async def other():
+        return time.monotonic()
+
+    other_started = await scheduler.run(other, task="chat")
+    assert other_started - started < SLACK_SECONDS, other_started - started
+    assert await failing == "ok"
+    assert len(attempts) == 2, attempts
+    stats = scheduler.stats()
+    assert stats["retries"] == 1 and stats["concurrency_limit"] == scheduler.max_concurrency, stats
+
+
+async def check_non_retryable_error() -> None:
+    scheduler = LLMScheduler()
+    attempts = []
+
+    async def bad_request():
+        attempts.append(1)
+        raise api_error(openai.BadRequestError, 400)
+
+    try:
+        await scheduler.run(bad_request, task="chat")
+    except openai.BadRequestError:
+        pass
+    else:
+        raise AssertionError("400 was not raised")
+    assert len(attempts) == 1, attempts
+    assert scheduler.stats()["failed"] == 1, scheduler.stats()
+
+
+async def check_deadline_not_retried() -> None:
+    scheduler = LLMScheduler()
+    attempts = []
+
+    async def slow():
+        attempts.append(1)
+        await asyncio.sleep(1.0)
+
+    with deadline_scope(0.1):
+        try:
+            await scheduler.run(slow, task="chat")
+        except DeadlineExceeded:
+            pass
+        else:
+            raise AssertionError("deadline was not enforced")
+    assert len(attempts) == 1, attempts
+    stats = scheduler.stats()
+    assert stats["deadline_exceeded"] == 1 and stats["in_flight"] == 0, stats
+    assert stats["tokens_last_minute"] == 0, stats
+
+
+async def check_stream_holds_slot() -> None:
+    scheduler = LLMScheduler(max_concurrency=1)
+    gate = asyncio.Event()
+    stream = StubStream(stream_events(total_tokens=7), gate=gate)
+
+    async def open_stream():
+        return stream
+
+    received = []
+
+    async def consume():
+        async with aclosing(scheduler.stream(open_stream, task="chat_stream", estimated_tokens=50)) as events:
+            async for event in events:
+                received.append(event.type)
+
+    consumer = asyncio.create_task(consume())
+    await settle()
+    assert received == ["response.output_text.delta"], list(received)
+
+    # The stream is still producing: another call has to wait for its slot
+    async def other():
+        return "ok"
+
+    waiting = asyncio.create_task(scheduler.run(other, task="chat", priority=Priority.INTERACTIVE))
+    await settle()
+    assert not waiting.done() and scheduler.stats()["queue_depth"] == 1, scheduler.stats()
+
+    gate.set()
+    await consumer
+    assert await waiting == "ok"
+    assert stream.closed, "stream was not closed"
+    # The 50-token estimate is settled with the stream's reported usage
+    assert scheduler.stats()["tokens_last_minute"] == 7, scheduler.stats()
+
+
+async def check_stream_closed_early() -> None:
+    scheduler = LLMScheduler(max_concurrency=1)
+    stream = StubStream(stream_events())
+
+    async def open_stream():
+        return stream
+
+    async with aclosing(scheduler.stream(open_stream, task="chat_stream")) as events:
+        async for _ in events:
+            break
+    assert stream.closed, "stream was not closed"
+    assert scheduler.stats()["in_flight"] == 0, scheduler.stats()
+
+
+async def check_stream_retry() -> None:
+    scheduler = LLMScheduler()
+    opened = []
+
+    async def open_failing_once():
+        opened.append(1)
+        if len(opened) == 1:
+            raise api_error(openai.InternalServerError, 503)
+        return StubStream(stream_events())
+
+    received = [event.type async for event in scheduler.stream(open_failing_once, task="chat_stream")]
+    assert len(opened) == 2, opened
+    assert received == ["response.output_text.delta", "response.output_text.delta", "response.completed"], received
+
+    # Once an event reached the caller, a failure is raised instead of retried
+    opened.clear()
+    broken = StubStream(stream_events(), fail_after=1)
+
+    async def open_broken():
+        opened.append(1)
+        return broken
+
+    received = []
+    try:
+        async for event in scheduler.stream(open_broken, task="chat_stream", estimated_tokens=50):
+            received.append(event.type)
+    except openai.InternalServerError:
+        pass
+    else:
+        raise AssertionError("mid-stream failure was not raised")
+    assert len(opened) == 1 and len(received) == 1, (opened, received)
+    assert broken.closed, "stream was not closed"
+    # Tokens generated before the failure stay debited
+    assert scheduler.stats()["tokens_last_minute"] == 50 + 7, scheduler.stats()
+
+
+async def check_probe_ownership() -> None:
+    breaker = CircuitBreaker("check", failure_threshold=1, reset_seconds=0)
+    breaker.record_failure(TimeoutError())
+
+    probe = breaker.before_call()
+    assert probe is True
+    try:
+        breaker.before_call()
+    except CircuitOpenError:
+        pass
+    else:
+        raise AssertionError("second call was let through while the probe was in flight")
+
+    # Calls that are not the probe cannot give up its slot
+    breaker.release_probe(False)
+    breaker.record_failure(TimeoutError(), probe=False)
+    try:
+        breaker.before_call()
+    except CircuitOpenError:
+        pass
+    else:
+        raise AssertionError("a non-probe call released the probe slot")
+
+    breaker.release_probe(probe)
+    assert breaker.before_call() is True
+
+
+CHECKS = [
+    check_priority_order,
+    check_reserved_slots,
+    check_token_budget,
+    check_rate_limit_pauses_all,
+    check_server_error_backs_off_one_call,
+    check_non_retryable_error,
+    check_deadline_not_retried,
+    check_stream_holds_slot,
+    check_stream_closed_early,
+    check_stream_retry,
+    check_probe_ownership,
+]
+
+
+async def main() -> int:
+    failed = 0
+    for check in CHECKS:
+        # The scheduler reports to the shared breaker; start each check with it closed
+        openai_circuit.record_success()
+        name = check.__name__.removeprefix("check_")
+        try:
+            await asyncio.wait_for(check(), timeout=10)
+        except Exception as e:
+            failed += 1
+            print(f"FAIL {name}: {type(e).__name__}: {e}")
+        else:
+            print(f"OK   {name}")
+    print(f"{len(CHECKS) - failed}/{len(CHECKS)} checks passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
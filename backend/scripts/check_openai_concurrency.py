@@ -0,0 +1,134 @@
+"""
+Check that concurrent model calls overlap instead of serializing on the event loop.
+
+Starts a fake Responses API server that answers every request after a fixed
+delay, points the shared OpenAI client at it, and sends one call per
+scheduler slot at the same time through `openai_service.chat`. With the async
+client the calls overlap, so the batch takes about one delay and the event
+loop stays responsive; a blocking client would take one delay per call.
+
+Run from backend/ (no OpenAI key, database or S3 access is used):
+
+    python -m scripts.check_openai_concurrency [--calls N] [--delay SECONDS]
+
+Exits with status 1 if the calls did not overlap or the event loop stalled.
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+
+FAKE_HOST = "127.0.0.1"
+FAKE_PORT = 8765
+
+# Settings are loaded at import time; placeholders let them load without a .env.
+# The OpenAI base URL always points at the fake server.
+for name in ("DATABASE_URL", "OPENAI_API_KEY", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "S3_BUCKET_NAME", "SECRET_KEY"):
+    os.environ.setdefault(name, "postgresql://unused@localhost/unused" if name == "DATABASE_URL" else "unused")
+os.environ["OPENAI_BASE_URL"] = f"http://{FAKE_HOST}:{FAKE_PORT}/v1"
+
+import uvicorn  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from app.config import ai_config  # noqa: E402
+from app.core.openai_client import close_openai_client  # noqa: E402
+from app.services.openai_service import openai_service  # noqa: E402
+
+# Longest acceptable event loop stall while the calls are in flight
+MAX_LOOP_LAG_SECONDS = 0.25
+
+
+def fake_api(delay: float) -> FastAPI:
+    """Minimal Responses API that replies "ok" after `delay` seconds"""
+    api = FastAPI()
+
+    @api.post("/v1/responses")
+    async def create_response(body: dict):
+        await asyncio.sleep(delay)
+        return {
+            "id": "resp_fake",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model", "fake"),
+            "status": "completed",
+            "output": [{
+                "type": "message",
+                "id": "msg_fake",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": "ok", "annotations": []}],
+            }],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": 10,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": 1,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": 11,
+            },
+        }
+
+    return api
+
+
+async def watch_loop(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Largest delay of a short sleep while the calls run (event loop lag)"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.monotonic()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.monotonic() - started - interval)
+    return worst
+
+
+async def main(calls: int, delay: float) -> int:
+    server = uvicorn.Server(uvicorn.Config(fake_api(delay), host=FAKE_HOST, port=FAKE_PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    try:
+        # One call first, so one-time setup (tokenizer load, first connection) is not measured
+        await openai_service.chat("Warm-up", [])
+
+        stop = asyncio.Event()
+        watcher = asyncio.create_task(watch_loop(stop))
+        started = time.monotonic()
+        replies = await asyncio.gather(*(
+            openai_service.chat(f"Concurrency check {i}", []) for i in range(calls)
+        ))
+        elapsed = time.monotonic() - started
+        stop.set()
+        lag = await watcher
+    finally:
+        await close_openai_client()
+        server.should_exit = True
+        await server_task
+
+    failed = sum(1 for reply in replies if reply != "ok")
+    # The scheduler admits up to its concurrency limit at once
+    expected = math.ceil(calls / ai_config.LLM_MAX_CONCURRENT_REQUESTS) * delay
+    print(
+        f"{calls} calls with {delay:.2f}s server delay: {elapsed:.2f}s total "
+        f"(expected about {expected:.2f}s, serialized would be {calls * delay:.2f}s)"
+    )
+    print(f"Max event loop lag: {lag * 1000:.0f}ms; failed calls: {failed}")
+
+    ok = failed == 0 and elapsed < expected + delay / 2 and lag < MAX_LOOP_LAG_SECONDS
+    print("OK: calls overlapped" if ok else "FAIL: calls did not overlap")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--calls", type=int, default=ai_config.LLM_MAX_CONCURRENT_REQUESTS,
+        help="Concurrent calls (default: the scheduler's concurrency limit)"
+    )
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds the fake server waits per call")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.calls, args.delay)))
@@ -195,13 +195,34 @@ const Conversation = () => {
       // Show typing indicator
       setIsAITyping(true);
 
-      // Send message
-      const response = await conversationAPI.sendMessage({
+      // Send message and render the reply as it streams in
+      const tempAssistantId = `temp-assistant-${Date.now()}`;
+      await conversationAPI.sendMessageStream({
         content,
         session_id: activeSessionId,
         message_type: messageType,
         document_id: documentId,
         entry_date: userDate
+      }, (delta) => {
+        setIsAITyping(false);
+        setMessages(prevMessages => {
+          const existing = prevMessages.find(msg => msg.id === tempAssistantId);
+          if (existing) {
+            return prevMessages.map(msg =>
+              msg.id === tempAssistantId ? { ...msg, content: msg.content + delta } : msg
+            );
+          }
+          return [...prevMessages, {
+            id: tempAssistantId,
+            role: 'assistant',
+            content: delta,
+            message_type: 'text',
+            created_at: new Date().toISOString().slice(0, -1),
+            document_id: null,
+            media_url: null,
+            extracted_text: null
+          }];
+        });
       });
 
       // Reload conversation history to get the real messages (user + AI response)
@@ -209,8 +230,10 @@ const Conversation = () => {
     } catch (err) {
       console.error('Error sending message:', err);
       setError('Failed to send message. Please try again.');
-      // Remove the temporary message on error
-      setMessages(prevMessages => prevMessages.filter(msg => msg.id !== tempUserMessage.id));
+      // Remove the temporary messages on error
+      setMessages(prevMessages => prevMessages.filter(
+        msg => msg.id !== tempUserMessage.id && !String(msg.id).startsWith('temp-assistant-')
+      ));
     } finally {
       setLoading(false);
       setIsAITyping(false);
@@ -126,6 +126,79 @@ export const documentAPI = {
 export const conversationAPI = {
   sendMessage: (data) =>
     api.post('/conversation/message', null, { params: data }),
+  // Streams the reply as server-sent events; calls onDelta with each text chunk
+  // and resolves with the final payload (same shape as sendMessage's response data)
+  sendMessageStream: async (data, onDelta) => {
+    const params = new URLSearchParams();
+    Object.entries(data).forEach(([key, value]) => {
+      if (value !== null && value !== undefined) params.append(key, value);
+    });
+    const url = `/conversation/message/stream?${params}`;
+    const token = localStorage.getItem('auth_token');
+
+    // fetch bypasses the axios interceptor, so report failures to the global
+    // handler in the same shape (no `response` means a network error)
+    const fail = (message, response = null) => {
+      const error = new Error(message);
+      error.config = { url };
+      error.response = response;
+      if (globalErrorHandler) {
+        globalErrorHandler(error);
+      }
+      return error;
+    };
+
+    let response;
+    try {
+      response = await fetch(`${API_BASE_URL}${url}`, {
+        method: 'POST',
+        headers: {
+          Accept: 'text/event-stream',
+          ...(token ? { Authorization: `Bearer ${token}` } : {}),
+        },
+      });
+    } catch (err) {
+      throw fail(err.message);
+    }
+    if (!response.ok) {
+      const detail = await response.json().catch(() => null);
+      throw fail(`Streaming request failed with status ${response.status}`, {
+        status: response.status,
+        data: detail,
+      });
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+    while (true) {
+      let chunk;
+      try {
+        chunk = await reader.read();
+      } catch (err) {
+        throw fail(err.message);
+      }
+      if (chunk.done) break;
+      buffer += decoder.decode(chunk.value, { stream: true });
+      const frames = buffer.split('\n\n');
+      buffer = frames.pop();
+      for (const frame of frames) {
+        const event = frame.match(/^event: (.*)$/m)?.[1];
+        const dataLine = frame.match(/^data: (.*)$/m)?.[1];
+        if (!event || !dataLine) continue;
+        const payload = JSON.parse(dataLine);
+        if (event === 'delta') onDelta(payload.text);
+        else if (event === 'done') result = payload;
+        else if (event === 'error') throw new Error(payload.detail);
+      }
+    }
+    // The connection closed before the reply was saved
+    if (!result) {
+      throw fail('The reply stream ended before it finished');
+    }
+    return result;
+  },
   getHistory: (sessionId, limit = 100) =>
     api.get(`/conversation/${sessionId}/history`, { params: { limit } }),
   transcribeAudio: (audioFile, sessionId) => {